@@ -0,0 +1,72 @@
+"""
+对比清洗结果使用紧凑类型（category / 小整数 / uint32 IP）前后的内存占用和聚合耗时。
+
+用法（在 Benchmark 目录下运行）:
+    python bench_compact_dtypes.py [行数]
+"""
+import os
+import random
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Clean'))
+
+from clean import _clean_frame  # noqa: E402
+from event_schema import expand_compact_columns  # noqa: E402
+
+CITIES = ['beijing', 'shanghai', 'dalian', 'shenyang', None]
+CLASSTYPES = ['dns', 'scan', 'web-attack', 'malware', 'brute-force', None]
+
+
+def make_records(n_rows, seed=0):
+    """生成 n_rows 条合成的原始事件记录。"""
+    rng = random.Random(seed)
+    start = 1752395451000
+    return [{
+        'timestamp': start + i * 1000,
+        'src_ip': f'172.{rng.randint(16, 31)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}',
+        'dst_ip': rng.choice(['202.118.66.6', '8.8.8.8', '114.114.114.114', '192.0.2.1']),
+        'classtype': rng.choice(CLASSTYPES),
+        'sub_category': rng.choice(['a', 'b', 'c', None]),
+        'kill_chain': rng.choice(['recon', 'delivery', 'exploit', None]),
+        'attack_status': rng.choice(['success', 'failed', 'unknown']),
+        'proto': rng.choice(['tcp', 'udp']),
+        'severity': rng.randint(1, 5),
+        'src_ip_city': rng.choice(CITIES),
+        'dst_ip_country': rng.choice(['China', 'CN', 'US']),
+        'enrichments.dst_ip.malicious': rng.randint(0, 1),
+        'enrichments.src_ip.malicious': rng.randint(0, 1),
+    } for i in range(n_rows)]
+
+
+def aggregate(df):
+    """下游常见的聚合：各类计数与按类别、小时分组统计。"""
+    df['classtype'].value_counts()
+    df['src_ip'].value_counts().head(10)
+    df['day_of_week'].value_counts()
+    df.groupby(['classtype', 'hour_of_day'], observed=True)['severity'].agg(['count', 'max'])
+
+
+def timed(func, *args, repeat=5):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(*args)
+    return (time.perf_counter() - start) / repeat
+
+
+if __name__ == "__main__":
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    compact = _clean_frame(pd.DataFrame(make_records(n_rows)))
+    wide = expand_compact_columns(compact)
+    print(f"📊 合成事件行数: {n_rows:,}")
+
+    compact_mb = compact.memory_usage(deep=True).sum() / 1024 ** 2
+    wide_mb = wide.memory_usage(deep=True).sum() / 1024 ** 2
+    print(f"内存占用: 紧凑类型 {compact_mb:.1f} MB，object/64 位 {wide_mb:.1f} MB，减少 {wide_mb / compact_mb:.1f} 倍")
+
+    compact_seconds = timed(aggregate, compact)
+    wide_seconds = timed(aggregate, wide)
+    print(f"聚合耗时: 紧凑类型 {compact_seconds:.3f} 秒，object/64 位 {wide_seconds:.3f} 秒，"
+          f"加速比 {wide_seconds / compact_seconds:.1f}x")
@@ -0,0 +1,59 @@
+"""
+测量 dns_analytics.analyze_dns 在大规模 DNS 事件上的耗时。
+
+生成指定行数的合成 DNS 事件（uint32 源IP、category 查询域名，与 select_rows.py 的输出类型一致），
+其中混入一部分随机字符组成的 DGA 风格域名，输出分析耗时和每秒处理行数。
+
+用法（在 Benchmark 目录下运行）:
+    python bench_dns_analytics.py [--rows 10000000] [--domains 200000] [--sources 50000]
+"""
+import argparse
+import os
+import string
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Display'))
+
+from dns_analytics import analyze_dns  # noqa: E402
+
+DGA_RATIO = 0.01
+
+
+def make_events(rows, domains, sources, seed=0):
+    """生成合成 DNS 事件。"""
+    rng = np.random.default_rng(seed)
+    dga_count = max(1, int(domains * DGA_RATIO))
+    alphabet = np.array(list(string.ascii_lowercase + string.digits))
+    names = [f'host{i}.site{i % 5000}.com.cn' for i in range(domains - dga_count)]
+    names += [''.join(rng.choice(alphabet, 14)) + '.com' for _ in range(dga_count)]
+    names = np.array(names, dtype=object)
+
+    return pd.DataFrame({
+        'timestamp': pd.Timestamp('2025-07-01') + pd.to_timedelta(rng.integers(0, 7 * 86400, rows), unit='s'),
+        'src_ip': pd.array(rng.integers(0, sources, rows) + (10 << 24), dtype='UInt32'),
+        'dns_query': pd.Categorical.from_codes(rng.integers(0, len(names), rows), categories=names),
+        'dns_rcode_name': pd.Categorical.from_codes(rng.integers(0, 2, rows), categories=['NOERROR', 'NXDOMAIN']),
+    })
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='测量 DNS 域名分析耗时')
+    parser.add_argument('--rows', type=int, default=10_000_000, help='DNS 事件行数')
+    parser.add_argument('--domains', type=int, default=200_000, help='不同域名数')
+    parser.add_argument('--sources', type=int, default=50_000, help='不同源IP数')
+    args = parser.parse_args()
+
+    print(f"🔄 生成 {args.rows:,} 行合成 DNS 事件...")
+    events = make_events(args.rows, args.domains, args.sources)
+
+    start = time.perf_counter()
+    stats = analyze_dns(events)
+    elapsed = time.perf_counter() - start
+
+    print(f"📊 分析耗时 {elapsed:.2f} 秒（{args.rows / elapsed:,.0f} 行/秒）")
+    print(f"域名 {stats['unique_domains']:,} 个，注册域名 {stats['unique_registered_domains']:,} 个，"
+          f"疑似DGA域名 {stats['dga_like_domains']:,} 个")
@@ -0,0 +1,74 @@
+"""
+对比 desc 字段解析的旧实现（逐行 apply + pd.Series）与向量化实现的耗时。
+
+用法（在 Benchmark 目录下运行）:
+    python bench_parse_desc.py [行数]
+"""
+import os
+import random
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Clean'))
+
+from desc_parser import parse_desc, extract_desc_fields  # noqa: E402
+
+DESC_TEMPLATES = [
+    'method: {method}\nstatus_code: {status}\nhost: {host}\nuri: {uri}',
+    'host: {host}\nuri: {uri}\nmethod: {method}',
+    'status_code: {status}\nhost: {host}',
+    'DNS resolves malicious domain names',
+    None,
+]
+
+
+def make_desc_series(n_rows, seed=0):
+    """生成 n_rows 条合成 desc 字符串，覆盖完整、乱序、部分字段、无字段和缺失值几种情况。"""
+    rng = random.Random(seed)
+    values = []
+    for _ in range(n_rows):
+        template = rng.choice(DESC_TEMPLATES)
+        if template is None:
+            values.append(None)
+            continue
+        values.append(template.format(
+            method=rng.choice(['GET', 'POST', 'PUT', 'HEAD']),
+            status=rng.choice(['200', '301', '404', '500', '']),
+            host=f"host{rng.randint(0, 999)}.example.com",
+            uri=f"/path/{rng.randint(0, 99999)}?q={rng.randint(0, 9)}",
+        ))
+    return pd.Series(values)
+
+
+def old_path(desc):
+    """clean_envet_log 原先的逐行解析方式。"""
+    parsed = desc.apply(lambda x: pd.Series(parse_desc(x)))
+    parsed.columns = ['parsed_method', 'parsed_status_code', 'parsed_host', 'parsed_uri']
+    parsed['parsed_status_code'] = pd.to_numeric(parsed['parsed_status_code'], errors='coerce')
+    return parsed
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    desc = make_desc_series(n_rows)
+    print(f"📊 合成 desc 行数: {n_rows:,}")
+
+    new_result, new_seconds = timed(extract_desc_fields, desc)
+    print(f"向量化 extract_desc_fields: {new_seconds:.2f} 秒")
+
+    old_result, old_seconds = timed(old_path, desc)
+    print(f"逐行 apply(parse_desc):     {old_seconds:.2f} 秒")
+    print(f"加速比: {old_seconds / new_seconds:.1f}x")
+
+    # 校验两种实现结果一致（缺失值统一为 NaN 后比较）
+    same = old_result.astype(object).where(old_result.notna()).equals(
+        new_result.astype(object).where(new_result.notna()))
+    print("✅ 结果一致" if same else "❌ 结果不一致")
@@ -0,0 +1,265 @@
+"""
+测量清洗和报告生成各阶段的耗时与内存，结果保存为 JSON，便于比较不同提交之间的性能变化。
+
+对每个行数规模，先用 synth_events 生成合成导出（按参数缓存在 --data-dir 中，重复运行时直接复用），
+再依次测量以下阶段:
+    clean                  clean_envet_log_streaming 清洗 JSON Lines（与 clean_envet_log 相同的清洗逻辑，
+                           内存只与批大小有关，千万行时也能运行）
+    load                   load_data 读取全部 XLSX 导出（先删除 .xlsx_cache，即首次解析 Excel）
+    load_cached            再次 load_data（读取 Parquet 缓存，即日常运行的情形）
+    preprocess             preprocess_data
+    analyze_threats        analyze_threats
+    create_enhanced_charts create_enhanced_charts
+    create_pdf_report      create_pdf_report
+每个阶段记录墙钟时间、CPU 时间、峰值 RSS（后台线程每 10 毫秒采样）和 RSS 增量；指定 --tracemalloc 时
+另记录 Python 分配的峰值内存（会明显拖慢计时，耗时与内存最好分两次测量）。
+
+结果默认写入 results/<git 版本>.json（本地结果，不纳入版本库）。--compare 与另一次结果对比各阶段耗时:
+    python bench_pipeline.py --rows 10000 1000000 --compare results/<旧版本>.json
+只给两个结果文件时不运行测试，直接对比:
+    python bench_pipeline.py --compare results/<旧版本>.json results/<新版本>.json
+
+用法（在 Benchmark 目录下运行）:
+    python bench_pipeline.py [--rows 10000 1000000 10000000] [--ips 10000] [--skew 1.1] [--days 7]
+                             [--tracemalloc] [--output results/x.json] [--compare <基准结果>]
+"""
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+import pandas as pd
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.join(BENCHMARK_DIR, '..')
+sys.path.insert(0, os.path.join(ROOT_DIR, 'Clean'))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'Display'))
+
+from clean import clean_envet_log_streaming  # noqa: E402
+from report import EnhancedThreatReportGenerator  # noqa: E402
+from synth_events import write_dataset  # noqa: E402
+from xlsx_cache import CACHE_DIR_NAME  # noqa: E402
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+DEFAULT_ROWS = [10_000, 1_000_000, 10_000_000]
+DATA_DIR = os.path.join(BENCHMARK_DIR, 'data')
+RESULTS_DIR = os.path.join(BENCHMARK_DIR, 'results')
+# RSS 采样间隔（秒）
+SAMPLE_INTERVAL = 0.01
+# 对比时耗时增加超过该比例的阶段标记为退化
+REGRESSION_THRESHOLD = 1.10
+MB = 1024 ** 2
+
+
+def current_rss():
+    """当前进程的常驻内存（字节）；没有 psutil 且不是 Linux 时返回 None。"""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class StageMeter:
+    """测量一个阶段的墙钟时间、CPU 时间、峰值 RSS，以及（可选）tracemalloc 峰值。"""
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.result = {}
+        self._peak_rss = None
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.wait(SAMPLE_INTERVAL):
+            rss = current_rss()
+            if rss is not None:
+                self._peak_rss = max(self._peak_rss or 0, rss)
+
+    def __enter__(self):
+        gc.collect()
+        self._rss_before = current_rss()
+        self._peak_rss = self._rss_before
+        if self.trace_memory:
+            tracemalloc.start()
+        self._sampler.start()
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        wall = time.perf_counter() - self._wall
+        cpu = time.process_time() - self._cpu
+        self._stop.set()
+        self._sampler.join()
+        rss_after = current_rss()
+        self.result = {'wall_seconds': round(wall, 4), 'cpu_seconds': round(cpu, 4)}
+        if rss_after is not None:
+            self.result['peak_rss_mb'] = round(max(self._peak_rss, rss_after) / MB, 1)
+            self.result['rss_delta_mb'] = round((rss_after - self._rss_before) / MB, 1)
+        if self.trace_memory:
+            self.result['peak_traced_mb'] = round(tracemalloc.get_traced_memory()[1] / MB, 1)
+            tracemalloc.stop()
+
+
+def git_revision():
+    """当前 git 版本（短哈希），工作区有未提交的改动时加 -dirty；不在 git 仓库中时为 'unknown'。"""
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR, stdout=subprocess.PIPE,
+                                  stderr=subprocess.DEVNULL, encoding='utf-8', check=True).stdout.strip()
+        status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT_DIR,
+                                stdout=subprocess.PIPE, encoding='utf-8', check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return f"{revision}-dirty" if status else revision
+
+
+def prepare_dataset(rows, ips, skew, days, seed, data_dir=DATA_DIR):
+    """返回该参数组合的合成数据集（不存在时生成），以及生成耗时（复用已有数据时为 None）。"""
+    dataset_dir = os.path.join(data_dir, f"rows{rows}_ips{ips}_skew{skew}_days{days}_seed{seed}")
+    manifest = os.path.join(dataset_dir, 'manifest.json')
+    if os.path.exists(manifest):
+        with open(manifest, encoding='utf-8') as f:
+            return json.load(f), None
+
+    print(f"🔄 生成 {rows:,} 行合成数据: {dataset_dir}")
+    shutil.rmtree(dataset_dir, ignore_errors=True)
+    start = time.perf_counter()
+    files = write_dataset(os.path.join(dataset_dir, 'downloads'), rows, ips, skew, days, seed)
+    seconds = time.perf_counter() - start
+    files['dir'] = dataset_dir
+    with open(manifest, 'w', encoding='utf-8') as f:
+        json.dump(files, f, ensure_ascii=False, indent=2)
+    return files, seconds
+
+
+def run_stages(files, trace_memory=False):
+    """依次运行并测量各阶段，返回 {阶段: 测量结果}。阶段的输出被丢弃。"""
+    stages = {}
+    output_dir = os.path.join(files['dir'], 'output')
+    os.makedirs(output_dir, exist_ok=True)
+
+    def measure(name, func):
+        with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+            with StageMeter(trace_memory) as meter:
+                value = func()
+        stages[name] = meter.result
+        print(f"  {name:<24} {meter.result['wall_seconds']:>9.3f} 秒"
+              + (f"  峰值RSS {meter.result['peak_rss_mb']:>8.1f} MB" if 'peak_rss_mb' in meter.result else ''))
+        return value
+
+    measure('clean', lambda: clean_envet_log_streaming(files['json'], os.path.join(output_dir, 'cleaned.parquet')))
+
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+        generator = EnhancedThreatReportGenerator()
+
+    def load():
+        return pd.concat([generator.load_data(path) for path in files['xlsx']], ignore_index=True)
+
+    for path in files['xlsx']:
+        shutil.rmtree(os.path.join(os.path.dirname(path), CACHE_DIR_NAME), ignore_errors=True)
+    measure('load', load)
+    df = measure('load_cached', load)
+    df = measure('preprocess', lambda: generator.preprocess_data(df))
+    threat_stats = measure('analyze_threats', lambda: generator.analyze_threats(df))
+    chart_files = measure('create_enhanced_charts', lambda: generator.create_enhanced_charts(threat_stats))
+    measure('create_pdf_report', lambda: generator.create_pdf_report(
+        threat_stats, chart_files, os.path.join(output_dir, 'report.pdf')))
+    return stages
+
+
+def compare(base, new):
+    """打印两次结果中相同行数、相同阶段的耗时对比，返回退化的 (行数, 阶段) 列表。"""
+    base_runs = {run['rows']: run['stages'] for run in base['runs']}
+    regressions = []
+    print(f"\n📈 对比 {base['revision']} -> {new['revision']}（墙钟时间，秒）")
+    if base['parameters'] != new['parameters']:
+        print(f"⚠️ 两次测试的参数不同: {base['parameters']} / {new['parameters']}")
+    for run in new['runs']:
+        if run['rows'] not in base_runs:
+            continue
+        print(f"{run['rows']:,} 行:")
+        for name, result in run['stages'].items():
+            before = base_runs[run['rows']].get(name)
+            if before is None:
+                continue
+            ratio = result['wall_seconds'] / before['wall_seconds'] if before['wall_seconds'] else float('inf')
+            flag = ' ⚠️ 退化' if ratio > REGRESSION_THRESHOLD else ''
+            if flag:
+                regressions.append((run['rows'], name))
+            print(f"  {name:<24} {before['wall_seconds']:>9.3f} -> {result['wall_seconds']:>9.3f}  "
+                  f"x{ratio:.2f}{flag}")
+    return regressions
+
+
+def load_results(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='测量清洗与报告生成各阶段的耗时和内存')
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS, help='行数规模，可给多个')
+    parser.add_argument('--ips', type=int, default=10_000, help='不同源IP个数')
+    parser.add_argument('--skew', type=float, default=1.1, help='IP 分布的 Zipf 指数，0 为均匀分布')
+    parser.add_argument('--days', type=float, default=7, help='时间跨度（天）')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    parser.add_argument('--tracemalloc', action='store_true', help='同时记录 tracemalloc 峰值（计时会变慢）')
+    parser.add_argument('--data-dir', default=DATA_DIR, help='合成数据的缓存目录')
+    parser.add_argument('--output', help='结果文件，默认 results/<git 版本>.json')
+    parser.add_argument('--compare', nargs='+', metavar='RESULT', help='基准结果文件；给两个文件时只对比不运行')
+    args = parser.parse_args()
+
+    if args.compare and len(args.compare) > 2:
+        parser.error('--compare 最多给两个结果文件')
+    if any(rows <= 0 for rows in args.rows):
+        parser.error('--rows 必须大于 0')
+    if args.compare and len(args.compare) == 2:
+        regressions = compare(load_results(args.compare[0]), load_results(args.compare[1]))
+        sys.exit(1 if regressions else 0)
+
+    if psutil is None and current_rss() is None:
+        print("⚠️ 未安装 psutil，不记录 RSS (pip install psutil)")
+
+    results = {
+        'revision': git_revision(),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'parameters': {'ips': args.ips, 'skew': args.skew, 'days': args.days, 'seed': args.seed,
+                       'tracemalloc': args.tracemalloc},
+        'runs': [],
+    }
+    for rows in args.rows:
+        files, generate_seconds = prepare_dataset(rows, args.ips, args.skew, args.days, args.seed, args.data_dir)
+        print(f"📊 {rows:,} 行（{len(files['xlsx'])} 份 XLSX 导出）")
+        results['runs'].append({'rows': rows, 'xlsx_files': len(files['xlsx']), 'generate_seconds': generate_seconds,
+                                'stages': run_stages(files, args.tracemalloc)})
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{results['revision']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"✅ 结果已保存: {output}")
+
+    if args.compare:
+        # 与只对比两个结果文件时一样，有性能回退时以非零状态退出
+        regressions = compare(load_results(args.compare[0]), results)
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,98 @@
+"""
+测量导入 EnhancedThreatReportGenerator 和 clean_envet_log 的启动耗时。
+
+每次在新的 Python 进程中导入，取多次运行的中位数。指定 --baseline 时，会从 git 中取出
+该版本的代码到临时目录，用同样的方式测量，便于对比改动前后的导入耗时
+（旧版本在导入时就会执行清洗等工作，这部分耗时也计入导入时间）。
+
+用法（在 Benchmark 目录下运行）:
+    python bench_startup.py [--repeat 5] [--baseline <git 版本>]
+"""
+import argparse
+import io
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# (名称, 运行目录, 导入语句)
+IMPORTS = [
+    ('EnhancedThreatReportGenerator', 'Display', 'from report import EnhancedThreatReportGenerator'),
+    ('clean_envet_log', 'Clean', 'from clean import clean_envet_log'),
+]
+
+TIMER = '''
+import time
+start = time.perf_counter()
+try:
+    {statement}
+except SystemExit:
+    # 旧版本在导入时执行清洗等工作，找不到数据时以模块级 exit() 结束，这部分仍计入导入时间
+    pass
+print(time.perf_counter() - start)
+'''
+
+
+def import_seconds(tree_dir, cwd, statement):
+    """
+    在新进程中执行导入语句，返回耗时（秒）；导入时的输出被丢弃，只保留最后一行计时。
+
+    导入抛出异常（缺少依赖、语法错误等）时子进程以非零状态退出，此时抛出 RuntimeError，而不是记为一次很快的导入。
+    """
+    result = subprocess.run([sys.executable, '-c', TIMER.format(statement=statement)],
+                            cwd=os.path.join(tree_dir, cwd), stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE, encoding='utf-8', errors='replace')
+    if result.returncode != 0:
+        raise RuntimeError(f"导入失败（{os.path.join(tree_dir, cwd)}: {statement}）:\n{result.stderr.strip()}")
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def measure(tree_dir, repeat):
+    """返回 {名称: 中位数耗时}。"""
+    return {name: statistics.median(import_seconds(tree_dir, cwd, statement) for _ in range(repeat))
+            for name, cwd, statement in IMPORTS}
+
+
+def extract_revision(revision, target_dir):
+    """将指定 git 版本的代码解压到 target_dir，并链接数据目录。"""
+    archive = subprocess.run(['git', 'archive', revision], cwd=ROOT_DIR,
+                             stdout=subprocess.PIPE, check=True).stdout
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(target_dir)
+    os.makedirs(os.path.join(target_dir, 'temp_files'), exist_ok=True)
+    # 使用当前的数据目录（包括未纳入版本库的导出），而不是该版本中的 downloads
+    shutil.rmtree(os.path.join(target_dir, 'downloads'), ignore_errors=True)
+    try:
+        os.symlink(os.path.abspath(os.path.join(ROOT_DIR, 'downloads')), os.path.join(target_dir, 'downloads'))
+    except OSError:
+        print("⚠️ 无法创建 downloads 链接，旧版本导入时将找不到数据文件")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='测量模块导入耗时')
+    parser.add_argument('--repeat', type=int, default=5, help='每项测量的运行次数')
+    parser.add_argument('--baseline', help='对比的 git 版本，例如 HEAD~1')
+    args = parser.parse_args()
+
+    try:
+        current = measure(ROOT_DIR, args.repeat)
+        baseline = None
+        if args.baseline:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                extract_revision(args.baseline, tmp_dir)
+                baseline = measure(tmp_dir, args.repeat)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    print(f"📊 导入耗时（{args.repeat} 次中位数）")
+    for name, _, _ in IMPORTS:
+        line = f"{name:<32} 当前 {current[name]:.3f} 秒"
+        if baseline:
+            line += f"    {args.baseline}: {baseline[name]:.3f} 秒    加速比 {baseline[name] / current[name]:.1f}x"
+        print(line)
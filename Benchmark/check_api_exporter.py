@@ -0,0 +1,158 @@
+"""
+在本地桩服务器上检查 Get_File/api_exporter.py 的导出流程。
+
+用 http.server 模拟控制台的登录与导出接口：登录接口校验账号，设置会话 Cookie 并在响应体中返回 token；
+导出接口要求同时带有 Cookie 和 Authorization 头，分块返回数据。检查以下几种情况：
+    - 正常导出：文件内容完整，按 envet_log-YYYYmmddHHMMSS.<fmt> 命名，不残留 .part 文件；
+    - 导出中途断开：抛出异常，不留下 .part 文件或不完整的文件；
+    - 账号错误：登录时抛出 HTTPError。
+
+接口路径与真实控制台的对应关系尚未确认，这里只验证客户端自身的逻辑。
+
+用法（在 Benchmark 目录下运行）:
+    python check_api_exporter.py [--size 5000000]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Get_File'))
+
+import api_exporter  # noqa: E402
+
+SESSION_COOKIE = 'SESSION=stub-session'
+TOKEN = 'stub-token'
+# 中途断开时只发送的字节比例
+TRUNCATE_RATIO = 0.5
+
+
+def make_handler(payload, truncate=False):
+    """返回桩服务器的请求处理类；truncate 为 True 时导出接口只发送一半数据就断开连接。"""
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, status, body=b'', headers=()):
+            self.send_response(status)
+            for name, value in headers:
+                self.send_header(name, value)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            if urlparse(self.path).path != api_exporter.LOGIN_PATH:
+                return self._reply(404)
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            credentials = json.loads(body or b'{}')
+            if (credentials.get('username'), credentials.get('password')) != (api_exporter.USERNAME,
+                                                                               api_exporter.PASSWORD):
+                return self._reply(401, b'{"message": "bad credentials"}')
+            self._reply(200, ('{"code": 0, "data": {"token": "%s"}}' % TOKEN).encode(),
+                        [('Set-Cookie', SESSION_COOKIE + '; Path=/'), ('Content-Type', 'application/json')])
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path != api_exporter.EXPORT_PATH:
+                return self._reply(404)
+            if (SESSION_COOKIE not in self.headers.get('Cookie', '')
+                    or self.headers.get('Authorization') != f'Bearer {TOKEN}'):
+                return self._reply(403)
+            if parse_qs(url.query).get(api_exporter.EXPORT_FORMAT_PARAM) not in (['json'], ['xlsx']):
+                return self._reply(400)
+
+            # 声明完整长度，分块发送；中途断开时客户端读到的数据少于 Content-Length
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/octet-stream')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            end = int(len(payload) * TRUNCATE_RATIO) if truncate else len(payload)
+            for start in range(0, end, 64 * 1024):
+                self.wfile.write(payload[start:min(start + 64 * 1024, end)])
+            if truncate:
+                self.close_connection = True
+
+    return StubHandler
+
+
+def run_with_stub(payload, check, truncate=False):
+    """启动桩服务器，以其地址调用 check(base_url)，结束后关闭服务器。"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(payload, truncate))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        return check(f'http://127.0.0.1:{server.server_address[1]}')
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def check_export(payload, fmt):
+    """正常导出：内容一致、命名正确、没有残留 .part 文件。"""
+    with tempfile.TemporaryDirectory() as download_dir:
+        path = run_with_stub(payload, lambda url: api_exporter.export(fmt, base_url=url, download_dir=download_dir))
+        name = os.path.basename(path)
+        assert name.startswith('envet_log-') and name.endswith('.' + fmt), f"文件名不符合约定: {name}"
+        with open(path, 'rb') as f:
+            assert f.read() == payload, "下载内容与服务器发送的不一致"
+        assert os.listdir(download_dir) == [name], f"下载目录中有多余文件: {os.listdir(download_dir)}"
+
+
+def check_truncated(payload):
+    """导出中途断开：抛出异常，下载目录为空。"""
+    with tempfile.TemporaryDirectory() as download_dir:
+        try:
+            run_with_stub(payload, lambda url: api_exporter.export('json', base_url=url, download_dir=download_dir),
+                          truncate=True)
+        except requests.RequestException:
+            pass
+        else:
+            raise AssertionError("连接中途断开时没有抛出异常")
+        assert os.listdir(download_dir) == [], f"中途断开后残留文件: {os.listdir(download_dir)}"
+
+
+def check_bad_login(payload):
+    """账号错误：登录时抛出 HTTPError，不会继续导出。"""
+    def export_with_wrong_password(url):
+        with api_exporter.create_session() as session:
+            api_exporter.login(session, url, password='wrong-password')
+
+    try:
+        run_with_stub(payload, export_with_wrong_password)
+    except requests.HTTPError as e:
+        assert e.response.status_code == 401, f"登录失败的状态码不符: {e.response.status_code}"
+    else:
+        raise AssertionError("账号错误时登录没有失败")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='在本地桩服务器上检查 api_exporter 的导出流程')
+    parser.add_argument('--size', type=int, default=5_000_000, help='模拟导出文件的字节数')
+    args = parser.parse_args()
+
+    data = os.urandom(args.size)
+    checks = [
+        ('JSON 导出', lambda: check_export(data, 'json')),
+        ('XLSX 导出', lambda: check_export(data, 'xlsx')),
+        ('中途断开', lambda: check_truncated(data)),
+        ('账号错误', lambda: check_bad_login(data)),
+    ]
+    failed = 0
+    for label, check in checks:
+        try:
+            check()
+            print(f"✅ {label}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {label}: {type(e).__name__}: {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,245 @@
+"""
+合成 envet_log 导出：生成与控制台导出格式相同的 JSON Lines 和 XLSX 文件，用于性能测试。
+
+JSON Lines 中每行是一条原始事件记录（timestamp 毫秒时间戳、src_ip、classtype、dns / enrichments 嵌套字段等），
+可直接交给 clean_envet_log；XLSX 的列与 EnhancedThreatReportGenerator.load_data 读取的导出相同
+（发现时间、事件ID、源IP ... 详细信息）。两种格式描述同一批事件，事件ID 与 JSON 中的 id 一致。
+
+行数、源IP个数、IP 分布的偏斜程度（Zipf 指数）和时间跨度均可配置；相同参数和种子生成的数据完全相同。
+数据按块生成和写出，内存占用与总行数无关。单个 XLSX 最多 MAX_EXPORT_ROWS 行（Excel 的行数上限约 104 万），
+超过时拆分为多份按时间排序的导出，与每日导出累积在 downloads 中的情形一致。
+
+用法（在 Benchmark 目录下运行）:
+    python synth_events.py <输出目录> [--rows 1000000] [--ips 10000] [--skew 1.1] [--days 7]
+"""
+import argparse
+import json
+import os
+import uuid
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+# 单个 XLSX 导出的最大行数
+MAX_EXPORT_ROWS = 1_000_000
+# 每块生成的行数
+CHUNK_ROWS = 200_000
+START_TIME = '2025-07-01'
+EXPORT_COLUMNS = ['发现时间', '事件ID', '源IP', '源端口', '目的IP', '目的端口', '应用层协议',
+                  '威胁类别', '威胁名称', '威胁等级', '详细信息']
+# 威胁类型: (威胁类别, 威胁名称, 应用层协议, 目的端口, 等级, 详细信息, 占比)，占比参照真实导出；端口为 None 时随机
+THREATS = [
+    ('threat-intelligence-alarm', 'malicious-domain-dns-query', 'dns', 53, 4,
+     'DNS resolves malicious domain names', 0.80),
+    ('tor-network-traffic', 'tor-flow-identify', 'other', 6969, 1, 'Tor network traffic is found', 0.07),
+    ('weird-behavior', 'remote-control-tool-identify', 'other', 19000, 2,
+     'Remote control tool Sunlogin is found in traffic', 0.06),
+    ('scan', 'scan', 'other', None, 3, 'Port scan behavior is found', 0.02),
+    ('covert-channel', 'dns-tunneling', 'dns', 53, 3, 'DNS tunneling is found', 0.01),
+    ('malicious-encrypted-traffic', 'encrypted-traffic-analysis-traffic', 'ssl', 443, 2,
+     'Malicious encrypted traffic is found', 0.02),
+    ('web-attack', 'sql-injection', 'http', 80, 5,
+     'method: GET\nstatus_code: 200\nhost: www.example.com\nuri: /index.php?id=1%27%20or%201=1', 0.01),
+    ('trojan-activity', 'trojan-communication', 'http', 8080, 5,
+     'method: POST\nstatus_code: 404\nhost: c2.example.net\nuri: /gate.php', 0.01),
+]
+CITIES = ['Dalian', 'Beijing', 'Shanghai', 'Shenyang', None]
+COUNTRIES = ['CN', 'China', 'US', 'RU', None]
+
+
+def zipf_weights(n, skew):
+    """n 个取值按排名的 Zipf 权重 1 / rank^skew；skew 为 0 时均匀分布。"""
+    weights = 1.0 / np.arange(1, n + 1) ** skew
+    return weights / weights.sum()
+
+
+def _ip_pool(count, internal_ratio, seed):
+    """
+    生成 count 个不同的 IPv4 地址，其中 internal_ratio 比例属于 172.16.0.0/12（客户端网段），其余为公网地址。
+
+    地址顺序随机打乱，Zipf 分布中排名靠前的既有内网也有公网地址。
+    """
+    rng = np.random.default_rng([seed, 0])
+    internal = int(count * internal_ratio)
+    values = np.concatenate([
+        (172 << 24 | 16 << 16) + rng.choice(1 << 20, internal, replace=False),
+        (58 << 24) + rng.choice(1 << 24, count - internal, replace=False),
+    ])
+    rng.shuffle(values)
+    return np.array([f'{v >> 24}.{(v >> 16) & 255}.{(v >> 8) & 255}.{v & 255}' for v in values.tolist()],
+                    dtype=object)
+
+
+def iter_event_chunks(rows, ips=10_000, skew=1.1, days=7, start=START_TIME, seed=0, chunk_rows=CHUNK_ROWS):
+    """
+    按时间顺序分块生成合成事件。
+
+    参数:
+        rows (int): 总行数。
+        ips (int): 不同源IP个数；目的IP个数为其一半。
+        skew (float): 源/目的IP分布的 Zipf 指数，越大越集中在少数 IP 上。
+        days (float): 事件的时间跨度（天），从 start 开始。
+        seed (int): 随机种子。
+        chunk_rows (int): 每块行数。
+
+    返回:
+        generator: 逐块产出 DataFrame，列为 time、id、src_ip、src_port、dst_ip、dst_port、threat（THREATS 下标）。
+    """
+    src_pool = _ip_pool(ips, 0.8, seed)
+    dst_pool = _ip_pool(max(ips // 2, 1), 0.2, seed + 1)
+    src_weights = zipf_weights(len(src_pool), skew)
+    dst_weights = zipf_weights(len(dst_pool), skew)
+    threat_weights = np.array([threat[-1] for threat in THREATS])
+    threat_weights /= threat_weights.sum()
+    threat_ports = np.array([-1 if threat[3] is None else threat[3] for threat in THREATS])
+
+    origin = np.datetime64(pd.Timestamp(start), 'ms')
+    span_ms = int(days * 86400 * 1000)
+    for number, offset in enumerate(range(0, rows, chunk_rows)):
+        n = min(chunk_rows, rows - offset)
+        rng = np.random.default_rng([seed, number + 1])
+        # 每块占总时间跨度中相应的一段，块内排序，整体按时间递增
+        positions = np.sort(rng.uniform(offset, offset + n, n))
+        times = origin + (positions / rows * span_ms).astype('timedelta64[ms]')
+
+        threat = rng.choice(len(THREATS), n, p=threat_weights)
+        dst_port = threat_ports[threat]
+        random_ports = dst_port < 0
+        dst_port[random_ports] = rng.integers(1, 65536, int(random_ports.sum()))
+        ids = rng.integers(0, 256, (n, 16), dtype=np.uint8)
+
+        yield pd.DataFrame({
+            'time': times,
+            'id': [str(uuid.UUID(bytes=raw.tobytes(), version=4)) for raw in ids],
+            'src_ip': src_pool[rng.choice(len(src_pool), n, p=src_weights)],
+            'src_port': rng.integers(1024, 65536, n),
+            'dst_ip': dst_pool[rng.choice(len(dst_pool), n, p=dst_weights)],
+            'dst_port': dst_port,
+            'threat': threat,
+        })
+
+
+def to_export_rows(chunk):
+    """把一块事件转换为 XLSX 导出的行（EXPORT_COLUMNS 顺序的列表）。"""
+    times = np.char.replace(np.datetime_as_string(chunk['time'].to_numpy(), unit='s').astype(str), 'T', ' ')
+    threats = [THREATS[i] for i in chunk['threat'].tolist()]
+    return [[time, event_id, src_ip, int(src_port), dst_ip, int(dst_port),
+             proto, category, name, f'severity_{severity}', desc]
+            for time, event_id, src_ip, src_port, dst_ip, dst_port, (category, name, proto, _, severity, desc, _)
+            in zip(times.tolist(), chunk['id'], chunk['src_ip'], chunk['src_port'], chunk['dst_ip'],
+                   chunk['dst_port'], threats)]
+
+
+def to_json_records(chunk):
+    """把一块事件转换为原始 JSON 记录（clean_envet_log 读取的字段，dns、enrichments 为嵌套对象）。"""
+    timestamps = chunk['time'].to_numpy().astype('datetime64[ms]').astype(np.int64)
+    records = []
+    for i, (timestamp, event_id, src_ip, src_port, dst_ip, dst_port, threat) in enumerate(zip(
+            timestamps.tolist(), chunk['id'], chunk['src_ip'], chunk['src_port'].tolist(), chunk['dst_ip'],
+            chunk['dst_port'].tolist(), chunk['threat'].tolist())):
+        category, name, proto, _, severity, desc, _ = THREATS[threat]
+        record = {
+            'id': event_id,
+            'timestamp': timestamp,
+            'src_ip': src_ip,
+            'src_port': src_port,
+            'dst_ip': dst_ip,
+            'dst_port': dst_port,
+            'proto': proto,
+            'classtype': category,
+            'sub_category': name,
+            'severity': severity,
+            'reliability': 60 + threat * 5,
+            'desc': desc,
+            'kill_chain': 'command-and-control' if severity >= 4 else 'recon',
+            'attack_status': 'unknown',
+            'src_ip_city': CITIES[i % len(CITIES)],
+            'dst_ip_country': COUNTRIES[i % len(COUNTRIES)],
+            'enrichments': {'dst_ip': {'malicious': int(severity >= 4)}, 'src_ip': {'malicious': 0},
+                            'victim': {'in_range': 1}},
+        }
+        if proto == 'dns':
+            record['dns'] = {'query': f'x{threat}-{src_port % 997}.bad-domain{dst_port}.com',
+                             'qtype_name': 'A', 'rcode_name': 'NXDOMAIN' if i % 7 == 0 else 'NOERROR'}
+        records.append(record)
+    return records
+
+
+def _export_name(last_time, extension):
+    return f"envet_log-{pd.Timestamp(last_time):%Y%m%d%H%M%S}.{extension}"
+
+
+def write_dataset(output_dir, rows, ips=10_000, skew=1.1, days=7, seed=0, xlsx=True, json_lines=True,
+                  max_export_rows=MAX_EXPORT_ROWS):
+    """
+    生成合成数据集，写入 output_dir（可作为 downloads 目录）。
+
+    XLSX 超过 max_export_rows 行时拆分为多份，文件名中的导出时间为该份最后一条事件的时间，按文件名排序即按时间排序。
+
+    返回:
+        dict: {'json': JSON Lines 文件路径或 None, 'xlsx': XLSX 文件路径列表}。
+    """
+    # 文件名取自最后一条事件的时间，没有事件时无法命名
+    if rows <= 0:
+        raise ValueError(f"行数必须大于 0: {rows}")
+    os.makedirs(output_dir, exist_ok=True)
+    json_tmp = os.path.join(output_dir, 'envet_log.json.tmp')
+    json_file = open(json_tmp, 'w', encoding='utf-8') if json_lines else None
+    xlsx_files = []
+    workbook, sheet, sheet_rows, last_time = None, None, 0, None
+
+    def save_workbook():
+        path = os.path.join(output_dir, _export_name(last_time, 'xlsx'))
+        workbook.save(path)
+        xlsx_files.append(path)
+
+    try:
+        for chunk in iter_event_chunks(rows, ips, skew, days, seed=seed):
+            if json_file is not None:
+                json_file.writelines(json.dumps(record, ensure_ascii=False) + '\n' for record in to_json_records(chunk))
+            if xlsx:
+                for row in to_export_rows(chunk):
+                    if workbook is None:
+                        workbook = Workbook(write_only=True)
+                        sheet = workbook.create_sheet()
+                        sheet.append(EXPORT_COLUMNS)
+                    sheet.append(row)
+                    sheet_rows += 1
+                    last_time = row[0]
+                    if sheet_rows >= max_export_rows:
+                        save_workbook()
+                        workbook, sheet_rows = None, 0
+            last_time = chunk['time'].iloc[-1]
+        if workbook is not None:
+            save_workbook()
+    finally:
+        if json_file is not None:
+            json_file.close()
+
+    json_path = None
+    if json_lines:
+        json_path = os.path.join(output_dir, _export_name(last_time, 'json'))
+        os.replace(json_tmp, json_path)
+    return {'json': json_path, 'xlsx': xlsx_files}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='生成合成的 envet_log 导出（JSON Lines 和 XLSX）')
+    parser.add_argument('output_dir', help='输出目录')
+    parser.add_argument('--rows', type=int, default=1_000_000, help='事件行数')
+    parser.add_argument('--ips', type=int, default=10_000, help='不同源IP个数')
+    parser.add_argument('--skew', type=float, default=1.1, help='IP 分布的 Zipf 指数，0 为均匀分布')
+    parser.add_argument('--days', type=float, default=7, help='时间跨度（天）')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    parser.add_argument('--no-json', action='store_true', help='不生成 JSON Lines')
+    parser.add_argument('--no-xlsx', action='store_true', help='不生成 XLSX')
+    args = parser.parse_args()
+    if args.rows <= 0:
+        parser.error('--rows 必须大于 0')
+
+    print(f"🔄 生成 {args.rows:,} 行合成事件到 {args.output_dir} ...")
+    files = write_dataset(args.output_dir, args.rows, args.ips, args.skew, args.days, args.seed,
+                          xlsx=not args.no_xlsx, json_lines=not args.no_json)
+    for path in ([files['json']] if files['json'] else []) + files['xlsx']:
+        print(f"✅ {path}")
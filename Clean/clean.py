@@ -1,45 +1,306 @@
 import glob
+import os
+import sys
+from collections import Counter
 
 import pandas as pd
 import json
 
+import numpy as np
 
-def clean_envet_log(file_path):
+from desc_parser import extract_desc_fields
+from event_schema import apply_compact_schema, ip_columns_to_text, memory_report
+from event_store import DEFAULT_STORE_PATH, EventStore
+from frame_store import FrameWriter, arrow_schema, frame_format, merge_arrow_schemas, with_pandas_metadata
+from nested_fields import NESTED_FIELDS, extract_nested_fields
+from normalize import normalize_locations
+
+# tracing 位于仓库根目录，与 Display 共用
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from tracing import enable_from_env, span  # noqa: E402
+
+# 流式清洗时每批解析的记录条数，峰值内存只与该值相关，与文件大小无关
+DEFAULT_BATCH_SIZE = 50000
+
+# 清洗结果的中间文件（列式存储，保留类型），供 select_rows.py 读取
+CLEANED_DATA_PATH = '../temp_files/cleaned_data.parquet'
+# 可选：同时导出一份 CSV，便于人工查看
+EXPORT_CSV = False
+CLEANED_CSV_PATH = '../temp_files/cleaned_data.csv'
+
+# 增量模式：导出先追加到持久化事件库（去重），只清洗上次之后新增的事件，结果按分片写入 CLEANED_PARTS_DIR
+INCREMENTAL = True
+EVENT_STORE_PATH = DEFAULT_STORE_PATH
+CLEANED_PARTS_DIR = '../temp_files/cleaned_parts'
+
+
+def clean_envet_log(file_path, nested_fields=None):
     """
     清洗 envet_log JSON 数据，以便进行数据可视化。
 
     参数:
         file_path (str): envet_log JSON 文件的路径。
+        nested_fields (dict): 要展开的嵌套字段 {输出列名: 路径}，默认 NESTED_FIELDS。
 
     返回:
         pandas.DataFrame: 一个已清洗的 DataFrame，可用于可视化。
     """
-    # 明确指定编码为 'utf-8' 来打开文件，以解决 UnicodeDecodeError
+    with span('clean_envet_log', file=file_path) as traced:
+        # 明确指定编码为 'utf-8' 来打开文件，以解决 UnicodeDecodeError
+        with span('read_json'), open(file_path, 'r', encoding='utf-8') as f:
+            # 加载整个 JSON 内容
+            data = [json.loads(line) for line in f]
+
+        with span('build_dataframe'):
+            df = pd.DataFrame(data)
+        traced.set(rows=len(df))
+
+        print("原始 DataFrame 信息:")
+        df.info()
+        print("\n原始 DataFrame 前几行:")
+        print(df.head())
+
+        final_df = _clean_frame(df, nested_fields)
+
+        print("\n清洗后的 DataFrame 信息:")
+        with span('memory_report'):
+            memory_report(final_df)
+    print("\n清洗后的 DataFrame 前几行:")
+    print(final_df.head())
+    print("\n'classtype' 的值计数 (示例):")
+    print(final_df['classtype'].value_counts())
+    print("\n'parsed_method' 的值计数 (示例):")
+    print(final_df['parsed_method'].value_counts())
+
+    return final_df
+
+
+def iter_envet_log_batches(file_path, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    按固定条数分批读取 envet_log JSON Lines 文件。
+
+    参数:
+        file_path (str): envet_log JSON 文件的路径。
+        batch_size (int): 每批的记录条数。
+
+    返回:
+        generator: 逐批产出原始记录 (dict) 列表。
+    """
+    batch = []
     with open(file_path, 'r', encoding='utf-8') as f:
-        # 加载整个 JSON 内容
-        data = [json.loads(line) for line in f]
+        for line in f:
+            batch.append(json.loads(line))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
 
-    df = pd.DataFrame(data)
+def clean_envet_log_streaming(file_path, output_path, batch_size=DEFAULT_BATCH_SIZE, nested_fields=None):
+    """
+    流式清洗 envet_log JSON 数据，逐批清洗并追加写入中间文件。
 
-    print("原始 DataFrame 信息:")
-    df.info()
-    print("\n原始 DataFrame 前几行:")
-    print(df.head())
+    输出格式由扩展名决定（.parquet / .feather / .csv），可同时传入多个路径，例如
+    列式中间文件加一个可选的 CSV 导出。列式文件中的 IP 列与 clean_envet_log 的结果一样为 uint32；
+    CSV 供人工查看，IP 列写为点分十进制字符串，与
+    ip_columns_to_text(clean_envet_log(file_path)).to_csv(output_path, index=False) 完全一致。
+    为此需要预先扫描文件：第一遍收集所有字段名，第二遍确定每个输出列在全量数据上的
+    统一 dtype（例如某批全为整数而另一批含缺失值时，整列应为浮点），第三遍才清洗并写出。
+    三遍都只持有一批数据，峰值内存由 batch_size 决定。
 
-    # --- 1. 数据类型转换 ---
+    参数:
+        file_path (str): envet_log JSON 文件的路径。
+        output_path (str | list): 输出文件的路径，或多个输出路径。
+        batch_size (int): 每批的记录条数。
+        nested_fields (dict): 要展开的嵌套字段 {输出列名: 路径}，默认 NESTED_FIELDS。
+
+    返回:
+        int: 写出的行数。
+    """
+    return clean_record_batches(lambda: iter_envet_log_batches(file_path, batch_size), output_path,
+                                source=file_path, nested_fields=nested_fields)
+
+
+def clean_record_batches(make_batches, output_path, source='', nested_fields=None):
+    """
+    对任意来源的原始记录批次执行三遍流式清洗（见 clean_envet_log_streaming）。
+
+    参数:
+        make_batches (callable): 无参函数，每次调用返回一个新的批次迭代器，三遍扫描必须产出相同的记录。
+        output_path (str | list): 输出文件的路径，或多个输出路径。
+        source (str): 数据来源描述，用于提示信息。
+        nested_fields (dict): 要展开的嵌套字段 {输出列名: 路径}，默认 NESTED_FIELDS。
+
+    返回:
+        int: 写出的行数。
+    """
+    output_paths = [output_path] if isinstance(output_path, str) else list(output_path)
+    need_schema = any(frame_format(path) != 'csv' for path in output_paths)
 
-    # 将 'timestamp' 转换为 datetime 对象
-    # 时间戳似乎是毫秒级的
-    df['timestamp_ms'] = pd.to_numeric(df['timestamp'], errors='coerce')
-    df['timestamp'] = pd.to_datetime(df['timestamp_ms'], unit='ms', errors='coerce')
+    # 第一遍：收集全部原始字段，保证每批的列与一次性加载时相同（缺失字段补为 NaN）
+    raw_columns = {}
+    with span('scan_fields'):
+        for batch in make_batches():
+            for record in batch:
+                raw_columns.update(dict.fromkeys(record))
+    raw_columns = list(raw_columns)
+
+    # 第二遍：合并各批清洗结果的 dtype，得到全量数据上的统一 dtype（列式格式还需要统一的 Arrow schema）
+    output_dtypes = {}
+    schema = None
+    with span('infer_dtypes'):
+        for batch in make_batches():
+            batch_df = _clean_frame(pd.DataFrame(batch).reindex(columns=raw_columns), nested_fields)
+            for col, dtype in batch_df.dtypes.items():
+                if col in output_dtypes:
+                    dtype = _common_dtype(output_dtypes[col], dtype)
+                output_dtypes[col] = dtype
+            if need_schema:
+                schema = merge_arrow_schemas(schema, arrow_schema(batch_df))
+    if schema is not None:
+        # 读取时按最终 dtype 还原 category、UInt32 等紧凑类型
+        schema = with_pandas_metadata(schema, output_dtypes)
+
+    # 第三遍：清洗并逐批追加写入
+    total_rows = 0
+    classtype_counts = Counter()
+    method_counts = Counter()
+    writers = [FrameWriter(path, schema) for path in output_paths]
+    try:
+        with span('write_batches') as traced:
+            for batch in make_batches():
+                batch_df = _clean_frame(pd.DataFrame(batch).reindex(columns=raw_columns), nested_fields)
+                batch_df = _apply_dtypes(batch_df, output_dtypes)
+                with span('write_frame', rows=len(batch_df)):
+                    for writer in writers:
+                        # CSV 供人工查看，IP 写为点分十进制
+                        writer.write(ip_columns_to_text(batch_df) if writer.format == 'csv' else batch_df)
+                total_rows += len(batch_df)
+                classtype_counts.update(_nonzero_counts(batch_df['classtype']))
+                method_counts.update(_nonzero_counts(batch_df['parsed_method']))
+            traced.set(rows=total_rows)
+    finally:
+        for writer in writers:
+            writer.close()
+
+    if not output_dtypes:
+        # 文件为空时与一次性模式一致地报错，而不是静默生成空文件
+        raise ValueError(f"没有可清洗的记录: {source}")
+
+    print(f"\n流式清洗完成，共写出 {total_rows} 行到 {', '.join(output_paths)}")
+    print("\n'classtype' 的值计数 (示例):")
+    print(pd.Series(classtype_counts, dtype='int64').sort_values(ascending=False))
+    print("\n'parsed_method' 的值计数 (示例):")
+    print(pd.Series(method_counts, dtype='int64').sort_values(ascending=False))
+
+    return total_rows
+
+
+def clean_new_events(store, parts_dir, batch_size=DEFAULT_BATCH_SIZE, export_csv=False, nested_fields=None):
+    """
+    增量清洗：只清洗事件库中高于高水位的新事件，结果写入分片目录中的一个新分片。
+
+    分片按事件序号命名，读取时按文件名顺序拼接即为完整的清洗结果。分片写完后才推进高水位，
+    中途失败重跑时会覆盖同名分片，不会重复或遗漏。
+
+    参数:
+        store (EventStore): 持久化事件库。
+        parts_dir (str): 清洗结果分片目录。
+        batch_size (int): 每批的记录条数。
+        export_csv (bool): 是否同时为该分片导出一份 CSV。
+        nested_fields (dict): 要展开的嵌套字段 {输出列名: 路径}，默认 NESTED_FIELDS。
+
+    返回:
+        int: 写出的行数。
+    """
+    after_seq = store.cleaned_seq()
+    upto_seq = store.max_seq()
+    if upto_seq <= after_seq:
+        print("没有需要清洗的新事件。")
+        return 0
+
+    os.makedirs(parts_dir, exist_ok=True)
+    part = os.path.join(parts_dir, f"part-{after_seq + 1:012d}-{upto_seq:012d}")
+    output_paths = [part + '.parquet'] + ([part + '.csv'] if export_csv else [])
+
+    total_rows = clean_record_batches(lambda: store.iter_batches(after_seq, upto_seq, batch_size), output_paths,
+                                      source=f"{store.path} (seq {after_seq + 1}-{upto_seq})",
+                                      nested_fields=nested_fields)
+    store.set_cleaned_seq(upto_seq)
+    return total_rows
+
+
+def _nonzero_counts(series):
+    """值计数（分类列的计数中会包含本批未出现的类别，这里去掉计数为 0 的项）。"""
+    counts = series.value_counts()
+    return counts[counts > 0].to_dict()
+
+
+def _common_dtype(left, right):
+    """
+    返回两批数据同一列合并后的 dtype，规则与 pandas 整体推断一致：整数与浮点合并为浮点，其余不一致时为 object。
+    紧凑类型下，两批的分类列合并为包含双方类别的分类，不同宽度的整数取较宽的类型。
+    """
+    if isinstance(left, pd.CategoricalDtype) and isinstance(right, pd.CategoricalDtype):
+        # 无序分类的 == 不比较类别顺序，这里要求顺序也一致
+        if left.categories.equals(right.categories):
+            return left
+        return pd.CategoricalDtype(left.categories.append(right.categories).unique(), ordered=left.ordered)
+    if all(isinstance(dtype, np.dtype) and dtype.kind in 'iu' for dtype in (left, right)):
+        return np.promote_types(left, right)
+    if left == right:
+        return left
+    numeric = (pd.api.types.is_integer_dtype, pd.api.types.is_float_dtype)
+    if all(any(check(dtype) for check in numeric) for dtype in (left, right)):
+        return 'float64'
+    return 'object'
+
+
+def _apply_dtypes(df, dtypes):
+    """按合并后的 dtype 转换一批数据；分类列按同一类别顺序重新编码，保证各批写出的字典一致。"""
+    df = df.astype(dtypes)
+    for col, dtype in dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype):
+            df[col] = df[col].cat.set_categories(dtype.categories)
+    return df
+
+
+def _clean_frame(df, nested_fields=None):
+    """
+    对一批原始记录执行清洗，返回用于可视化的列。
+
+    参数:
+        df (pandas.DataFrame): 由原始 JSON 记录构成的 DataFrame。
+        nested_fields (dict): 要展开的嵌套字段 {输出列名: 路径}，默认 NESTED_FIELDS。
+
+    返回:
+        pandas.DataFrame: 一个已清洗的 DataFrame。
+    """
+    if nested_fields is None:
+        nested_fields = NESTED_FIELDS
+
+    # --- 0. 展开嵌套字段 ---
+
+    # dns.query、dns.qtype_name、enrichments.* 等在一次遍历中取出
+    with span('extract_nested_fields', rows=len(df)):
+        extract_nested_fields(df, nested_fields)
+
+    # --- 1. 数据类型转换 ---
 
     # 将数值字段转换为数值类型，强制转换错误会将无效解析转换为 NaN
     numerical_cols = ['reliability', 'severity', 'enrichments.dst_ip.malicious',
                       'enrichments.src_ip.malicious', 'number',
                       'enrichments.victim.in_range', 'original_reliability']
-    for col in numerical_cols:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
+    with span('convert_types'):
+        # 将 'timestamp' 转换为 datetime 对象
+        # 时间戳似乎是毫秒级的
+        df['timestamp_ms'] = pd.to_numeric(df['timestamp'], errors='coerce')
+        df['timestamp'] = pd.to_datetime(df['timestamp_ms'], unit='ms', errors='coerce')
+
+        for col in numerical_cols:
+            if col in df.columns:
+                df[col] = pd.to_numeric(df[col], errors='coerce')
 
     # --- 2. 处理缺失值 ---
 
@@ -66,65 +327,26 @@ def clean_envet_log(file_path):
     # --- 3. 特征工程 ---
 
     # 从时间戳中提取小时、星期几和日期
-    df['hour_of_day'] = df['timestamp'].dt.hour
-    df['day_of_week'] = df['timestamp'].dt.day_name()
-    df['event_date'] = df['timestamp'].dt.date
-
-    # 如果存在 'dns' 字段且 'query' 是一个键，则从 'dns.query' 中提取域名
-    if 'dns' in df.columns:
-        df['dns_query'] = df['dns'].apply(lambda x: x.get('query') if isinstance(x, dict) else None)
-        df['dns_qtype_name'] = df['dns'].apply(lambda x: x.get('qtype_name') if isinstance(x, dict) else None)
-    else:
-        df['dns_query'] = None
-        df['dns_qtype_name'] = None
+    with span('time_features'):
+        df['hour_of_day'] = df['timestamp'].dt.hour
+        df['day_of_week'] = df['timestamp'].dt.day_name()
+        df['event_date'] = df['timestamp'].dt.date
 
     # 如果存在 'desc' 字段，则从中提取信息
     if 'desc' in df.columns:
         # 示例: 从 desc 中解析 method, status_code, host, uri
-        def parse_desc(desc):
-            if not isinstance(desc, str):
-                return None, None, None, None
-
-            method = status_code = host = uri = None
-
-            # 根据已知模式使用正则表达式或简单字符串分割
-            if 'method:' in desc:
-                method_match = desc.split('method:')[1].split('\n')[0].strip()
-                method = method_match if method_match else None
-            if 'status_code:' in desc:
-                status_code_match = desc.split('status_code:')[1].split('\n')[0].strip()
-                status_code = pd.to_numeric(status_code_match, errors='coerce') if status_code_match else None
-            if 'host:' in desc:
-                host_match = desc.split('host:')[1].split('\n')[0].strip()
-                host = host_match if host_match else None
-            if 'uri:' in desc:
-                uri_match = desc.split('uri:')[1].split('\n')[0].strip()
-                uri = uri_match if uri_match else None
-
-            return method, status_code, host, uri
-
-        df[['parsed_method', 'parsed_status_code', 'parsed_host', 'parsed_uri']] = df['desc'].apply(
-            lambda x: pd.Series(parse_desc(x)))
-        df['parsed_status_code'] = pd.to_numeric(df['parsed_status_code'], errors='coerce')  # 确保为数值类型
+        # 对整列做一次向量化提取，替代逐行 apply + pd.Series
+        with span('parse_desc'):
+            parsed = extract_desc_fields(df['desc'])
+            for col in parsed.columns:
+                df[col] = parsed[col]
 
     # --- 4. 标准化分类数据 ---
 
-    # 示例: 标准化国家代码
-    # 这可能需要一个映射字典才能完全标准化
-    country_mapping = {
-        'China': 'CN',
-        'CN': 'CN',
-        # 根据需要添加更多映射
-    }
-    if 'dst_ip_country' in df.columns:
-        df['dst_ip_country'] = df['dst_ip_country'].replace(country_mapping)
-    if 'victim_country_code' in df.columns:
-        df['victim_country_code'] = df['victim_country_code'].replace(country_mapping)
-
-    # 将城市名称转换为一致的大小写（例如，首字母大写）
-    for col in ['src_ip_city', 'dst_ip_city', 'victim_city']:
-        if col in df.columns:
-            df[col] = df[col].astype(str).apply(lambda x: x.title() if x != 'Unknown' else x)
+    # 国家代码按映射统一，城市名称统一为首字母大写；映射可在 normalization.json 中扩充。
+    # 每列只对去重后的取值做转换，再按编码展开到整列
+    with span('normalize_locations'):
+        normalize_locations(df)
 
     # 选择用于可视化的相关列，如果已解析则删除原始复杂列
     columns_to_keep = [
@@ -135,31 +357,50 @@ def clean_envet_log(file_path):
         'intel_type', 'attack_status', 'tags', 'proto', 'interface',
         'enrichments.dst_ip.malicious', 'enrichments.src_ip.malicious',
         'number', 'enrichments.victim.in_range', 'original_reliability',
-        'dns_query', 'dns_qtype_name', 'parsed_method', 'parsed_status_code',
+        'dns_query', 'dns_qtype_name', 'dns_rcode_name', 'parsed_method', 'parsed_status_code',
         'parsed_host', 'parsed_uri'
     ]
+    # 调用方额外声明的嵌套字段也保留
+    columns_to_keep += [col for col in nested_fields if col not in columns_to_keep]
 
     # 过滤 DataFrame 中实际存在的列
     final_df_columns = [col for col in columns_to_keep if col in df.columns]
     final_df = df[final_df_columns].copy()
 
-    print("\n清洗后的 DataFrame 信息:")
-    final_df.info()
-    print("\n清洗后的 DataFrame 前几行:")
-    print(final_df.head())
-    print("\n'classtype' 的值计数 (示例):")
-    print(final_df['classtype'].value_counts())
-    print("\n'parsed_method' 的值计数 (示例):")
-    print(final_df['parsed_method'].value_counts())
+    # --- 5. 紧凑类型 ---
+    # 分类列、整数标志和 IP 列转换为 category / 小整数 / uint32，见 event_schema
+    with span('compact_schema'):
+        return apply_compact_schema(final_df)
 
-    return final_df
 
-# 运行清洗过程:
-files = glob.glob("../downloads/*envet_log*.json")
-if not files:
-    print("❌ ../downloads/ 目录下未找到匹配 'envet_log*.json' 的文件。")
-    exit()
-file_path = files[0]
+def main():
+    """运行清洗过程：清洗 ../downloads 下的 envet_log JSON 导出。"""
+    # 设置了 ENVET_TRACE 等环境变量时记录各步骤的耗时与内存
+    enable_from_env()
+
+    # 文件名带导出时间，按文件名排序即按导出时间排序
+    files = sorted(glob.glob("../downloads/*envet_log*.json"))
+    if not files:
+        print("❌ ../downloads/ 目录下未找到匹配 'envet_log*.json' 的文件。")
+        return
+
+    if INCREMENTAL:
+        # 增量清洗：新的导出追加到事件库（已导入的文件和早于库中时间戳的行直接跳过，重叠的事件去重），
+        # 耗时只与新增事件数有关
+        with EventStore(EVENT_STORE_PATH) as store:
+            for file_path in files:
+                with span('ingest', file=file_path) as traced:
+                    new_events = store.ingest(file_path)
+                    traced.set(rows=new_events)
+                print(f"事件库新增 {new_events} 条事件（{file_path}）: {EVENT_STORE_PATH}")
+            with span('clean_new_events'):
+                clean_new_events(store, CLEANED_PARTS_DIR, export_csv=EXPORT_CSV)
+    else:
+        # 流式清洗最新的一份导出，避免大文件一次性载入内存
+        output_paths = [CLEANED_DATA_PATH] + ([CLEANED_CSV_PATH] if EXPORT_CSV else [])
+        with span('clean_envet_log_streaming', file=files[-1]):
+            clean_envet_log_streaming(files[-1], output_paths)
+
 
-cleaned_data = clean_envet_log(file_path)
-cleaned_data.to_csv('../temp_files/cleaned_data.csv', index=False)
+if __name__ == "__main__":
+    main()
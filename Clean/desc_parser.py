@@ -0,0 +1,69 @@
+import pandas as pd
+
+# desc 字段中需要解析的键，以及对应的输出列名
+DESC_FIELDS = {
+    'method': 'parsed_method',
+    'status_code': 'parsed_status_code',
+    'host': 'parsed_host',
+    'uri': 'parsed_uri',
+}
+
+# 每个键用一个可选的前瞻分组匹配，四个字段在一次 extract 中完成，键名可以出现在任意顺序。
+# 与 desc.split('key:')[1].split('\n')[0] 一样，取第一次出现之后、到换行或下一次出现该键之前的内容。
+DESC_PATTERN = '(?s)^' + ''.join(
+    rf'(?=(?:.*?{key}:(?P<{column}>(?:(?!{key}:)[^\n])*))?)' for key, column in DESC_FIELDS.items()
+)
+
+
+def parse_desc(desc):
+    """
+    逐行解析 desc 字符串中的 method, status_code, host, uri（旧实现，保留用于对比基准）。
+
+    参数:
+        desc (str): 事件的 desc 字段。
+
+    返回:
+        tuple: (method, status_code, host, uri)，缺失的字段为 None。
+    """
+    if not isinstance(desc, str):
+        return None, None, None, None
+
+    method = status_code = host = uri = None
+
+    # 根据已知模式使用正则表达式或简单字符串分割
+    if 'method:' in desc:
+        method_match = desc.split('method:')[1].split('\n')[0].strip()
+        method = method_match if method_match else None
+    if 'status_code:' in desc:
+        status_code_match = desc.split('status_code:')[1].split('\n')[0].strip()
+        status_code = pd.to_numeric(status_code_match, errors='coerce') if status_code_match else None
+    if 'host:' in desc:
+        host_match = desc.split('host:')[1].split('\n')[0].strip()
+        host = host_match if host_match else None
+    if 'uri:' in desc:
+        uri_match = desc.split('uri:')[1].split('\n')[0].strip()
+        uri = uri_match if uri_match else None
+
+    return method, status_code, host, uri
+
+
+def extract_desc_fields(desc):
+    """
+    向量化解析整列 desc，结果与逐行调用 parse_desc 相同。
+
+    参数:
+        desc (pandas.Series): desc 列，非字符串的值视为缺失。
+
+    返回:
+        pandas.DataFrame: 包含 parsed_method, parsed_status_code, parsed_host, parsed_uri 四列，
+        索引与 desc 相同。
+    """
+    # 转为 object，避免整列为 NaN（float）时 .str 访问器报错
+    parsed = desc.astype(object).str.extract(DESC_PATTERN)
+
+    for column in parsed.columns:
+        values = parsed[column].str.strip()
+        parsed[column] = values.where(values != '')
+
+    parsed['parsed_status_code'] = pd.to_numeric(parsed['parsed_status_code'], errors='coerce')
+    return parsed[list(DESC_FIELDS.values())]
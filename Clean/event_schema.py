@@ -0,0 +1,111 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# IPv4 解析位于仓库根目录，与 Display 的网段判断共用
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from ipv4 import ipv4_to_uint32, uint32_to_ipv4  # noqa: E402,F401
+
+# 清洗结果的紧凑类型定义。
+# 重复度高的文本列存为 category，只保存一份取值和整数编码
+CATEGORY_COLUMNS = ['src_ip_city', 'dst_ip_city', 'dst_ip_country', 'victim_city', 'victim_country_code',
+                    'host', 'user_agent', 'status_msg', 'classtype', 'sub_category', 'kill_chain',
+                    'intel_type', 'attack_status', 'tags', 'proto', 'interface', 'dns_qtype_name',
+                    'dns_rcode_name', 'parsed_method']
+# 星期固定为有序分类，各批次的类别一致，排序时按星期顺序
+DAY_OF_WEEK_DTYPE = pd.CategoricalDtype(
+    ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'], ordered=True)
+# 数值标志、等级等整数列；值不全为整数或超出范围时保留为浮点
+INTEGER_COLUMNS = {
+    'timestamp_ms': 'int64',
+    'hour_of_day': 'int8',
+    'severity': 'int8',
+    'enrichments.dst_ip.malicious': 'int8',
+    'enrichments.src_ip.malicious': 'int8',
+    'enrichments.victim.in_range': 'int8',
+    'reliability': 'int16',
+    'original_reliability': 'int16',
+    'number': 'int32',
+}
+# IP 列存为 uint32（可空），无法解析为 IPv4 的值为 <NA>；存在 IPv6 等地址时可改为 'category'
+IP_COLUMNS = ['src_ip', 'dst_ip']
+IP_DTYPE = 'UInt32'
+
+
+def _to_integer(series, dtype):
+    """值全为整数且在 dtype 范围内时转换为该整数类型，否则原样返回。"""
+    values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+    info = np.iinfo(dtype)
+    if (np.isfinite(values).all() and (values == np.floor(values)).all()
+            and (values.size == 0 or (values.min() >= info.min and values.max() <= info.max))):
+        return series.astype(dtype)
+    return series
+
+
+def apply_compact_schema(df):
+    """
+    按紧凑类型定义转换清洗结果的各列（原地修改）。
+
+    参数:
+        df (pandas.DataFrame): _clean_frame 产生的清洗结果。
+
+    返回:
+        pandas.DataFrame: 转换后的 DataFrame。
+    """
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            try:
+                df[col] = df[col].astype('category')
+            except TypeError:
+                # 列中含有列表等不可哈希的值，保留为 object
+                pass
+    if 'day_of_week' in df.columns:
+        df['day_of_week'] = df['day_of_week'].astype(DAY_OF_WEEK_DTYPE)
+    for col, dtype in INTEGER_COLUMNS.items():
+        if col in df.columns:
+            df[col] = _to_integer(df[col], dtype)
+    for col in IP_COLUMNS:
+        if col in df.columns:
+            df[col] = ipv4_to_uint32(df[col]) if IP_DTYPE == 'UInt32' else df[col].astype(IP_DTYPE)
+    return df
+
+
+def ip_columns_to_text(df):
+    """返回把 uint32 IP 列还原为点分十进制字符串后的副本，用于导出 CSV 等人工查看的场景。"""
+    columns = [col for col in IP_COLUMNS if col in df.columns and df[col].dtype == 'UInt32']
+    if not columns:
+        return df
+    df = df.copy()
+    for col in columns:
+        df[col] = uint32_to_ipv4(df[col])
+    return df
+
+
+def expand_compact_columns(df):
+    """返回以 object / 64 位数值保存各列的副本，即未使用紧凑类型时的表示，用于对比内存占用。"""
+    df = ip_columns_to_text(df)
+    expanded = {}
+    for col, dtype in df.dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype):
+            expanded[col] = object
+        elif pd.api.types.is_integer_dtype(dtype):
+            expanded[col] = 'int64'
+    return df.astype(expanded)
+
+
+def memory_report(df):
+    """
+    打印 df.info(memory_usage='deep')，并与未使用紧凑类型时的内存占用对比。
+
+    返回:
+        tuple: (紧凑类型字节数, 宽类型字节数)。
+    """
+    df.info(memory_usage='deep')
+    compact_bytes = df.memory_usage(deep=True).sum()
+    wide_bytes = expand_compact_columns(df).memory_usage(deep=True).sum()
+    ratio = wide_bytes / compact_bytes if compact_bytes else 0
+    print(f"内存占用: {compact_bytes / 1024 ** 2:.2f} MB（未使用紧凑类型时 {wide_bytes / 1024 ** 2:.2f} MB，"
+          f"减少 {ratio:.1f} 倍）")
+    return compact_bytes, wide_bytes
@@ -0,0 +1,174 @@
+import hashlib
+import json
+import re
+import sqlite3
+
+# 持久化事件库的默认位置
+DEFAULT_STORE_PATH = '../temp_files/event_store.sqlite'
+# 作为事件唯一标识的字段，按顺序取第一个存在的；都不存在时使用记录内容的哈希
+EVENT_ID_FIELDS = ('event_id', 'uuid', 'id')
+# 每次写入数据库的记录条数
+INSERT_BATCH_SIZE = 50000
+# 导入时只解析时间戳不早于“库中最大时间戳 - 该窗口”的行（毫秒）。每份导出都包含全部历史，
+# 窗口之前的事件已在之前的导出中入库；窗口用于容纳少量迟到的事件
+LATE_EVENT_WINDOW_MS = 3600 * 1000
+# 在原始行中直接查找时间戳，不必先解析整行 JSON
+TIMESTAMP_PATTERN = re.compile(r'"timestamp"\s*:\s*"?(-?[0-9]+(?:\.[0-9]+)?)')
+# 计算文件哈希时每次读取的字节数
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def event_key(record):
+    """
+    计算事件的去重键 (timestamp_ms, event_id)。
+
+    参数:
+        record (dict): 一条原始 JSON 记录。
+
+    返回:
+        tuple: (int, str)，时间戳无法解析时为 -1。
+    """
+    try:
+        timestamp_ms = int(float(record.get('timestamp')))
+    except (TypeError, ValueError):
+        timestamp_ms = -1
+
+    for field in EVENT_ID_FIELDS:
+        value = record.get(field)
+        if value not in (None, ''):
+            return timestamp_ms, str(value)
+
+    content = json.dumps(record, sort_keys=True, ensure_ascii=False)
+    return timestamp_ms, hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+def line_before(line, cutoff_ms):
+    """
+    不解析 JSON，判断原始行的时间戳是否早于 cutoff_ms。
+
+    行中所有 "timestamp" 字段（包括嵌套的）都早于 cutoff_ms 时才返回 True；找不到时间戳时返回 False，
+    交给完整解析处理，因此不会误跳过新事件。
+    """
+    values = TIMESTAMP_PATTERN.findall(line)
+    return bool(values) and max(float(value) for value in values) < cutoff_ms
+
+
+def file_sha256(file_path):
+    """计算文件内容的 SHA-256。"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class EventStore:
+    """
+    基于 SQLite 的持久化事件库。
+
+    每次导出的 JSON Lines 追加写入事件库，按 (timestamp_ms, event_id) 去重，原始行原样保存。
+    已导入的文件按内容哈希记录在 files 表中，不会再次读取；新文件中时间戳早于库中最大时间戳减去
+    LATE_EVENT_WINDOW_MS 的行直接跳过，只有其余的行才解析 JSON，导入耗时只与新增事件数有关。
+    每条事件按写入顺序获得递增的序号 seq，清洗进度以已清洗的最大序号（高水位）记录在 meta 表中，
+    因此窗口内迟到的事件即使时间戳早于已清洗的数据，也不会被漏掉。
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS events (
+                seq INTEGER PRIMARY KEY,
+                timestamp_ms INTEGER NOT NULL,
+                event_id TEXT NOT NULL,
+                data TEXT NOT NULL,
+                UNIQUE (timestamp_ms, event_id)
+            )
+        ''')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS files (sha256 TEXT PRIMARY KEY, path TEXT, new_events INTEGER)')
+        self.conn.commit()
+
+    def ingest(self, file_path):
+        """
+        将一份 JSON Lines 导出追加到事件库；内容相同的文件只导入一次，已存在的事件被忽略。
+
+        参数:
+            file_path (str): envet_log JSON 文件的路径。
+
+        返回:
+            int: 新增的事件数。
+        """
+        sha256 = file_sha256(file_path)
+        if self.conn.execute('SELECT 1 FROM files WHERE sha256 = ?', (sha256,)).fetchone():
+            return 0
+
+        before = self.conn.total_changes
+        cutoff_ms = self.max_timestamp_ms() - LATE_EVENT_WINDOW_MS
+        rows = []
+        with open(file_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.rstrip('\n')
+                if not line.strip() or line_before(line, cutoff_ms):
+                    continue
+                rows.append(event_key(json.loads(line)) + (line,))
+                if len(rows) >= INSERT_BATCH_SIZE:
+                    self._insert(rows)
+                    rows = []
+        if rows:
+            self._insert(rows)
+        new_events = self.conn.total_changes - before
+        self.conn.execute('INSERT INTO files VALUES (?, ?, ?)', (sha256, file_path, new_events))
+        self.conn.commit()
+        return new_events
+
+    def _insert(self, rows):
+        self.conn.executemany(
+            'INSERT OR IGNORE INTO events (timestamp_ms, event_id, data) VALUES (?, ?, ?)', rows)
+
+    def max_timestamp_ms(self):
+        """返回事件库中最大的时间戳（毫秒），空库为 -1（不跳过任何行）。"""
+        row = self.conn.execute('SELECT MAX(timestamp_ms) FROM events').fetchone()
+        return row[0] if row[0] is not None else -1
+
+    def max_seq(self):
+        """返回事件库中最大的序号，空库为 0。"""
+        return self.conn.execute('SELECT COALESCE(MAX(seq), 0) FROM events').fetchone()[0]
+
+    def cleaned_seq(self):
+        """返回已清洗事件的高水位序号。"""
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'cleaned_seq'").fetchone()
+        return int(row[0]) if row else 0
+
+    def set_cleaned_seq(self, seq):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('cleaned_seq', ?)", (str(seq),))
+        self.conn.commit()
+
+    def iter_batches(self, after_seq, upto_seq, batch_size):
+        """
+        按写入顺序分批读取序号在 (after_seq, upto_seq] 之间的事件。
+
+        返回:
+            generator: 逐批产出原始记录 (dict) 列表。
+        """
+        last_seq = after_seq
+        while True:
+            rows = self.conn.execute(
+                'SELECT seq, data FROM events WHERE seq > ? AND seq <= ? ORDER BY seq LIMIT ?',
+                (last_seq, upto_seq, batch_size)).fetchall()
+            if not rows:
+                return
+            last_seq = rows[-1][0]
+            yield [json.loads(data) for _, data in rows]
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,198 @@
+import glob
+import os
+
+import pandas as pd
+
+# 中间数据文件的扩展名与存储格式的对应关系。
+# Parquet / Feather(Arrow IPC) 为列式格式，保留时间戳、分类和数值列的类型；CSV 仅作为可选导出。
+FORMATS = {
+    '.parquet': 'parquet',
+    '.feather': 'feather',
+    '.arrow': 'feather',
+    '.csv': 'csv',
+}
+
+
+def frame_format(path):
+    """根据扩展名返回存储格式: 'parquet'、'feather' 或 'csv'。"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in FORMATS:
+        raise ValueError(f"不支持的中间文件格式: {path}（支持 {', '.join(FORMATS)}）")
+    return FORMATS[ext]
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError("列式中间文件需要 pyarrow，请安装: pip install pyarrow")
+    return pyarrow
+
+
+def write_frame(df, path):
+    """
+    将 DataFrame 写入中间文件，格式由扩展名决定。
+
+    参数:
+        df (pandas.DataFrame): 要写入的数据。
+        path (str): 输出文件路径。
+    """
+    fmt = frame_format(path)
+    if fmt == 'csv':
+        df.to_csv(path, index=False)
+        return
+    _require_pyarrow()
+    if fmt == 'parquet':
+        df.to_parquet(path, index=False)
+    else:
+        df.reset_index(drop=True).to_feather(path)
+
+
+def part_files(directory):
+    """返回分片目录中的列式分片文件（按文件名排序，即写入顺序）。"""
+    return sorted(glob.glob(os.path.join(directory, '*.parquet')) + glob.glob(os.path.join(directory, '*.feather')))
+
+
+def read_frame(path, columns=None):
+    """
+    读取中间文件，path 也可以是由多个列式分片组成的目录（增量清洗的输出）。
+
+    参数:
+        path (str): 中间文件或分片目录路径。
+        columns (list): 只读取这些列；列式格式下未选中的列不会被解码。
+
+    返回:
+        pandas.DataFrame: 读取的数据。
+    """
+    if os.path.isdir(path):
+        parts = part_files(path)
+        if not parts:
+            raise FileNotFoundError(f"分片目录中没有中间文件: {path}")
+        frames = []
+        for part in parts:
+            part_columns = None if columns is None else [c for c in columns if c in frame_columns(part)]
+            frames.append(read_frame(part, columns=part_columns))
+        # 各分片的列可能不完全相同，缺失的列补为空值
+        return concat_frames(frames).reindex(columns=columns or frame_columns(path))
+
+    fmt = frame_format(path)
+    if fmt == 'csv':
+        return pd.read_csv(path, usecols=columns)
+    _require_pyarrow()
+    if fmt == 'parquet':
+        return pd.read_parquet(path, columns=columns)
+    return pd.read_feather(path, columns=columns)
+
+
+def frame_columns(path):
+    """只读取文件头/元数据，返回中间文件中的列名列表；分片目录返回各分片列名的并集。"""
+    if os.path.isdir(path):
+        columns = {}
+        for part in part_files(path):
+            columns.update(dict.fromkeys(frame_columns(part)))
+        return list(columns)
+
+    fmt = frame_format(path)
+    if fmt == 'csv':
+        return list(pd.read_csv(path, nrows=0).columns)
+    pa = _require_pyarrow()
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.read_schema(path).names
+    with pa.memory_map(path) as source:
+        return pa.ipc.open_file(source).schema.names
+
+
+def arrow_schema(df):
+    """返回 DataFrame 对应的 Arrow schema（不含索引），供 FrameWriter 合并各批 schema 使用。"""
+    pa = _require_pyarrow()
+    return pa.Schema.from_pandas(df, preserve_index=False)
+
+
+def merge_arrow_schemas(left, right):
+    """合并两批数据的 Arrow schema：整数与浮点合并为浮点，全空列取另一批的类型。"""
+    if left is None:
+        return right
+    pa = _require_pyarrow()
+    # pandas 元数据记录的是单批的 dtype，合并后以最终写入的数据为准
+    return pa.unify_schemas([left.remove_metadata(), right.remove_metadata()], promote_options='permissive')
+
+
+def with_pandas_metadata(schema, dtypes):
+    """
+    为合并后的 Arrow schema 补上按最终 dtype 生成的 pandas 元数据。
+
+    merge_arrow_schemas 会去掉单批的元数据，补上后读取时可以还原 category、UInt32 等类型。
+    """
+    pa = _require_pyarrow()
+    empty = pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in dtypes.items()})
+    return schema.with_metadata(pa.Schema.from_pandas(empty, preserve_index=False).metadata)
+
+
+def concat_frames(frames):
+    """
+    拼接多个分片的数据；各分片中同一分类列的类别不同时先合并类别，避免结果退化为 object。
+    """
+    categorical = {}
+    for frame in frames:
+        for col, dtype in frame.dtypes.items():
+            if isinstance(dtype, pd.CategoricalDtype):
+                categorical.setdefault(col, []).append(dtype.categories)
+    for col, categories in categorical.items():
+        if len(categories) < len(frames):
+            # 并非所有分片中都是分类列，交给 pandas 按 object 拼接
+            continue
+        union = categories[0].append(categories[1:]).unique()
+        frames = [frame.assign(**{col: frame[col].cat.set_categories(union)}) for frame in frames]
+    return pd.concat(frames, ignore_index=True)
+
+
+class FrameWriter:
+    """
+    分批追加写入中间文件，用于流式清洗。
+
+    CSV 直接追加；Parquet 每批写入一个 row group，Feather 每批写入一个 record batch。
+    列式格式需要预先给出全量数据的 Arrow schema，保证各批类型一致。
+    """
+
+    def __init__(self, path, schema=None):
+        self.path = path
+        self.format = frame_format(path)
+        self.schema = schema
+        self._writer = None
+        self._sink = None
+        self._wrote_header = False
+        if self.format != 'csv' and schema is None:
+            raise ValueError(f"写入 {self.format} 文件需要提供 Arrow schema: {path}")
+
+    def write(self, df):
+        if self.format == 'csv':
+            df.to_csv(self.path, index=False, header=not self._wrote_header,
+                      mode='a' if self._wrote_header else 'w')
+            self._wrote_header = True
+            return
+
+        pa = _require_pyarrow()
+        table = pa.Table.from_pandas(df, schema=self.schema, preserve_index=False)
+        if self._writer is None:
+            if self.format == 'parquet':
+                import pyarrow.parquet as pq
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            else:
+                self._sink = pa.OSFile(self.path, 'wb')
+                self._writer = pa.ipc.new_file(self._sink, table.schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._sink is not None:
+            self._sink.close()
+            self._sink = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+# 需要从嵌套字段中展开的列: {输出列名: 以 '.' 分隔的路径}
+# 原始记录中的 dns、enrichments 为嵌套对象；若导出中已是扁平的 'enrichments.dst_ip.malicious' 键，则以扁平值为准
+NESTED_FIELDS = {
+    'dns_query': 'dns.query',
+    'dns_qtype_name': 'dns.qtype_name',
+    'dns_rcode_name': 'dns.rcode_name',
+    'enrichments.dst_ip.malicious': 'enrichments.dst_ip.malicious',
+    'enrichments.src_ip.malicious': 'enrichments.src_ip.malicious',
+    'enrichments.victim.in_range': 'enrichments.victim.in_range',
+}
+
+
+def _extract_level(values, positions, targets, columns):
+    """
+    逐层取值：values 为当前层的 dict 列表，positions 为它们所在的行号。
+
+    同一前缀的路径共用一次取值，只有取到 dict 的行才进入下一层。
+    """
+    groups = {}
+    for index, keys in targets:
+        if not keys:
+            columns[index][positions] = values
+        elif len(keys) == 1:
+            columns[index][positions] = [value.get(keys[0]) for value in values]
+        else:
+            groups.setdefault(keys[0], []).append((index, keys[1:]))
+
+    for key, sub_targets in groups.items():
+        children = [value.get(key) for value in values]
+        keep = [i for i, child in enumerate(children) if isinstance(child, dict)]
+        _extract_level([children[i] for i in keep], positions[keep], sub_targets, columns)
+
+
+def extract_nested_fields(df, fields=None):
+    """
+    展开嵌套字段（原地添加列）。
+
+    同一顶层字段（如 dns）下的所有路径一起处理：先找出该列中是 dict 的行，再逐层取值，
+    不再为每个子字段单独 apply；新增字段（如 'dns_answers': 'dns.answers'）只需在 fields 中声明。
+
+    参数:
+        df (pandas.DataFrame): 由原始 JSON 记录构成的 DataFrame。
+        fields (dict): {输出列名: 路径}，默认 NESTED_FIELDS。
+
+    返回:
+        pandas.DataFrame: 添加了展开列的 DataFrame；顶层字段不存在时对应列为 None。
+    """
+    if fields is None:
+        fields = NESTED_FIELDS
+
+    by_root = {}
+    for column, path in fields.items():
+        root, *keys = path.split('.')
+        by_root.setdefault(root, []).append((column, path, keys))
+
+    for root, targets in by_root.items():
+        columns = [np.full(len(df), None, dtype=object) for _ in targets]
+        if root in df.columns:
+            values = df[root].to_numpy()
+            positions = np.array([i for i, value in enumerate(values) if isinstance(value, dict)], dtype=np.intp)
+            _extract_level(list(values[positions]), positions,
+                           [(index, keys) for index, (_, _, keys) in enumerate(targets)], columns)
+
+        for (column, path, _), extracted in zip(targets, columns):
+            if root not in df.columns and column not in df.columns and column == path:
+                # 输出列名与路径相同的字段（导出中可能是扁平键）在数据中都不存在时不添加
+                continue
+            extracted = pd.Series(extracted, index=df.index)
+            if column in df.columns and column != root:
+                # 扁平键已存在时，只用嵌套值补齐其缺失的行
+                df[column] = df[column].where(df[column].notna(), extracted)
+            else:
+                df[column] = extracted
+    return df
@@ -0,0 +1,92 @@
+import json
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# 城市/国家标准化映射文件（位于本模块所在目录，与运行目录无关），格式:
+#   {"countries": {"China": "CN", ...}, "cities": {"Peking": "Beijing", ...}}
+# 城市映射的键为首字母大写后的城市名；默认文件不存在时提示并使用 DEFAULT_COUNTRY_MAPPING
+NORMALIZATION_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'normalization.json')
+DEFAULT_COUNTRY_MAPPING = {
+    'China': 'CN',
+    'CN': 'CN',
+}
+
+CITY_COLUMNS = ['src_ip_city', 'dst_ip_city', 'victim_city']
+COUNTRY_COLUMNS = ['dst_ip_country', 'victim_country_code']
+
+
+@lru_cache(maxsize=None)
+def load_mappings(path=None):
+    """
+    读取标准化映射文件（按路径缓存，流式清洗的每批只读取一次）。
+
+    参数:
+        path (str): 映射文件路径，默认 NORMALIZATION_PATH。显式指定的文件不存在时抛出 FileNotFoundError；
+            默认文件不存在时给出提示，只使用 DEFAULT_COUNTRY_MAPPING。
+
+    返回:
+        tuple: (国家映射 dict, 城市映射 dict)。
+    """
+    if path is None:
+        if not os.path.exists(NORMALIZATION_PATH):
+            print(f"⚠️ 未找到标准化映射文件 {NORMALIZATION_PATH}，只使用内置的国家映射")
+            return dict(DEFAULT_COUNTRY_MAPPING), {}
+        path = NORMALIZATION_PATH
+    elif not os.path.exists(path):
+        raise FileNotFoundError(f"标准化映射文件不存在: {path}")
+    with open(path, 'r', encoding='utf-8') as f:
+        mappings = json.load(f)
+    return mappings.get('countries', {}), mappings.get('cities', {})
+
+
+def map_unique(series, func, na_value=np.nan):
+    """
+    只对去重后的取值调用 func，再按编码展开到整列。
+
+    参数:
+        series (pandas.Series): 要转换的列。
+        func (callable): 作用于单个取值的转换函数。
+        na_value: 空值对应的结果。
+
+    返回:
+        pandas.Series: 与 series 同索引的 object 列。
+    """
+    codes, uniques = pd.factorize(series)
+    # 末尾追加空值的结果，factorize 的 -1 编码正好取到它
+    mapped = np.array([func(value) for value in uniques] + [na_value], dtype=object)
+    return pd.Series(mapped[codes], index=series.index, name=series.name)
+
+
+def normalize_city(value, city_mapping):
+    """城市名首字母大写（'Unknown' 保持不变），再按映射统一写法。"""
+    text = str(value)
+    if text != 'Unknown':
+        text = text.title()
+    return city_mapping.get(text, text)
+
+
+def normalize_locations(df, path=None):
+    """
+    标准化城市与国家列（原地修改），每列只处理去重后的取值。
+
+    参数:
+        df (pandas.DataFrame): 清洗中的 DataFrame。
+        path (str): 映射文件路径，默认 NORMALIZATION_PATH。
+
+    返回:
+        pandas.DataFrame: 标准化后的 DataFrame。
+    """
+    country_mapping, city_mapping = load_mappings(path)
+
+    for col in COUNTRY_COLUMNS:
+        if col in df.columns:
+            df[col] = map_unique(df[col], lambda value: country_mapping.get(value, value))
+
+    # 缺失的城市与其他分类列一样记为 'Unknown'
+    for col in CITY_COLUMNS:
+        if col in df.columns:
+            df[col] = map_unique(df[col], lambda value: normalize_city(value, city_mapping), na_value='Unknown')
+    return df
@@ -1,18 +1,66 @@
-import pandas as pd
+import os
+import sys
 
-# 读取 CSV 文件
-df = pd.read_csv('../temp_files/cleaned_data.csv')
+from event_schema import ip_columns_to_text
+from frame_store import frame_columns, read_frame, write_frame
 
-# 选择 dns_query 列不为空的行（既排除NaN也排除空字符串）
-col = 'dns_query'
-filtered_df = df[df[col].notna() & (df[col].astype(str).str.strip() != '')]
+# tracing 位于仓库根目录，与 Display 共用
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from tracing import enable_from_env, span  # noqa: E402
 
-filtered_df = filtered_df.drop(columns=['src_ip_city', 'dst_ip_city', 'dst_ip_country', 'victim_city', 'victim_country_code',
-                                        'sub_category', 'kill_chain', 'intel_type', 'tags', 'proto','interface', 'enrichments.dst_ip.malicious',
-                                        'enrichments.src_ip.malicious', 'number', 'enrichments.victim.in_range', 'parsed_method',
-                                        'parsed_status_code','parsed_host','parsed_uri'])
-# 保存结果
-filtered_df.to_csv('../temp_files/filtered_data.csv', index=False)
+# 清洗结果（由 clean.py 生成）：增量模式下为分片目录，非增量模式下为 '../temp_files/cleaned_data.parquet'
+CLEANED_DATA_PATH = '../temp_files/cleaned_parts'
+# 筛选结果的中间文件
+FILTERED_DATA_PATH = '../temp_files/filtered_data.parquet'
+# 可选：同时导出一份 CSV，便于人工查看
+EXPORT_CSV = False
+FILTERED_CSV_PATH = '../temp_files/filtered_data.csv'
 
-# 查看前几行验证
-print(filtered_df.head())
+# DNS 事件分析中不需要的列
+DROP_COLUMNS = ['src_ip_city', 'dst_ip_city', 'dst_ip_country', 'victim_city', 'victim_country_code',
+                'sub_category', 'kill_chain', 'intel_type', 'tags', 'proto', 'interface', 'enrichments.dst_ip.malicious',
+                'enrichments.src_ip.malicious', 'number', 'enrichments.victim.in_range', 'parsed_method',
+                'parsed_status_code', 'parsed_host', 'parsed_uri']
+
+
+def select_dns_rows(df, column='dns_query'):
+    """
+    选择 DNS 查询不为空的行（既排除 NaN 也排除空字符串）。
+
+    参数:
+        df (pandas.DataFrame): 清洗后的数据。
+        column (str): DNS 查询列名。
+
+    返回:
+        pandas.DataFrame: 筛选后的数据。
+    """
+    return df[df[column].notna() & (df[column].astype(str).str.strip() != '')]
+
+
+def main():
+    """读取清洗结果，筛选 DNS 事件并写入 FILTERED_DATA_PATH。"""
+    # 设置了 ENVET_TRACE 等环境变量时记录各步骤的耗时与内存
+    enable_from_env()
+
+    # 只读取保留的列（列式存储下被丢弃的列不会被解码）
+    with span('read_frame', path=CLEANED_DATA_PATH) as traced:
+        keep_columns = [c for c in frame_columns(CLEANED_DATA_PATH) if c not in DROP_COLUMNS]
+        df = read_frame(CLEANED_DATA_PATH, columns=keep_columns)
+        traced.set(rows=len(df))
+
+    with span('select_dns_rows') as traced:
+        filtered_df = select_dns_rows(df)
+        traced.set(rows=len(filtered_df))
+
+    # 保存结果
+    with span('write_frame', path=FILTERED_DATA_PATH):
+        write_frame(filtered_df, FILTERED_DATA_PATH)
+        if EXPORT_CSV:
+            ip_columns_to_text(filtered_df).to_csv(FILTERED_CSV_PATH, index=False)
+
+    # 查看前几行验证
+    print(filtered_df.head())
+
+
+if __name__ == "__main__":
+    main()
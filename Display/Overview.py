@@ -1,16 +1,20 @@
-import glob
-
+import argparse
 import pandas as pd
 from collections import defaultdict
 from datetime import datetime
 import matplotlib.pyplot as plt
 
+from export_batch import find_exports, latest_export
+from rollup_cube import RollupCube
+from threat_stats import time_histograms
+from xlsx_cache import load_export
+
 
 def generate_threat_report(log_file):
     # 读取日志文件
     try:
-        # 使用openpyxl引擎读取Excel文件，避免样式警告
-        df = pd.read_excel(log_file, header=0, engine='openpyxl')
+        # 通过共享缓存读取，同一份导出只用openpyxl解析一次
+        df = load_export(log_file)
         print("检测到的列名:", df.columns.tolist())
     except Exception as e:
         return f"Error reading log file: {str(e)}"
@@ -36,6 +40,23 @@ def generate_threat_report(log_file):
     return report
 
 
+def generate_cube_report(start=None, end=None):
+    """
+    由按小时预聚合的立方体生成报告，先把 downloads 下新增的导出累加到立方体。
+
+    参数:
+        start, end (str | datetime): 报告的时间范围（小时粒度），为 None 时不限制。
+
+    返回:
+        tuple: (报告文本, threat_stats)。立方体中没有目的IP，不包含恶意目的IP部分。
+    """
+    with RollupCube() as cube:
+        cube.ingest_exports(find_exports())
+        threat_stats = cube.aggregate(start, end).to_threat_stats()
+        first, last = cube.hour_range(start, end)
+    return create_report(threat_stats, period=f"{first} 至 {last}"), threat_stats
+
+
 def analyze_threats(df, time_column):
     # 定义列名映射
     column_mapping = {
@@ -62,17 +83,14 @@ def analyze_threats(df, time_column):
         'source_ips': df[column_mapping['src_ip']].value_counts().to_dict(),
         'destination_ips': df[column_mapping['dst_ip']].value_counts().to_dict(),
         'time_distribution': defaultdict(int),
+        'weekday_hour_matrix': [[0] * 24 for _ in range(7)],
         'top_malicious_ips': {},
         'common_ports': df[column_mapping['dst_port']].value_counts().head(10).to_dict(),
         'protocols': df[column_mapping['protocol']].value_counts().to_dict()
     }
 
-    # 按小时统计事件分布
-    for time in df[time_column]:
-        if pd.isna(time):
-            continue  # 跳过空值
-        hour = time.hour
-        threat_stats['time_distribution'][hour] += 1
+    # 按小时统计事件分布（向量化，空值被跳过），同时得到星期×小时矩阵
+    threat_stats['time_distribution'], _, threat_stats['weekday_hour_matrix'] = time_histograms(df[time_column])
 
     # 统计恶意IP
     if 'threat-intelligence-alarm' in threat_stats['threat_categories']:
@@ -83,12 +101,14 @@ def analyze_threats(df, time_column):
     return threat_stats
 
 
-def create_report(threat_stats, df, time_column):
-    # 报告头部
+def create_report(threat_stats, df=None, time_column='发现时间', period=None):
+    # 报告头部；没有原始数据（由立方体汇总）时使用传入的时间段
+    if period is None:
+        period = f"{df[time_column].min()} 至 {df[time_column].max()}"
     report = f"""
     ==================== 网络安全威胁报告 ====================
     生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-    分析时间段: {df[time_column].min()} 至 {df[time_column].max()}
+    分析时间段: {period}
     总事件数: {threat_stats['total_events']}
     ========================================================
 
@@ -178,25 +198,34 @@ def save_visualizations(threat_stats, output_dir="."):
 
 
 if __name__ == "__main__":
-    files = glob.glob("../downloads/*envet_log*.xlsx")
-    if not files:
+    parser = argparse.ArgumentParser(description='生成文本威胁报告和可视化图表')
+    parser.add_argument('--cube', action='store_true', help='由预聚合立方体汇总全部导出，默认只读取最新的一份')
+    parser.add_argument('--start', help='起始时间（--cube 时有效），例如 2025-07-01')
+    parser.add_argument('--end', help='结束时间（--cube 时有效），只给日期时包含当天全天')
+    args = parser.parse_args()
+
+    # 最新的一份导出；跨多天的报告使用 --cube 或 report.py --all
+    log_file = latest_export()
+    if log_file is None:
         print("❌ ../downloads/ 目录下未找到匹配 'envet_log*.xlsx' 的文件。")
         exit()
 
-    log_file = files[0]
-
     try:
-        report = generate_threat_report(log_file)
+        if args.cube:
+            report, threat_stats = generate_cube_report(args.start, args.end)
+        else:
+            report = generate_threat_report(log_file)
+
+            # 生成可视化图表
+            df = load_export(log_file)
+            time_column = '发现时间'
+            df[time_column] = pd.to_datetime(df[time_column], format='%Y-%m-%d %H:%M:%S')
+            threat_stats = analyze_threats(df, time_column)
 
         # 保存报告
         with open("threat_report.txt", "w", encoding="utf-8") as f:
             f.write(report)
 
-        # 生成可视化图表
-        df = pd.read_excel(log_file, header=0, engine='openpyxl')
-        time_column = '发现时间'
-        df[time_column] = pd.to_datetime(df[time_column], format='%Y-%m-%d %H:%M:%S')
-        threat_stats = analyze_threats(df, time_column)
         save_visualizations(threat_stats)
 
         print("威胁报告已生成: threat_report.txt")
@@ -0,0 +1,170 @@
+import ipaddress
+import math
+import os
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from export_batch import filter_time_range
+
+# select_rows.py 输出的 DNS 事件
+DNS_DATA_PATH = '../temp_files/filtered_data.parquet'
+DNS_COLUMNS = ['timestamp', 'src_ip', 'dns_query', 'dns_rcode_name']
+
+# 由两段组成的公共后缀，注册域名需要再多取一段（例如 example.com.cn）
+MULTI_PART_SUFFIXES = {
+    'com.cn', 'net.cn', 'org.cn', 'gov.cn', 'edu.cn', 'ac.cn', 'mil.cn',
+    'com.hk', 'com.tw', 'co.jp', 'ne.jp', 'or.jp', 'co.kr', 'co.uk', 'org.uk', 'ac.uk',
+    'com.au', 'net.au', 'org.au', 'com.br', 'com.sg', 'co.in', 'co.nz', 'in-addr.arpa', 'ip6.arpa',
+}
+# 疑似 DGA 域名的判定阈值：注册域名主体部分的字符熵与长度
+DGA_ENTROPY_THRESHOLD = 3.5
+DGA_MIN_LENGTH = 10
+
+
+def load_dns_events(path=DNS_DATA_PATH):
+    """只读取分析需要的列；path 可以是 .parquet 或 .csv。"""
+    if path.lower().endswith('.csv'):
+        columns = pd.read_csv(path, nrows=0).columns
+        return pd.read_csv(path, usecols=[c for c in DNS_COLUMNS if c in columns], parse_dates=['timestamp'])
+    import pyarrow.parquet as pq
+    columns = pq.read_schema(path).names
+    return pd.read_parquet(path, columns=[c for c in DNS_COLUMNS if c in columns])
+
+
+def registered_domain(domain):
+    """
+    返回域名的注册域名（eTLD+1 的近似）：默认取最后两段，公共后缀为两段时取最后三段。
+
+    参数:
+        domain (str): 已转为小写、去掉末尾点号的域名。
+    """
+    labels = domain.split('.')
+    if len(labels) <= 2:
+        return domain
+    count = 3 if '.'.join(labels[-2:]) in MULTI_PART_SUFFIXES else 2
+    return '.'.join(labels[-count:])
+
+
+def shannon_entropy(text):
+    """字符串的香农熵（比特/字符），随机生成的域名通常明显高于自然单词。"""
+    if not text:
+        return 0.0
+    length = len(text)
+    return -sum(count / length * math.log2(count / length) for count in Counter(text).values())
+
+
+def domain_features(domains):
+    """
+    对去重后的域名计算注册域名和 DGA 特征，字符串处理只在这里做一次。
+
+    参数:
+        domains (array-like): 去重后的域名（已规范化）。
+
+    返回:
+        pandas.DataFrame: 列 domain、registered_domain、entropy、label_length、dga_like。
+    """
+    registered = [registered_domain(domain) for domain in domains]
+    # 注册域名去掉公共后缀后的主体部分，如 xj3kd9a2.com 中的 xj3kd9a2
+    labels = [reg.split('.', 1)[0] for reg in registered]
+    entropy = np.array([shannon_entropy(label) for label in labels], dtype=np.float64)
+    length = np.array([len(label) for label in labels], dtype=np.int64)
+    return pd.DataFrame({
+        'domain': domains,
+        'registered_domain': registered,
+        'entropy': entropy,
+        'label_length': length,
+        'dga_like': (entropy >= DGA_ENTROPY_THRESHOLD) & (length >= DGA_MIN_LENGTH),
+    })
+
+
+def _ip_text(value):
+    """src_ip 可能是清洗时转换的 uint32，也可能是字符串。"""
+    if isinstance(value, (int, np.integer)):
+        return str(ipaddress.IPv4Address(int(value)))
+    return str(value)
+
+
+def analyze_dns(df, top_n=10):
+    """
+    DNS 域名分析：注册域名查询量、源IP访问的不同域名数、疑似 DGA 域名、首次/最后出现时间。
+
+    按原始查询串去重后再做字符串处理（规范化、取注册域名、计算熵），结果按编码展开，
+    聚合都在整数编码上进行，千万级行数也只需处理几十万个不同域名。
+
+    参数:
+        df (pandas.DataFrame): 含 timestamp、src_ip、dns_query 列的 DNS 事件（可选 dns_rcode_name）。
+        top_n (int): 各排行榜的条数。
+
+    返回:
+        dict: 分析结果，排行榜为 DataFrame。
+    """
+    df = df[df['dns_query'].notna()]
+    query_codes, raw_queries = pd.factorize(df['dns_query'])
+
+    # 规范化原始查询串后再去重一次，得到每行的域名编码
+    normalized = pd.Series(raw_queries, dtype=object).astype(str).str.strip().str.lower().str.rstrip('.')
+    domain_of_raw, domains = pd.factorize(normalized)
+    domain_codes = domain_of_raw[query_codes]
+
+    features = domain_features(domains)
+    reg_of_domain, registered = pd.factorize(features['registered_domain'])
+    reg_codes = reg_of_domain[domain_codes]
+
+    timestamps = pd.to_datetime(df['timestamp']).to_numpy()
+    src_codes, src_values = pd.factorize(df['src_ip'])
+    is_nx = (df['dns_rcode_name'].astype(object) == 'NXDOMAIN').to_numpy() \
+        if 'dns_rcode_name' in df.columns else np.zeros(len(df), dtype=bool)
+
+    events = pd.DataFrame({'reg': reg_codes, 'domain': domain_codes, 'src': src_codes,
+                           'time': timestamps, 'nx': is_nx})
+
+    # 注册域名：查询量、访问它的源IP数、NXDOMAIN 次数、首次/最后出现时间
+    by_reg = events.groupby('reg', sort=False).agg(
+        queries=('time', 'size'), nxdomain=('nx', 'sum'), first_seen=('time', 'min'), last_seen=('time', 'max'))
+    valid_src = events[events['src'] >= 0]
+    sources = valid_src[['reg', 'src']].drop_duplicates()['reg'].value_counts()
+    by_reg['sources'] = sources.reindex(by_reg.index, fill_value=0).to_numpy()
+    by_reg.index = registered[by_reg.index]
+    by_reg.index.name = 'registered_domain'
+    top_domains = by_reg.sort_values('queries', ascending=False).head(top_n)
+
+    # 源IP：查询量与访问的不同注册域名数
+    unique_domains = valid_src[['src', 'reg']].drop_duplicates()['src'].value_counts()
+    by_src = pd.DataFrame({'unique_domains': unique_domains,
+                           'queries': valid_src['src'].value_counts().reindex(unique_domains.index)})
+    top_sources = by_src.sort_values(['unique_domains', 'queries'], ascending=False).head(top_n)
+    top_sources.index = [_ip_text(value) for value in src_values[top_sources.index]]
+    top_sources.index.name = 'src_ip'
+
+    # 疑似 DGA：只对被判为 DGA 的完整域名做聚合
+    dga_domains = np.flatnonzero(features['dga_like'].to_numpy())
+    dga_events = events[np.isin(events['domain'].to_numpy(), dga_domains)]
+    by_dga = dga_events.groupby('domain', sort=False).agg(
+        queries=('time', 'size'), first_seen=('time', 'min'), last_seen=('time', 'max'))
+    by_dga = features.loc[by_dga.index, ['domain', 'registered_domain', 'entropy']].join(by_dga)
+    suspicious_domains = by_dga.sort_values(['entropy', 'queries'], ascending=False).head(top_n)
+
+    return {
+        'total_queries': len(events),
+        'unique_domains': len(domains),
+        'unique_registered_domains': len(registered),
+        'unique_sources': len(src_values),
+        'nxdomain_queries': int(is_nx.sum()),
+        'dga_like_domains': int(len(dga_domains)),
+        'dga_like_queries': len(dga_events),
+        'first_seen': events['time'].min() if len(events) else None,
+        'last_seen': events['time'].max() if len(events) else None,
+        'top_domains': top_domains.reset_index(),
+        'top_sources': top_sources.reset_index(),
+        'suspicious_domains': suspicious_domains.reset_index(drop=True),
+    }
+
+
+def analyze_dns_file(path=DNS_DATA_PATH, top_n=10, start=None, end=None):
+    """读取 select_rows.py 的输出并分析 [start, end] 范围内的查询，文件不存在时返回 None。"""
+    if not os.path.exists(path):
+        return None
+    df = filter_time_range(load_dns_events(path), start, end, time_column='timestamp')
+    return analyze_dns(df, top_n=top_n)
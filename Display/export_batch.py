@@ -0,0 +1,164 @@
+import glob
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from ip_ranges import DEFAULT_CLIENT_NETWORKS, classify_ip_type
+from threat_stats import ThreatAggregate
+from xlsx_cache import load_export
+
+# 每日导出累积在 downloads 目录，文件名带导出时间（envet_log-YYYYmmddHHMMSS.xlsx），按文件名排序即按导出时间排序
+EXPORT_PATTERN = '../downloads/*envet_log*.xlsx'
+# 事件的唯一标识，相邻导出的时间段重叠时按它去重
+EVENT_ID_COLUMN = '事件ID'
+TIME_COLUMN = '发现时间'
+
+
+def find_exports(pattern=EXPORT_PATTERN):
+    """返回所有匹配的导出文件，按文件名（导出时间）排序。"""
+    return sorted(glob.glob(pattern))
+
+
+def latest_export(pattern=EXPORT_PATTERN):
+    """返回最新的导出文件，没有匹配文件时返回 None。"""
+    files = find_exports(pattern)
+    return files[-1] if files else None
+
+
+def _map(func, args_list, max_workers=None):
+    """在进程池中对每组参数调用 func；max_workers 为 1 或只有一组参数时在当前进程执行。"""
+    if len(args_list) <= 1 or max_workers == 1:
+        return [func(*args) for args in args_list]
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(func, *zip(*args_list)))
+
+
+def load_exports(files, max_workers=None):
+    """
+    在进程池中并行读取多份导出，合并后去除重复事件。
+
+    每份导出经 xlsx_cache 读取，首次解析 Excel 的开销分摊到多个进程；重复事件保留最新导出中的那一条。
+
+    参数:
+        files (list): 导出文件路径，按导出时间排序。
+        max_workers (int): 进程数，默认为 CPU 核数；为 1 或只有一个文件时在当前进程读取。
+
+    返回:
+        pandas.DataFrame: 合并后的事件。
+    """
+    if not files:
+        raise FileNotFoundError("未找到匹配 'envet_log*.xlsx' 的文件")
+    frames = _map(load_export, [(file_path,) for file_path in files], max_workers)
+
+    df = pd.concat(frames, ignore_index=True)
+    subset = [EVENT_ID_COLUMN] if EVENT_ID_COLUMN in df.columns else None
+    deduplicated = df.drop_duplicates(subset=subset, keep='last').reset_index(drop=True)
+    print(f"📚 合并 {len(files)} 份导出: {len(df):,} 行，去重后 {len(deduplicated):,} 行")
+    return deduplicated
+
+
+def filter_time_range(df, start=None, end=None, time_column=TIME_COLUMN):
+    """
+    按发现时间筛选 [start, end] 范围内的事件。
+
+    参数:
+        df (pandas.DataFrame): 事件数据。
+        start, end (str | datetime): 起止时间，为 None 时不限制；end 只给出日期（零点）时包含当天全天。
+
+    返回:
+        pandas.DataFrame: 筛选后的事件。
+    """
+    if start is None and end is None:
+        return df
+    times = pd.to_datetime(df[time_column])
+    mask = pd.Series(True, index=df.index)
+    if start is not None:
+        mask &= times >= pd.Timestamp(start)
+    if end is not None:
+        end = pd.Timestamp(end)
+        if end == end.normalize():
+            mask &= times < end + pd.Timedelta(days=1)
+        else:
+            mask &= times <= end
+    return df[mask]
+
+
+def prepare_events(df, client_networks=DEFAULT_CLIENT_NETWORKS, time_column=TIME_COLUMN):
+    """
+    导出数据的预处理：转换发现时间列，并按源IP是否属于客户端网段添加 IP类型 列。
+
+    参数:
+        df (pandas.DataFrame): load_export 读取的导出数据（原地修改）。
+        client_networks: 视为客户端的 CIDR 网段。
+
+    返回:
+        pandas.DataFrame: 预处理后的数据。
+    """
+    if time_column in df.columns:
+        try:
+            df[time_column] = pd.to_datetime(df[time_column], format='%Y-%m-%d %H:%M:%S')
+        except (ValueError, TypeError):
+            df[time_column] = pd.to_datetime(df[time_column])
+
+    # 源IP属于客户端网段（RFC1918 及内部网段）的为客户端
+    if '源IP' in df.columns:
+        df['IP类型'] = classify_ip_type(df['源IP'], client_networks)
+
+    return df
+
+
+def event_keys(df):
+    """每个事件的 64 位哈希键：有事件ID列时按事件ID，否则按整行内容，用于跨文件去重。"""
+    data = df[EVENT_ID_COLUMN] if EVENT_ID_COLUMN in df.columns else df
+    return pd.util.hash_pandas_object(data, index=False).to_numpy()
+
+
+def _export_keys(file_path):
+    return event_keys(load_export(file_path))
+
+
+def _aggregate_export(file_path, keep, client_networks, start, end, sketch):
+    """子进程中统计一份导出：只保留归属于本文件的事件，预处理并筛选时间范围后返回 ThreatAggregate。"""
+    df = load_export(file_path)
+    if keep is not None:
+        df = df[keep]
+    df = filter_time_range(prepare_events(df, client_networks), start, end)
+    return ThreatAggregate.from_frame(df, sketch)
+
+
+def aggregate_exports(files, client_networks=DEFAULT_CLIENT_NETWORKS, start=None, end=None, max_workers=None,
+                      sketch=None):
+    """
+    按文件并行统计多份导出并合并（map-reduce），不在主进程中拼接完整数据。
+
+    第一轮各进程只返回每个事件的哈希键，主进程据此确定重复事件归属最新的导出；
+    第二轮各进程读取一份导出，只统计归属于它的事件，返回可合并的 ThreatAggregate。
+    每个进程同时只持有一份导出，主进程只保存每个事件 8 字节的键和统计结果。
+
+    参数:
+        files (list): 导出文件路径，按导出时间排序。
+        client_networks: 视为客户端的 CIDR 网段。
+        start, end (str | datetime): 统计的时间范围，为 None 时不限制。
+        max_workers (int): 进程数，默认为 CPU 核数。
+        sketch (SketchConfig): 使用概要统计模式，见 ThreatAggregate。
+
+    返回:
+        ThreatAggregate: 合并后的统计结果。
+    """
+    if not files:
+        raise FileNotFoundError("未找到匹配 'envet_log*.xlsx' 的文件")
+
+    keeps = [None]
+    if len(files) > 1:
+        keys = _map(_export_keys, [(file_path,) for file_path in files], max_workers)
+        owned = ~pd.Series(np.concatenate(keys)).duplicated(keep='last').to_numpy()
+        keeps = np.split(owned, np.cumsum([len(k) for k in keys])[:-1])
+        print(f"📚 合并 {len(files)} 份导出: {len(owned):,} 行，去重后 {int(owned.sum()):,} 行")
+
+    aggregates = _map(_aggregate_export, [(file_path, keep, client_networks, start, end, sketch)
+                                          for file_path, keep in zip(files, keeps)], max_workers)
+    aggregate = aggregates[0]
+    for other in aggregates[1:]:
+        aggregate.merge(other)
+    return aggregate
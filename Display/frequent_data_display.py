@@ -1,39 +1,36 @@
-import pandas as pd
-from collections import Counter
-import glob
+from export_batch import find_exports, load_exports
+from ip_ranges import DEFAULT_CLIENT_NETWORKS, classify_ip_type
+from threat_stats import top_ip_threats
 
-# === Step 1: 找到 ../downloads/ 目录中包含 'event_log' 的 Excel 文件 ===
-files = glob.glob("../downloads/*envet_log*.xlsx")
+# 每类源IP列出的 TOP IP 个数
+TOP_N = 5
+# 视为客户端的 CIDR 网段（RFC1918 加内部网段）
+CLIENT_NETWORKS = DEFAULT_CLIENT_NETWORKS
+
+# === Step 1: 找到 ../downloads/ 目录中包含 'event_log' 的全部 Excel 文件 ===
+files = find_exports()
 if not files:
     print("❌ ../downloads/ 目录下未找到匹配 'envet_log*.xlsx' 的文件。")
     exit()
 
-file_path = files[0]
-print(f"📄 正在读取文件: {file_path}")
-
-# === Step 2: 读取数据 ===
-df = pd.read_excel(file_path)
+print(f"📄 正在读取 {len(files)} 个文件: {', '.join(files)}")
 
-# 判断是否是客户端源IP
-def is_client_ip(ip):
-    ip_str = str(ip)
-    return ip_str.startswith('172.') or ip_str.startswith('192.')
+# === Step 2: 读取数据（多份导出合并去重） ===
+# 本脚本在模块顶层执行，Windows 下进程池的子进程会重新执行整个脚本，因此在当前进程中读取
+df = load_exports(files, max_workers=1)
 
-# 添加 IP 类型列
-df['IP类型'] = df['源IP'].apply(lambda ip: '客户端' if is_client_ip(ip) else '服务端')
+# 添加 IP 类型列：源IP属于客户端网段的为客户端
+df['IP类型'] = classify_ip_type(df['源IP'], CLIENT_NETWORKS)
 
 # === Step 3: 分别处理客户端和服务端 ===
 
-def analyze_top_ips(sub_df, label):
-    print(f"\n🔍 前五频发的{label}源IP及其[威胁等级+名称]统计：")
-    top_ips = sub_df['源IP'].value_counts().head(5)
-    for ip, count in top_ips.items():
-        ip_rows = sub_df[sub_df['源IP'] == ip]
-        combined = zip(ip_rows['威胁等级'], ip_rows['威胁名称'])
-        threat_stat = Counter([f"[{level}] {name}" for level, name in combined])
-
-        print(f"\n📌 IP: {ip} （出现 {count} 次）")
-        for key, c in threat_stat.items():
+def analyze_top_ips(sub_df, label, top_n=TOP_N):
+    print(f"\n🔍 前{top_n}频发的{label}源IP及其[威胁等级+名称]统计：")
+    # 一次分组统计 TOP N 个IP的威胁等级和名称
+    ip_analysis = top_ip_threats(sub_df, top_n=top_n)
+    for ip, data in ip_analysis.items():
+        print(f"\n📌 IP: {ip} （出现 {data['count']} 次）")
+        for key, c in data['threats'].items():
             print(f" - {key}: {c}")
 
 # 客户端分析
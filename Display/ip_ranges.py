@@ -0,0 +1,113 @@
+import ipaddress
+import os
+import sys
+from bisect import bisect_right
+
+import numpy as np
+import pandas as pd
+
+# IPv4 解析位于仓库根目录，与 Clean 的紧凑类型转换共用
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from ipv4 import ipv4_to_uint32, parse_ipv4  # noqa: E402
+
+# RFC1918 私有地址段
+RFC1918_NETWORKS = ['10.0.0.0/8', '172.16.0.0/12', '192.168.0.0/16']
+# 本单位的其他内部网段（按需添加，例如 '202.118.64.0/20'）
+INTERNAL_NETWORKS = []
+# 默认视为客户端的网段
+DEFAULT_CLIENT_NETWORKS = RFC1918_NETWORKS + INTERNAL_NETWORKS
+
+
+def ipv4_to_int(ips):
+    """
+    将 IPv4 地址列向量化转换为整数，解析规则与清洗阶段的 ipv4_to_uint32 相同。
+
+    参数:
+        ips (pandas.Series): IP 地址列。
+
+    返回:
+        numpy.ndarray: int64 数组，无效地址（空值、IPv6、格式错误）为 -1。
+    """
+    return ipv4_to_uint32(pd.Series(ips)).to_numpy(dtype=np.int64, na_value=-1)
+
+
+def network_intervals(networks):
+    """
+    将 CIDR 列表转换为排序并合并后的整数区间。
+
+    参数:
+        networks (list): CIDR 字符串列表，例如 ['10.0.0.0/8']。
+
+    返回:
+        tuple: (starts, ends) 两个升序的 int64 数组，区间两端均包含。
+    """
+    ranges = sorted(
+        (int(net.network_address), int(net.broadcast_address))
+        for net in (ipaddress.IPv4Network(cidr, strict=False) for cidr in networks)
+    )
+    merged = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    starts = np.array([start for start, _ in merged], dtype=np.int64)
+    ends = np.array([end for _, end in merged], dtype=np.int64)
+    return starts, ends
+
+
+def in_networks(ips, networks=None):
+    """
+    向量化判断每个 IP 是否属于给定网段。
+
+    参数:
+        ips (pandas.Series): IP 地址列。
+        networks (list): CIDR 字符串列表，默认 DEFAULT_CLIENT_NETWORKS。
+
+    返回:
+        numpy.ndarray: 布尔数组。
+    """
+    if networks is None:
+        networks = DEFAULT_CLIENT_NETWORKS
+    values = ipv4_to_int(ips)
+    starts, ends = network_intervals(networks)
+    if len(starts) == 0:
+        return np.zeros(len(values), dtype=bool)
+
+    # 在排序区间中二分查找起点不大于该 IP 的最后一个区间，再检查是否落在区间内
+    idx = np.searchsorted(starts, values, side='right') - 1
+    return (values >= 0) & (idx >= 0) & (values <= ends[np.maximum(idx, 0)])
+
+
+def classify_ip_type(ips, networks=None, inside_label='客户端', outside_label='服务端'):
+    """
+    按网段为整列 IP 打上客户端/服务端标签。
+
+    参数:
+        ips (pandas.Series): 源IP列。
+        networks (list): 视为客户端的 CIDR 列表，默认 DEFAULT_CLIENT_NETWORKS。
+
+    返回:
+        pandas.Series: 与 ips 同索引的标签列。
+    """
+    labels = np.where(in_networks(ips, networks), inside_label, outside_label)
+    return pd.Series(labels, index=ips.index, dtype=object)
+
+
+def classify_ip(ip, intervals, inside_label='客户端', outside_label='服务端'):
+    """
+    单个 IP 的 classify_ip_type，不构造 pandas 对象，用于逐条处理事件。
+
+    参数:
+        ip: 源IP。
+        intervals (tuple): network_intervals 返回的 (starts, ends)，调用方预先计算一次。
+
+    返回:
+        str: inside_label 或 outside_label。
+    """
+    value = parse_ipv4(ip)
+    starts, ends = intervals
+    if value is None:
+        return outside_label
+    idx = bisect_right(starts, value) - 1
+    return inside_label if idx >= 0 and value <= ends[idx] else outside_label
@@ -1,35 +1,66 @@
-import glob
+import argparse
+import importlib.util
+import io
 import os
-from collections import Counter, defaultdict
+import sys
 from datetime import datetime
+from xml.sax.saxutils import escape
 
-import matplotlib.pyplot as plt
-import numpy as np
-import pandas as pd
-import seaborn as sns
-from matplotlib.font_manager import FontProperties
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Table, TableStyle, PageBreak
+# reportlab、matplotlib/seaborn（report_charts）只在生成PDF、绘图时才导入，
+# 仅做数据加载和统计时不必承担这部分导入开销
+from dns_analytics import analyze_dns_file
+from export_batch import aggregate_exports, filter_time_range, find_exports, latest_export, prepare_events
+from ip_ranges import DEFAULT_CLIENT_NETWORKS
+from rollup_cube import RollupCube
+from sketches import DEFAULT_SKETCH
+from threat_stats import ThreatAggregate
+from xlsx_cache import load_export
 
-plt.rcParams['font.sans-serif'] = ['SimHei']  # 设置中文字体为黑体
-plt.rcParams['axes.unicode_minus'] = False  # 正确显示负号
+# tracing 位于仓库根目录，与 Clean 共用
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from tracing import enable as enable_tracing, enable_from_env, span  # noqa: E402
 
 
 class EnhancedThreatReportGenerator:  # 确保这一行存在
-    def __init__(self):
+    def __init__(self, top_n=5, client_networks=None, parallel_charts=False, in_memory_charts=True,
+                 chart_format='png', sketch=None):
+        # 客户端/服务端分析中列出的 TOP IP 个数
+        self.top_n = top_n
+        # 是否在进程池中并发渲染图表
+        self.parallel_charts = parallel_charts
+        # 图表渲染到内存直接嵌入PDF（不在工作目录写临时图片）；chart_format 为 'png' 或矢量 'svg'
+        self.in_memory_charts = in_memory_charts
+        self.chart_format = chart_format
+        # svglib 为可选依赖，仅矢量图表需要
+        if chart_format == 'svg' and importlib.util.find_spec('svglib') is None:
+            print("⚠️ 未安装 svglib，图表改用 PNG 嵌入 (pip install svglib)")
+            self.chart_format = 'png'
+        # 视为客户端的 CIDR 网段，默认 RFC1918 加 ip_ranges.INTERNAL_NETWORKS
+        self.client_networks = client_networks if client_networks is not None else DEFAULT_CLIENT_NETWORKS
+        # 概要统计模式（sketches.SketchConfig）：TOP IP/端口与不同IP个数用有界内存的近似统计
+        self.sketch = sketch
+        # PDF 样式与绘图样式在第一次生成报告/图表时才初始化
+        self.styles = None
+        self.font_path = None
+        self.font_prop = None
+        self._chart_style_ready = False
+
+    def setup_pdf_styles(self):
+        """初始化PDF字体、颜色和段落样式（只执行一次）"""
+        if self.styles is not None:
+            return
+        from reportlab.lib.styles import getSampleStyleSheet
+
         self.setup_fonts()
         self.setup_colors()
         self.styles = getSampleStyleSheet()
         self.create_custom_styles()
-        self.setup_matplotlib_style()
 
     def setup_fonts(self):
         """设置中文字体支持"""
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
+
         try:
             # 尝试注册中文字体
             font_paths = [
@@ -46,6 +77,8 @@ class EnhancedThreatReportGenerator:  # 确保这一行存在
 
     def setup_colors(self):
         """设置颜色主题"""
+        from reportlab.lib import colors
+
         self.colors = {
             'primary': colors.Color(0.1, 0.2, 0.5),  # 深蓝色
             'secondary': colors.Color(0.8, 0.1, 0.1),  # 深红色
@@ -58,21 +91,23 @@ class EnhancedThreatReportGenerator:  # 确保这一行存在
         }
 
     def setup_matplotlib_style(self):
-        font_path = 'C:/Windows/Fonts/simsun.ttc'  # 或 simhei.ttf
-        if os.path.exists(font_path):
-            self.font_prop = FontProperties(fname=font_path)
-            plt.rcParams['font.sans-serif'] = [self.font_prop.get_name()]
+        if self._chart_style_ready:
+            return
+        from report_charts import apply_chart_style, find_chart_font
+
+        self._chart_style_ready = True
+        self.font_path = find_chart_font()
+        self.font_prop = apply_chart_style(self.font_path)
+        if self.font_prop is not None:
             print(f"✅ matplotlib字体设置为: {self.font_prop.get_name()}")
         else:
-            self.font_prop = None
             print("⚠️ 未找到中文字体，可能会乱码")
 
-        plt.rcParams['axes.unicode_minus'] = False
-        sns.set_style("whitegrid")
-        sns.set_palette("husl")
-
     def create_custom_styles(self):
         """创建自定义样式"""
+        from reportlab.lib import colors
+        from reportlab.lib.styles import ParagraphStyle
+
         try:
             font_name = 'SimSun'
         except:
@@ -164,16 +199,16 @@ class EnhancedThreatReportGenerator:  # 确保这一行存在
         )
 
     def find_log_file(self):
-        """查找日志文件"""
-        files = glob.glob("../downloads/*envet_log*.xlsx")
-        if not files:
+        """查找日志文件（最新的一份导出）"""
+        log_file = latest_export()
+        if log_file is None:
             raise FileNotFoundError("未找到匹配 'envet_log*.xlsx' 的文件")
-        return files[0]
+        return log_file
 
     def load_data(self, file_path):
         """加载数据"""
         try:
-            df = pd.read_excel(file_path, header=0, engine='openpyxl')
+            df = load_export(file_path)
             print(f"成功加载文件: {file_path}")
             print(f"数据行数: {len(df)}")
             return df
@@ -181,101 +216,17 @@ class EnhancedThreatReportGenerator:  # 确保这一行存在
             raise Exception(f"加载数据失败: {str(e)}")
 
     def preprocess_data(self, df):
-        """数据预处理"""
-        # 转换时间列
-        time_column = '发现时间'
-        if time_column in df.columns:
-            try:
-                df[time_column] = pd.to_datetime(df[time_column], format='%Y-%m-%d %H:%M:%S')
-            except:
-                df[time_column] = pd.to_datetime(df[time_column], infer_datetime_format=True)
-
-        # 判断是否是客户端源IP
-        def is_client_ip(ip):
-            ip_str = str(ip)
-            return ip_str.startswith('172.') or ip_str.startswith('192.')
-
-        # 添加IP类型列
-        if '源IP' in df.columns:
-            df['IP类型'] = df['源IP'].apply(lambda ip: '客户端' if is_client_ip(ip) else '服务端')
-
-        return df
+        """数据预处理：转换时间列，添加IP类型列（源IP属于客户端网段的为客户端）"""
+        return prepare_events(df, self.client_networks)
 
     def analyze_threats(self, df):
-        """威胁分析"""
-        # 定义列名映射
-        column_mapping = {
-            'threat_category': '威胁类别',
-            'threat_name': '威胁名称',
-            'severity': '威胁等级',
-            'src_ip': '源IP',
-            'dst_ip': '目的IP',
-            'dst_port': '目的端口',
-            'protocol': '应用层协议',
-            'time': '发现时间'
-        }
+        """威胁分析（整表作为一个分块统计）"""
+        return self.summarize_threats(ThreatAggregate.from_frame(df, self.sketch))
 
-        # 验证列存在性
-        existing_columns = {eng: col for eng, col in column_mapping.items() if col in df.columns}
-
-        threat_stats = {
-            'total_events': len(df),
-            'threat_categories': {},
-            'threat_names': {},
-            'severity_levels': {},
-            'source_ips': {},
-            'destination_ips': {},
-            'time_distribution': defaultdict(int),
-            'daily_distribution': defaultdict(int),
-            'top_malicious_ips': {},
-            'common_ports': {},
-            'protocols': {},
-            'client_analysis': {},
-            'server_analysis': {},
-            'risk_score': 0
-        }
-
-        # 基本统计
-        for eng, col in existing_columns.items():
-            if col in df.columns:
-                if eng == 'threat_category':
-                    threat_stats['threat_categories'] = df[col].value_counts().to_dict()
-                elif eng == 'threat_name':
-                    threat_stats['threat_names'] = df[col].value_counts().to_dict()
-                elif eng == 'severity':
-                    threat_stats['severity_levels'] = df[col].value_counts().to_dict()
-                elif eng == 'src_ip':
-                    threat_stats['source_ips'] = df[col].value_counts().to_dict()
-                elif eng == 'dst_ip':
-                    threat_stats['destination_ips'] = df[col].value_counts().to_dict()
-                elif eng == 'dst_port':
-                    threat_stats['common_ports'] = df[col].value_counts().head(10).to_dict()
-                elif eng == 'protocol':
-                    threat_stats['protocols'] = df[col].value_counts().to_dict()
-
-        # 时间分布分析
-        if '发现时间' in df.columns:
-            for time in df['发现时间']:
-                if pd.notna(time):
-                    try:
-                        hour = time.hour
-                        day = time.strftime('%Y-%m-%d')
-                        threat_stats['time_distribution'][hour] += 1
-                        threat_stats['daily_distribution'][day] += 1
-                    except:
-                        pass
-
-        # 客户端和服务端分析
-        if 'IP类型' in df.columns and '源IP' in df.columns:
-            client_df = df[df['IP类型'] == '客户端']
-            server_df = df[df['IP类型'] == '服务端']
-
-            threat_stats['client_analysis'] = self.analyze_top_ips(client_df)
-            threat_stats['server_analysis'] = self.analyze_top_ips(server_df)
-
-        # 计算风险评分
+    def summarize_threats(self, aggregate):
+        """由（合并后的）ThreatAggregate 生成 threat_stats 并计算风险评分"""
+        threat_stats = aggregate.to_threat_stats(top_n=self.top_n)
         threat_stats['risk_score'] = self.calculate_risk_score(threat_stats)
-
         return threat_stats
 
     def calculate_risk_score(self, stats):
@@ -298,7 +249,7 @@ class EnhancedThreatReportGenerator:  # 确保这一行存在
             score += 10
 
         # 基于威胁源IP数量的评分
-        unique_ips = len(stats['source_ips'])
+        unique_ips = stats['unique_source_ips']
         if unique_ips > 50:
             score += 20
         elif unique_ips > 20:
@@ -308,240 +259,86 @@ class EnhancedThreatReportGenerator:  # 确保这一行存在
 
         return min(score, 100)
 
-    def analyze_top_ips(self, sub_df):
-        """分析TOP IP"""
-        if sub_df.empty or '源IP' not in sub_df.columns:
-            return {}
-
-        top_ips = sub_df['源IP'].value_counts().head(5)
-        ip_analysis = {}
-
-        for ip, count in top_ips.items():
-            ip_rows = sub_df[sub_df['源IP'] == ip]
-
-            # 统计威胁等级和名称
-            threat_stat = {}
-            if '威胁等级' in ip_rows.columns and '威胁名称' in ip_rows.columns:
-                combined = zip(ip_rows['威胁等级'], ip_rows['威胁名称'])
-                threat_counter = Counter([f"[{level}] {name}" for level, name in combined])
-                threat_stat = dict(threat_counter)
-
-            ip_analysis[ip] = {
-                'count': count,
-                'threats': threat_stat
-            }
-
-        return ip_analysis
-
     def create_enhanced_charts(self, threat_stats):
         """创建增强的图表"""
-        chart_files = []
+        from report_charts import (ChartImage, render_charts, render_severity_distribution, render_threat_categories,
+                                   render_time_distribution, render_top_ips)
 
-        fp = self.font_prop
+        self.setup_matplotlib_style()
+        jobs = []
+        chart_names = []
 
         # 1. 威胁类别分布图 - 美化版
         if threat_stats['threat_categories']:
-            fig, ax = plt.subplots(figsize=(12, 8))
-
-            categories = list(threat_stats['threat_categories'].keys())
-            values = list(threat_stats['threat_categories'].values())
-
-            # 使用渐变色
-            colors = plt.cm.viridis(np.linspace(0, 1, len(categories)))
-
-            bars = ax.bar(categories, values, color=colors, edgecolor='white', linewidth=2)
-
-            # 添加阴影效果
-            for bar in bars:
-                bar.set_alpha(0.8)
-
-            ax.set_title('威胁类别分布', fontsize=18, fontweight='bold', pad=20, fontproperties=fp)
-            ax.set_ylabel('事件数量', fontsize=14, fontproperties=fp)
-            ax.set_xlabel('威胁类别', fontsize=14, fontproperties=fp)
-            ax.tick_params(axis='x', rotation=45)
-
-            # 添加数值标签
-            for bar, value in zip(bars, values):
-                ax.text(bar.get_x() + bar.get_width() / 2, bar.get_height() + max(values) * 0.01,
-                        f'{value:,}', ha='center', va='bottom', fontweight='bold')
-
-            # 添加网格
-            ax.grid(axis='y', alpha=0.3, linestyle='--')
-            ax.set_axisbelow(True)
-
-            plt.tight_layout()
-            chart_file = 'threat_categories_enhanced.png'
-            plt.savefig(chart_file, dpi=300, bbox_inches='tight', facecolor='white')
-            plt.close()
-            chart_files.append(chart_file)
+            chart_names.append('threat_categories_enhanced')
+            jobs.append((render_threat_categories, (threat_stats['threat_categories'],)))
 
         # 2. 时间分布热力图 - 修复下面图表显示问题
         if threat_stats['time_distribution'] and threat_stats['daily_distribution']:
-            fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(14, 10))
-
-            # 小时分布
-            hours = sorted(threat_stats['time_distribution'].items())
-            x, y = zip(*hours) if hours else ([], [])
-
-            ax1.plot(x, y, marker='o', linewidth=3, markersize=8, color='#FF6B6B', alpha=0.8)
-            ax1.fill_between(x, y, alpha=0.3, color='#FF6B6B')
-            ax1.set_title('24小时威胁事件分布', fontsize=16, fontweight='bold', fontproperties=fp)
-            ax1.set_xlabel('小时', fontsize=12, fontproperties=fp)
-            ax1.set_ylabel('事件数量', fontsize=12, fontproperties=fp)
-            ax1.set_xticks(range(24))
-            ax1.grid(True, alpha=0.3)
-
-            # 设置x轴刻度标签字体
-            for label in ax1.get_xticklabels():
-                label.set_fontproperties(fp)
-            for label in ax1.get_yticklabels():
-                label.set_fontproperties(fp)
-
-            # 日期分布 - 修改条件判断，即使只有一天数据也显示
-            if len(threat_stats['daily_distribution']) >= 1:
-                daily_data = sorted(threat_stats['daily_distribution'].items())
-                dates, counts = zip(*daily_data)
-
-                ax2.bar(range(len(dates)), counts, color='#4ECDC4', alpha=0.7)
-                ax2.set_title('日期威胁事件分布', fontsize=16, fontweight='bold', fontproperties=fp)
-                ax2.set_xlabel('日期', fontsize=12, fontproperties=fp)
-                ax2.set_ylabel('事件数量', fontsize=12, fontproperties=fp)
-
-                # 设置x轴标签
-                if len(dates) > 10:
-                    step = max(1, len(dates) // 10)
-                    ax2.set_xticks(range(0, len(dates), step))
-                    ax2.set_xticklabels([dates[i] for i in range(0, len(dates), step)], rotation=45)
-                else:
-                    # 如果日期数量少，显示所有日期
-                    ax2.set_xticks(range(len(dates)))
-                    ax2.set_xticklabels(dates, rotation=45)
-
-                ax2.grid(True, alpha=0.3)
-
-                # 设置坐标轴刻度标签字体
-                for label in ax2.get_xticklabels():
-                    label.set_fontproperties(fp)
-                for label in ax2.get_yticklabels():
-                    label.set_fontproperties(fp)
-            else:
-                # 如果没有日期数据，显示提示信息
-                ax2.text(0.5, 0.5, '暂无日期分布数据', ha='center', va='center',
-                         transform=ax2.transAxes, fontsize=14, fontproperties=fp)
-                ax2.set_title('日期威胁事件分布', fontsize=16, fontweight='bold', fontproperties=fp)
-                ax2.set_xlabel('日期', fontsize=12, fontproperties=fp)
-                ax2.set_ylabel('事件数量', fontsize=12, fontproperties=fp)
-
-            plt.tight_layout()
-            chart_file = 'time_distribution_enhanced.png'
-            plt.savefig(chart_file, dpi=300, bbox_inches='tight', facecolor='white')
-            plt.close()
-            chart_files.append(chart_file)
+            chart_names.append('time_distribution_enhanced')
+            jobs.append((render_time_distribution, (threat_stats['time_distribution'],
+                                                    threat_stats['daily_distribution'])))
 
         # 3. 威胁严重程度饼图 - 修复版本
         if threat_stats['severity_levels']:
-            fig, ax = plt.subplots(figsize=(12, 10))  # 增大图表尺寸
-
-            labels = list(threat_stats['severity_levels'].keys())
-            sizes = list(threat_stats['severity_levels'].values())
-
-            # 定义颜色映射 - 使用更鲜明的颜色
-            color_map = {
-                '高': '#FF4444',  # 鲜红色
-                '中': '#FFA500',  # 橙色
-                '低': '#32CD32',  # 绿色
-                '严重': '#8B0000',  # 深红色
-                '警告': '#FF8C00',  # 深橙色
-                '信息': '#4169E1',  # 蓝色
-                '提示': '#9932CC'  # 紫色
-            }
-
-            # 为每个标签分配颜色，如果没有预定义颜色则使用默认色盘
-            colors_list = []
-            default_colors = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FECA57', '#FF9FF3', '#54A0FF']
+            chart_names.append('severity_distribution_enhanced')
+            jobs.append((render_severity_distribution, (threat_stats['severity_levels'],)))
 
-            for i, label in enumerate(labels):
-                if label in color_map:
-                    colors_list.append(color_map[label])
-                else:
-                    colors_list.append(default_colors[i % len(default_colors)])
-
-            # 设置饼图参数，不显示标签和百分比
-            wedges, texts = ax.pie(sizes,
-                                   labels=None,  # 不显示标签
-                                   colors=colors_list,
-                                   autopct=None,  # 不显示百分比
-                                   startangle=90,
-                                   explode=[0.1 if label == '高' else 0.05 for label in labels])
-
-            ax.set_title('威胁严重程度分布', fontsize=20, fontweight='bold', pad=30, fontproperties=fp)
-
-            # 创建图例标签，避免使用可能显示为方格的字符
-            legend_labels = []
-            for label, size in zip(labels, sizes):
-                percentage = (size / sum(sizes)) * 100
-                # 使用英文字符替代可能有问题的中文字符
-                legend_labels.append(f'{label}等级: {size}个 ({percentage:.1f}%)')
-
-            # 调整图例位置，避免重叠
-            legend = ax.legend(wedges, legend_labels,
-                               title="威胁等级统计",
-                               loc="center left",
-                               bbox_to_anchor=(1.2, 0.5),
-                               fontsize=12,
-                               title_fontsize=14)
-
-            # 设置图例标题字体
-            if fp:
-                legend.get_title().set_fontproperties(fp)
-                # 设置图例文本字体
-                for text in legend.get_texts():
-                    text.set_fontproperties(fp)
-
-            # 确保图表布局合理
-            plt.subplots_adjust(left=0.1, right=0.75)
-
-            chart_file = 'severity_distribution_enhanced.png'
-            plt.savefig(chart_file, dpi=300, bbox_inches='tight', facecolor='white')
-            plt.close()
-            chart_files.append(chart_file)
-
-        # 4. TOP IP威胁分析图
+        # 4. TOP IP威胁分析图（只把前10个IP传给绘图函数，避免并行时序列化全部源IP）
         if threat_stats['source_ips']:
-            fig, ax = plt.subplots(figsize=(12, 8))
-
+            chart_names.append('top_ips_enhanced')
             top_ips = sorted(threat_stats['source_ips'].items(), key=lambda x: x[1], reverse=True)[:10]
-            ips, counts = zip(*top_ips)
+            jobs.append((render_top_ips, (top_ips,)))
 
-            bars = ax.barh(range(len(ips)), counts, color='#FF7F7F', alpha=0.8)
+        # 内存模式下不落盘，图表以字节返回并直接嵌入PDF；否则写到工作目录中的图片文件
+        chart_format = self.chart_format if self.in_memory_charts else 'png'
+        outputs = [None if self.in_memory_charts else f'{name}.png' for name in chart_names]
+        jobs = [(render, args + (self.font_path, output, chart_format))
+                for (render, args), output in zip(jobs, outputs)]
 
-            ax.set_yticks(range(len(ips)))
-            ax.set_yticklabels(ips)
-            ax.set_xlabel('威胁事件数量', fontsize=12, fontproperties=fp)
-            ax.set_title('TOP 10 威胁源IP', fontsize=16, fontweight='bold', fontproperties=fp)
+        # 并行时每张图在独立进程中渲染，总耗时取决于最慢的一张；单张失败不影响其他图表
+        results = render_charts(jobs, self.font_path, parallel=self.parallel_charts)
 
-            # 添加数值标签
-            for i, (bar, count) in enumerate(zip(bars, counts)):
-                ax.text(bar.get_width() + max(counts) * 0.01, bar.get_y() + bar.get_height() / 2,
-                        f'{count:,}', ha='left', va='center', fontweight='bold')
+        chart_files = []
+        for name, result in zip(chart_names, results):
+            if result is None:
+                continue
+            if self.in_memory_charts:
+                chart_files.append(ChartImage(name, result, chart_format))
+            else:
+                chart_files.append(result)
+        return chart_files
 
-            ax.grid(axis='x', alpha=0.3)
-            plt.tight_layout()
+    def create_chart_flowable(self, chart, width, height):
+        """将图表（图片文件路径或内存中的 ChartImage）转换为PDF中的元素，拉伸到指定尺寸"""
+        from reportlab.platypus import Image
+        from report_charts import ChartImage
 
-            chart_file = 'top_ips_enhanced.png'
-            plt.savefig(chart_file, dpi=300, bbox_inches='tight', facecolor='white')
-            plt.close()
-            chart_files.append(chart_file)
+        if not isinstance(chart, ChartImage):
+            return Image(chart, width=width, height=height)
+        if chart.format == 'svg':
+            # 矢量图：转换为 reportlab Drawing 并按与位图相同的方式缩放
+            from svglib.svglib import svg2rlg
 
-        return chart_files
+            drawing = svg2rlg(io.BytesIO(chart.data))
+            drawing.scale(width / drawing.width, height / drawing.height)
+            drawing.width, drawing.height = width, height
+            return drawing
+        return Image(io.BytesIO(chart.data), width=width, height=height)
 
     def create_summary_table(self, threat_stats):
         """创建汇总表格"""
+        from reportlab.lib import colors
+        from reportlab.lib.units import inch
+        from reportlab.platypus import Table, TableStyle
+
+        self.setup_pdf_styles()
         data = [
             ['指标', '数值', '描述'],
             ['总威胁事件', f"{threat_stats['total_events']:,}", '检测到的威胁事件总数'],
             ['威胁类别数', f"{len(threat_stats['threat_categories'])}", '涉及的威胁类别种类'],
-            ['威胁源IP数', f"{len(threat_stats['source_ips'])}", '产生威胁的源IP数量'],
+            ['威胁源IP数', f"{threat_stats['unique_source_ips']:,}",
+             '产生威胁的源IP数量（估计值）' if threat_stats['approximate'] else '产生威胁的源IP数量'],
             ['风险评分', f"{threat_stats['risk_score']:.1f}/100", '综合风险评估分数'],
         ]
 
@@ -568,6 +365,7 @@ class EnhancedThreatReportGenerator:  # 确保这一行存在
 
     def create_risk_indicator(self, risk_score):
         """创建风险指示器"""
+        self.setup_pdf_styles()
         if risk_score >= 70:
             risk_level = "高风险"
             risk_color = self.colors['secondary']
@@ -589,8 +387,43 @@ class EnhancedThreatReportGenerator:  # 确保这一行存在
 
         return risk_text, risk_color
 
-    def create_pdf_report(self, threat_stats, chart_files, output_file='enhanced_threat_report.pdf'):
-        """创建美化的PDF报告"""
+    def create_dns_text(self, dns_stats):
+        """DNS 域名分析章节的正文（域名来自流量，转义后再放入段落标记）"""
+        def time_range(row):
+            return f"{row['first_seen']:%m-%d %H:%M} ~ {row['last_seen']:%m-%d %H:%M}"
+
+        dns_text = "🔎 <b>DNS 查询概览</b><br/><br/>"
+        dns_text += f"• DNS 查询 <b>{dns_stats['total_queries']:,}</b> 次，" \
+                    f"域名 <b>{dns_stats['unique_domains']:,}</b> 个" \
+                    f"（注册域名 <b>{dns_stats['unique_registered_domains']:,}</b> 个）<br/>"
+        dns_text += f"• 发起查询的源IP <b>{dns_stats['unique_sources']:,}</b> 个，" \
+                    f"NXDOMAIN 响应 <b>{dns_stats['nxdomain_queries']:,}</b> 次<br/>"
+        dns_text += f"• 疑似DGA域名 <b>{dns_stats['dga_like_domains']:,}</b> 个，" \
+                    f"相关查询 <b>{dns_stats['dga_like_queries']:,}</b> 次<br/><br/>"
+
+        dns_text += "🌍 <b>查询最多的注册域名</b><br/><br/>"
+        for i, row in enumerate(dns_stats['top_domains'].to_dict('records'), 1):
+            dns_text += f"{i}. <b>{escape(row['registered_domain'])}</b>: {row['queries']:,} 次，" \
+                        f"{row['sources']} 个源IP，NXDOMAIN {row['nxdomain']} 次 ({time_range(row)})<br/>"
+
+        dns_text += "<br/>🖥️ <b>访问域名最多的源IP</b><br/><br/>"
+        for i, row in enumerate(dns_stats['top_sources'].to_dict('records'), 1):
+            dns_text += f"{i}. <b>IP: {row['src_ip']}</b>: {row['unique_domains']} 个注册域名，共 {row['queries']:,} 次查询<br/>"
+
+        if len(dns_stats['suspicious_domains']):
+            dns_text += "<br/>🧬 <b>疑似DGA域名（按字符熵排序）</b><br/><br/>"
+            for i, row in enumerate(dns_stats['suspicious_domains'].to_dict('records'), 1):
+                dns_text += f"{i}. <b>{escape(row['domain'])}</b>: 熵 {row['entropy']:.2f}，{row['queries']:,} 次 ({time_range(row)})<br/>"
+        return dns_text
+
+    def create_pdf_report(self, threat_stats, chart_files, output_file='enhanced_threat_report.pdf', dns_stats=None):
+        """创建美化的PDF报告（dns_stats 为 dns_analytics.analyze_dns 的结果，提供时加入 DNS 域名分析章节）"""
+        from reportlab.lib.pagesizes import A4
+        from reportlab.lib.units import inch
+        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
+        from report_charts import ChartImage
+
+        self.setup_pdf_styles()
         doc = SimpleDocTemplate(output_file, pagesize=A4, topMargin=1 * inch, bottomMargin=1 * inch)
         story = []
 
@@ -601,7 +434,7 @@ class EnhancedThreatReportGenerator:  # 确保这一行存在
         # 报告基本信息
         report_info = f"""
         <b>生成时间:</b> {datetime.now().strftime('%Y年%m月%d日 %H:%M:%S')}<br/>
-        <b>分析时间段:</b> 全量数据分析<br/>
+        <b>分析时间段:</b> {threat_stats.get('analysis_period', '全量数据分析')}<br/>
         <b>报告状态:</b> <font color="green">已完成</font>
         """
         story.append(Paragraph(report_info, self.highlight_style))
@@ -664,8 +497,9 @@ class EnhancedThreatReportGenerator:  # 确保这一行存在
         story.append(Paragraph("4. 威胁源分析", self.heading_style))
 
         source_text = f"🌐 <b>威胁源IP统计</b><br/>"
-        source_text += f"• 涉及源IP总数: <b>{len(threat_stats['source_ips']):,}</b><br/>"
-        source_text += f"• 平均每IP威胁数: <b>{threat_stats['total_events'] / len(threat_stats['source_ips']):.1f}</b><br/><br/>"
+        source_text += f"• 涉及源IP总数: <b>{threat_stats['unique_source_ips']:,}</b><br/>"
+        per_ip = threat_stats['total_events'] / threat_stats['unique_source_ips'] if threat_stats['unique_source_ips'] else 0
+        source_text += f"• 平均每IP威胁数: <b>{per_ip:.1f}</b><br/><br/>"
 
         source_text += "🔝 <b>TOP 5 威胁源IP:</b><br/>"
         top_sources = sorted(threat_stats['source_ips'].items(), key=lambda x: x[1], reverse=True)[:5]
@@ -764,8 +598,14 @@ class EnhancedThreatReportGenerator:  # 确保这一行存在
         story.append(Paragraph(proto_text, self.normal_style))
         story.append(Spacer(1, 15))
 
-        # 9. 安全建议
-        story.append(Paragraph("9. 安全建议", self.heading_style))
+        # 9. DNS 域名分析
+        if dns_stats and dns_stats['total_queries']:
+            story.append(Paragraph("9. DNS 域名分析", self.heading_style))
+            story.append(Paragraph(self.create_dns_text(dns_stats), self.normal_style))
+            story.append(Spacer(1, 15))
+
+        # 10. 安全建议
+        story.append(Paragraph("10. 安全建议", self.heading_style))
 
         recommendations = []
 
@@ -789,9 +629,13 @@ class EnhancedThreatReportGenerator:  # 确保这一行存在
             recommendations.append(f"🕐 加强 {', '.join(peak_hours)} 时段的安全监控")
 
         # 基于IP数量的建议
-        if len(threat_stats['source_ips']) > 50:
+        if threat_stats['unique_source_ips'] > 50:
             recommendations.append("🌐 威胁源IP数量较多，建议实施IP地址黑名单策略")
 
+        # 基于DNS分析的建议
+        if dns_stats and dns_stats['dga_like_domains'] > 0:
+            recommendations.append(f"🧬 发现 {dns_stats['dga_like_domains']} 个疑似DGA域名，建议排查相关主机是否感染恶意软件")
+
         recommendations.append("📋 定期更新威胁情报和安全规则")
         recommendations.append("🎯 对高频威胁IP进行深度分析和追踪")
         recommendations.append("📊 建立长期威胁监控和趋势分析机制")
@@ -800,41 +644,43 @@ class EnhancedThreatReportGenerator:  # 确保这一行存在
         story.append(Paragraph(rec_text, self.highlight_style))
         story.append(PageBreak())
 
-        # 10. 数据可视化
-        story.append(Paragraph("10. 数据可视化", self.heading_style))
+        # 11. 数据可视化
+        story.append(Paragraph("11. 数据可视化", self.heading_style))
         story.append(Paragraph("以下图表展示了威胁数据的详细分析结果:", self.normal_style))
         story.append(Spacer(1, 20))
 
-        # 添加图表
+        # 添加图表（chart_files 中可以是图片文件路径，也可以是内存中的 ChartImage）
         for i, chart_file in enumerate(chart_files, 1):
-            if os.path.exists(chart_file):
+            in_memory = isinstance(chart_file, ChartImage)
+            if in_memory or os.path.exists(chart_file):
                 try:
                     # 根据图表类型添加标题
                     chart_titles = {
-                        'threat_categories_enhanced.png': f'图表 {i}: 威胁类别分布统计',
-                        'time_distribution_enhanced.png': f'图表 {i}: 威胁时间分布分析',
-                        'severity_distribution_enhanced.png': f'图表 {i}: 威胁严重程度分布',
-                        'top_ips_enhanced.png': f'图表 {i}: TOP 10 威胁源IP分析'
+                        'threat_categories_enhanced': f'图表 {i}: 威胁类别分布统计',
+                        'time_distribution_enhanced': f'图表 {i}: 威胁时间分布分析',
+                        'severity_distribution_enhanced': f'图表 {i}: 威胁严重程度分布',
+                        'top_ips_enhanced': f'图表 {i}: TOP 10 威胁源IP分析'
                     }
 
-                    chart_title = chart_titles.get(os.path.basename(chart_file), f'图表 {i}')
+                    chart_name = chart_file.name if in_memory else os.path.splitext(os.path.basename(chart_file))[0]
+                    chart_title = chart_titles.get(chart_name, f'图表 {i}')
                     story.append(Paragraph(chart_title, self.subheading_style))
                     story.append(Spacer(1, 10))
 
                     # 添加图表
-                    story.append(Image(chart_file, width=6.5 * inch, height=4.5 * inch))
+                    story.append(self.create_chart_flowable(chart_file, 6.5 * inch, 4.5 * inch))
                     story.append(Spacer(1, 20))
                 except Exception as e:
-                    print(f"无法添加图表 {chart_file}: {e}")
+                    print(f"无法添加图表 {chart_name if in_memory else chart_file}: {e}")
 
-        # 11. 报告总结
-        story.append(Paragraph("11. 报告总结", self.heading_style))
+        # 12. 报告总结
+        story.append(Paragraph("12. 报告总结", self.heading_style))
 
         summary_text = f"""
                     <b>📈 数据概览:</b><br/>
                     • 本次分析共处理威胁事件 <b>{threat_stats['total_events']:,}</b> 起<br/>
                     • 涉及威胁类别 <b>{len(threat_stats['threat_categories'])}</b> 种<br/>
-                    • 威胁源IP地址 <b>{len(threat_stats['source_ips'])}</b> 个<br/>
+                    • 威胁源IP地址 <b>{threat_stats['unique_source_ips']:,}</b> 个<br/>
                     • 系统风险评分 <b>{threat_stats['risk_score']:.1f}/100</b><br/><br/>
 
                     <b>🎯 关键发现:</b><br/>
@@ -862,9 +708,9 @@ class EnhancedThreatReportGenerator:  # 确保这一行存在
         # 生成PDF
         doc.build(story)
 
-        # 清理临时图表文件
+        # 清理临时图表文件（内存中的图表无需清理）
         for chart_file in chart_files:
-            if os.path.exists(chart_file):
+            if not isinstance(chart_file, ChartImage) and os.path.exists(chart_file):
                 try:
                     os.remove(chart_file)
                 except:
@@ -872,27 +718,80 @@ class EnhancedThreatReportGenerator:  # 确保这一行存在
 
         return output_file
 
-    def generate_report(self, output_file='enhanced_threat_report.pdf'):
-        """生成完整报告"""
-        try:
-            # 1. 查找日志文件
-            log_file = self.find_log_file()
-            print(f"📄 找到日志文件: {log_file}")
-
-            # 2. 加载数据
-            df = self.load_data(log_file)
-
-            # 3. 数据预处理
-            df = self.preprocess_data(df)
-
-            # 4. 威胁分析
-            threat_stats = self.analyze_threats(df)
+    def generate_report(self, output_file='enhanced_threat_report.pdf', start=None, end=None, batch=False,
+                        max_workers=None, cube=False):
+        """
+        生成完整报告
 
-            # 5. 创建增强图表
-            chart_files = self.create_enhanced_charts(threat_stats)
+        参数:
+            output_file (str): PDF 文件路径。
+            start, end (str | datetime): 分析的时间范围，为 None 时不限制。
+            batch (bool): 合并 downloads 下的全部导出（跨多天的报告），否则只读取最新的一份。
+            max_workers (int): 批量统计时的进程数。
+            cube (bool): 先把 downloads 下新增的导出累加到预聚合立方体，再由立方体直接汇总时间范围内的统计。
 
-            # 6. 生成PDF报告
-            pdf_file = self.create_pdf_report(threat_stats, chart_files, output_file)
+        返回:
+            str: PDF 文件路径；范围内没有事件时不生成报告，返回 None。
+        """
+        try:
+            with span('generate_report', batch=batch, cube=cube, start=start, end=end):
+                if cube:
+                    # 1-4. 只导入尚未导入的导出，统计由按小时预聚合的计数汇总（没有目的IP统计）
+                    with RollupCube() as rollup:
+                        with span('ingest_exports') as traced:
+                            added = rollup.ingest_exports(find_exports(), self.client_networks)
+                            traced.set(rows=added)
+                        print(f"🧊 预聚合立方体新增 {added:,} 条事件")
+                        with span('analyze_threats'):
+                            threat_stats = self.summarize_threats(rollup.aggregate(start, end))
+                elif batch:
+                    # 1-4. 每份导出在子进程中预处理、筛选并统计，只合并统计结果
+                    with span('find_log_file'):
+                        files = find_exports()
+                    print(f"📄 找到 {len(files)} 份日志文件")
+                    with span('analyze_threats', files=len(files)):
+                        threat_stats = self.summarize_threats(
+                            aggregate_exports(files, self.client_networks, start, end, max_workers, self.sketch))
+                else:
+                    # 1. 查找日志文件
+                    with span('find_log_file'):
+                        log_file = self.find_log_file()
+                    print(f"📄 找到日志文件: {log_file}")
+
+                    # 2. 加载数据
+                    with span('load_data', file=log_file) as traced:
+                        df = self.load_data(log_file)
+                        traced.set(rows=len(df))
+
+                    # 3. 数据预处理，按时间范围筛选
+                    with span('preprocess_data'):
+                        df = filter_time_range(self.preprocess_data(df), start, end)
+
+                    # 4. 威胁分析
+                    with span('analyze_threats', rows=len(df)):
+                        threat_stats = self.analyze_threats(df)
+
+                if start is not None or end is not None:
+                    print(f"🗓️ 时间范围 {start or '开始'} ~ {end or '结束'}: {threat_stats['total_events']:,} 条事件")
+                    threat_stats['analysis_period'] = f"{start or '最早'} 至 {end or '最新'}"
+
+                if threat_stats['total_events'] == 0:
+                    print(f"⚠️ 时间范围 {start or '最早'} ~ {end or '最新'} 内没有威胁事件，未生成报告")
+                    return None
+
+                # 5. 创建增强图表
+                with span('create_enhanced_charts'):
+                    chart_files = self.create_enhanced_charts(threat_stats)
+
+                # 6. DNS 域名分析（select_rows.py 的输出不存在时跳过）
+                with span('analyze_dns'):
+                    dns_stats = analyze_dns_file(start=start, end=end)
+                if dns_stats is None:
+                    print("⚠️ 未找到DNS事件数据，跳过DNS域名分析")
+
+                # 7. 生成PDF报告
+                with span('create_pdf_report'):
+                    pdf_file = self.create_pdf_report(threat_stats, chart_files, output_file, dns_stats)
 
             print(f"✅ PDF报告已生成: {pdf_file}")
             return pdf_file
@@ -903,9 +802,30 @@ class EnhancedThreatReportGenerator:  # 确保这一行存在
 
 
 if __name__ == "__main__":
-    generator = EnhancedThreatReportGenerator()
+    parser = argparse.ArgumentParser(description='生成网络安全威胁分析报告')
+    parser.add_argument('--all', action='store_true', help='合并 ../downloads 下的全部导出，默认只读取最新的一份')
+    parser.add_argument('--start', help='起始时间，例如 2025-07-01')
+    parser.add_argument('--end', help='结束时间，只给日期时包含当天全天')
+    parser.add_argument('--workers', type=int, help='批量统计导出的进程数')
+    parser.add_argument('--sketch', action='store_true', help='TOP IP/端口与不同IP个数使用有界内存的近似统计')
+    parser.add_argument('--cube', action='store_true', help='由按小时预聚合的立方体生成报告（增量导入新导出）')
+    parser.add_argument('--trace', help='记录各阶段的耗时与内存，退出时写入该 JSON 文件')
+    parser.add_argument('--chrome-trace', help='同时写出 Chrome trace-event 文件（chrome://tracing 中打开）')
+    parser.add_argument('--trace-memory', action='store_true', help='跟踪时用 tracemalloc 记录 Python 内存峰值（较慢）')
+    args = parser.parse_args()
+
+    if args.trace or args.chrome_trace:
+        enable_tracing(args.trace, args.chrome_trace, args.trace_memory)
+    else:
+        # pipeline.py --trace 通过环境变量启用
+        enable_from_env()
+
+    generator = EnhancedThreatReportGenerator(sketch=DEFAULT_SKETCH if args.sketch else None)
     try:
-        report_file = generator.generate_report('网络安全威胁分析报告.pdf')
+        report_file = generator.generate_report('网络安全威胁分析报告.pdf', start=args.start, end=args.end,
+                                                batch=args.all, max_workers=args.workers, cube=args.cube)
+        if report_file is None:
+            exit(1)
         print(f"\n🎉 报告生成成功！")
         print(f"📄 文件位置: {report_file}")
         print(f"📊 报告包含: 威胁统计、IP分析、时间分布、美化图表、安全建议等")
@@ -0,0 +1,295 @@
+import io
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib.pyplot as plt
+import numpy as np
+import seaborn as sns
+from matplotlib.font_manager import FontProperties
+
+# matplotlib 使用的中文字体
+CHART_FONT_PATH = 'C:/Windows/Fonts/simsun.ttc'  # 或 simhei.ttf
+
+
+# 渲染在内存中的图表：name 为图表名（决定报告中的标题），data 为图像字节，format 为 'png' 或 'svg'
+ChartImage = namedtuple('ChartImage', ['name', 'data', 'format'])
+
+
+def find_chart_font():
+    """返回可用的中文字体路径，找不到时返回 None。"""
+    return CHART_FONT_PATH if os.path.exists(CHART_FONT_PATH) else None
+
+
+def apply_chart_style(font_path):
+    """
+    设置 matplotlib / seaborn 的全局样式，主进程和绘图子进程使用同一套设置，保证输出一致。
+
+    返回:
+        FontProperties: 中文字体，font_path 为 None 时返回 None。
+    """
+    font_prop = FontProperties(fname=font_path) if font_path else None
+    if font_prop is not None:
+        plt.rcParams['font.sans-serif'] = [font_prop.get_name()]
+    else:
+        plt.rcParams['font.sans-serif'] = ['SimHei']  # 设置中文字体为黑体
+
+    plt.rcParams['axes.unicode_minus'] = False  # 正确显示负号
+    sns.set_style("whitegrid")
+    sns.set_palette("husl")
+    return font_prop
+
+
+def _font(font_path):
+    return FontProperties(fname=font_path) if font_path else None
+
+
+def _save_figure(output, fmt):
+    """
+    保存并关闭当前图。
+
+    output 为文件路径时写入文件并返回该路径；为 None 时渲染到内存并返回图像字节，
+    不在工作目录中产生临时文件，多个报告任务可以同时运行。
+    """
+    if output is None:
+        buffer = io.BytesIO()
+        plt.savefig(buffer, format=fmt, dpi=300, bbox_inches='tight', facecolor='white')
+        plt.close()
+        return buffer.getvalue()
+
+    plt.savefig(output, dpi=300, bbox_inches='tight', facecolor='white')
+    plt.close()
+    return output
+
+
+def render_threat_categories(threat_categories, font_path, output, fmt='png'):
+    """威胁类别分布图 - 美化版"""
+    fp = _font(font_path)
+    fig, ax = plt.subplots(figsize=(12, 8))
+
+    categories = list(threat_categories.keys())
+    values = list(threat_categories.values())
+
+    # 使用渐变色
+    colors = plt.cm.viridis(np.linspace(0, 1, len(categories)))
+
+    bars = ax.bar(categories, values, color=colors, edgecolor='white', linewidth=2)
+
+    # 添加阴影效果
+    for bar in bars:
+        bar.set_alpha(0.8)
+
+    ax.set_title('威胁类别分布', fontsize=18, fontweight='bold', pad=20, fontproperties=fp)
+    ax.set_ylabel('事件数量', fontsize=14, fontproperties=fp)
+    ax.set_xlabel('威胁类别', fontsize=14, fontproperties=fp)
+    ax.tick_params(axis='x', rotation=45)
+
+    # 添加数值标签
+    for bar, value in zip(bars, values):
+        ax.text(bar.get_x() + bar.get_width() / 2, bar.get_height() + max(values) * 0.01,
+                f'{value:,}', ha='center', va='bottom', fontweight='bold')
+
+    # 添加网格
+    ax.grid(axis='y', alpha=0.3, linestyle='--')
+    ax.set_axisbelow(True)
+
+    plt.tight_layout()
+    return _save_figure(output, fmt)
+
+
+def render_time_distribution(time_distribution, daily_distribution, font_path, output, fmt='png'):
+    """时间分布热力图 - 修复下面图表显示问题"""
+    fp = _font(font_path)
+    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(14, 10))
+
+    # 小时分布
+    hours = sorted(time_distribution.items())
+    x, y = zip(*hours) if hours else ([], [])
+
+    ax1.plot(x, y, marker='o', linewidth=3, markersize=8, color='#FF6B6B', alpha=0.8)
+    ax1.fill_between(x, y, alpha=0.3, color='#FF6B6B')
+    ax1.set_title('24小时威胁事件分布', fontsize=16, fontweight='bold', fontproperties=fp)
+    ax1.set_xlabel('小时', fontsize=12, fontproperties=fp)
+    ax1.set_ylabel('事件数量', fontsize=12, fontproperties=fp)
+    ax1.set_xticks(range(24))
+    ax1.grid(True, alpha=0.3)
+
+    # 设置x轴刻度标签字体
+    for label in ax1.get_xticklabels():
+        label.set_fontproperties(fp)
+    for label in ax1.get_yticklabels():
+        label.set_fontproperties(fp)
+
+    # 日期分布 - 修改条件判断，即使只有一天数据也显示
+    if len(daily_distribution) >= 1:
+        daily_data = sorted(daily_distribution.items())
+        dates, counts = zip(*daily_data)
+
+        ax2.bar(range(len(dates)), counts, color='#4ECDC4', alpha=0.7)
+        ax2.set_title('日期威胁事件分布', fontsize=16, fontweight='bold', fontproperties=fp)
+        ax2.set_xlabel('日期', fontsize=12, fontproperties=fp)
+        ax2.set_ylabel('事件数量', fontsize=12, fontproperties=fp)
+
+        # 设置x轴标签
+        if len(dates) > 10:
+            step = max(1, len(dates) // 10)
+            ax2.set_xticks(range(0, len(dates), step))
+            ax2.set_xticklabels([dates[i] for i in range(0, len(dates), step)], rotation=45)
+        else:
+            # 如果日期数量少，显示所有日期
+            ax2.set_xticks(range(len(dates)))
+            ax2.set_xticklabels(dates, rotation=45)
+
+        ax2.grid(True, alpha=0.3)
+
+        # 设置坐标轴刻度标签字体
+        for label in ax2.get_xticklabels():
+            label.set_fontproperties(fp)
+        for label in ax2.get_yticklabels():
+            label.set_fontproperties(fp)
+    else:
+        # 如果没有日期数据，显示提示信息
+        ax2.text(0.5, 0.5, '暂无日期分布数据', ha='center', va='center',
+                 transform=ax2.transAxes, fontsize=14, fontproperties=fp)
+        ax2.set_title('日期威胁事件分布', fontsize=16, fontweight='bold', fontproperties=fp)
+        ax2.set_xlabel('日期', fontsize=12, fontproperties=fp)
+        ax2.set_ylabel('事件数量', fontsize=12, fontproperties=fp)
+
+    plt.tight_layout()
+    return _save_figure(output, fmt)
+
+
+def render_severity_distribution(severity_levels, font_path, output, fmt='png'):
+    """威胁严重程度饼图 - 修复版本"""
+    fp = _font(font_path)
+    fig, ax = plt.subplots(figsize=(12, 10))  # 增大图表尺寸
+
+    labels = list(severity_levels.keys())
+    sizes = list(severity_levels.values())
+
+    # 定义颜色映射 - 使用更鲜明的颜色
+    color_map = {
+        '高': '#FF4444',  # 鲜红色
+        '中': '#FFA500',  # 橙色
+        '低': '#32CD32',  # 绿色
+        '严重': '#8B0000',  # 深红色
+        '警告': '#FF8C00',  # 深橙色
+        '信息': '#4169E1',  # 蓝色
+        '提示': '#9932CC'  # 紫色
+    }
+
+    # 为每个标签分配颜色，如果没有预定义颜色则使用默认色盘
+    colors_list = []
+    default_colors = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FECA57', '#FF9FF3', '#54A0FF']
+
+    for i, label in enumerate(labels):
+        if label in color_map:
+            colors_list.append(color_map[label])
+        else:
+            colors_list.append(default_colors[i % len(default_colors)])
+
+    # 设置饼图参数，不显示标签和百分比
+    wedges, texts = ax.pie(sizes,
+                           labels=None,  # 不显示标签
+                           colors=colors_list,
+                           autopct=None,  # 不显示百分比
+                           startangle=90,
+                           explode=[0.1 if label == '高' else 0.05 for label in labels])
+
+    ax.set_title('威胁严重程度分布', fontsize=20, fontweight='bold', pad=30, fontproperties=fp)
+
+    # 创建图例标签，避免使用可能显示为方格的字符
+    legend_labels = []
+    for label, size in zip(labels, sizes):
+        percentage = (size / sum(sizes)) * 100
+        # 使用英文字符替代可能有问题的中文字符
+        legend_labels.append(f'{label}等级: {size}个 ({percentage:.1f}%)')
+
+    # 调整图例位置，避免重叠
+    legend = ax.legend(wedges, legend_labels,
+                       title="威胁等级统计",
+                       loc="center left",
+                       bbox_to_anchor=(1.2, 0.5),
+                       fontsize=12,
+                       title_fontsize=14)
+
+    # 设置图例标题字体
+    if fp:
+        legend.get_title().set_fontproperties(fp)
+        # 设置图例文本字体
+        for text in legend.get_texts():
+            text.set_fontproperties(fp)
+
+    # 确保图表布局合理
+    plt.subplots_adjust(left=0.1, right=0.75)
+
+    return _save_figure(output, fmt)
+
+
+def render_top_ips(top_ips, font_path, output, fmt='png'):
+    """TOP IP威胁分析图，top_ips 为按事件数降序排列的 (ip, count) 列表"""
+    fp = _font(font_path)
+    fig, ax = plt.subplots(figsize=(12, 8))
+
+    ips, counts = zip(*top_ips)
+
+    bars = ax.barh(range(len(ips)), counts, color='#FF7F7F', alpha=0.8)
+
+    ax.set_yticks(range(len(ips)))
+    ax.set_yticklabels(ips)
+    ax.set_xlabel('威胁事件数量', fontsize=12, fontproperties=fp)
+    ax.set_title('TOP 10 威胁源IP', fontsize=16, fontweight='bold', fontproperties=fp)
+
+    # 添加数值标签
+    for i, (bar, count) in enumerate(zip(bars, counts)):
+        ax.text(bar.get_width() + max(counts) * 0.01, bar.get_y() + bar.get_height() / 2,
+                f'{count:,}', ha='left', va='center', fontweight='bold')
+
+    ax.grid(axis='x', alpha=0.3)
+    plt.tight_layout()
+
+    return _save_figure(output, fmt)
+
+
+def _run_chart_job(job):
+    render, args = job
+    try:
+        return render(*args)
+    finally:
+        # 渲染中途出错时也要释放未关闭的图
+        plt.close('all')
+
+
+def render_charts(jobs, font_path, parallel=False, max_workers=None):
+    """
+    渲染一组图表。
+
+    参数:
+        jobs (list): (render 函数, 参数元组) 列表，render 为本模块的 render_* 函数。
+            参数中的 output 为 None 时渲染到内存，结果为图像字节（可跨进程返回）。
+        font_path (str): 中文字体路径，并行时用于初始化子进程的绘图样式。
+        parallel (bool): 是否在进程池中并发渲染，每个子进程渲染一张图。
+        max_workers (int): 进程池大小，默认每张图一个进程。
+
+    返回:
+        list: 与 jobs 一一对应的渲染结果，渲染失败的图表为 None，不影响其他图表。
+    """
+    results = [None] * len(jobs)
+
+    if not parallel or len(jobs) <= 1:
+        for i, job in enumerate(jobs):
+            try:
+                results[i] = _run_chart_job(job)
+            except Exception as e:
+                print(f"⚠️ 图表渲染失败 ({job[0].__name__}): {e}")
+        return results
+
+    with ProcessPoolExecutor(max_workers=max_workers or len(jobs),
+                             initializer=apply_chart_style, initargs=(font_path,)) as pool:
+        futures = [pool.submit(_run_chart_job, job) for job in jobs]
+        for i, (job, future) in enumerate(zip(jobs, futures)):
+            try:
+                results[i] = future.result()
+            except Exception as e:
+                print(f"⚠️ 图表渲染失败 ({job[0].__name__}): {e}")
+    return results
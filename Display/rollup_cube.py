@@ -0,0 +1,323 @@
+import argparse
+import os
+import sqlite3
+import sys
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from export_batch import event_keys, find_exports, prepare_events
+from ip_ranges import DEFAULT_CLIENT_NETWORKS
+from sketches import HyperLogLog, SketchConfig
+from threat_stats import TIME_COLUMN, ThreatAggregate
+from xlsx_cache import file_sha256, load_export
+
+# tracing 位于仓库根目录，与 Clean 共用
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from tracing import enable_from_env, span  # noqa: E402
+
+# 预聚合立方体的默认位置
+ROLLUP_PATH = '../temp_files/rollup_cube.sqlite'
+# 按小时预聚合的维度: {库中列名: 导出表格列名}；威胁名称也作为维度，以便回答常见威胁类型
+CUBE_DIMENSIONS = {
+    'category': '威胁类别',
+    'severity': '威胁等级',
+    'name': '威胁名称',
+    'protocol': '应用层协议',
+    'port': '目的端口',
+    'ip_type': 'IP类型',
+}
+# 源IP分析（威胁源、客户端/服务端 TOP IP）使用的按小时预聚合维度
+IP_DIMENSIONS = {
+    'src_ip': '源IP',
+    'ip_type': 'IP类型',
+    'severity': '威胁等级',
+    'name': '威胁名称',
+}
+# ip_events 每小时、每种 IP类型只保留事件数最多的 IP_TOP_K 个源IP，存储量与原始事件数无关
+IP_TOP_K = 100
+# 由立方体汇总时的概要统计参数：源IP TOP 项与 IP_TOP_K 一致，不同源IP个数由每小时的 HyperLogLog 合并估计
+CUBE_SKETCH = SketchConfig(topk_error=1 / IP_TOP_K, distinct_error=0.02)
+# 只保留最新小时之前这段时间内事件的去重键；导出中更早的事件视为已由之前的导出计入，直接跳过
+KEY_HORIZON = pd.Timedelta(days=1)
+# threat_stats 计数键 -> 立方体维度
+CUBE_COUNTS = {
+    'threat_categories': 'category',
+    'threat_names': 'name',
+    'severity_levels': 'severity',
+    'protocols': 'protocol',
+    'common_ports': 'port',
+}
+# 维度取值为空时的占位值（SQLite 的 NULL 在唯一约束中互不相等，不能用于累加）
+MISSING_TEXT = ''
+MISSING_PORT = -1
+HOUR_FORMAT = '%Y-%m-%d %H:00:00'
+
+
+def _hour_buckets(times):
+    """把发现时间截断到小时并格式化为 'YYYY-MM-DD HH:00:00'，只格式化去重后的小时。"""
+    codes, hours = pd.factorize(times.dt.floor('h'))
+    text = np.array(list(pd.DatetimeIndex(hours).strftime(HOUR_FORMAT)) + [MISSING_TEXT], dtype=object)
+    return text[codes]
+
+
+def _dimension_frame(df, dimensions):
+    """取出维度列（缺失的列和空值用占位值填充），端口转为整数。"""
+    columns = {}
+    for name, col in dimensions.items():
+        values = df[col] if col in df.columns else pd.Series(np.nan, index=df.index)
+        if name == 'port':
+            columns[name] = pd.to_numeric(values, errors='coerce').fillna(MISSING_PORT).astype(np.int64)
+        else:
+            columns[name] = values.astype(object).where(values.notna(), MISSING_TEXT).astype(str)
+    return pd.DataFrame(columns, index=df.index)
+
+
+class RollupCube:
+    """
+    按小时预聚合的威胁事件计数，保存在 SQLite 中。
+
+    events 表按 (小时, 威胁类别, 威胁等级, 威胁名称, 应用层协议, 目的端口, IP类型) 计数。源IP维度只做概要：
+    ip_events 表按 (小时, 源IP, IP类型, 威胁等级, 威胁名称) 计数，但每小时每种 IP类型只保留 TOP IP_TOP_K 个源IP；
+    ip_distinct 表保存每小时源IP的 HyperLogLog 寄存器，用于估计任意范围内的不同源IP个数。
+    每份导出只需导入一次，之后任意时间范围的报告都只用 SQL 汇总这些计数，存储和汇总代价与小时数成正比，
+    与原始事件数无关。
+
+    最近 KEY_HORIZON 内事件的哈希键保存在 recent_keys 表中，相邻导出重叠的事件不会重复计数；更早的键被删除，
+    导出中早于这一范围的事件直接跳过。
+    """
+
+    def __init__(self, path=ROLLUP_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS events (
+                hour TEXT NOT NULL, category TEXT NOT NULL, severity TEXT NOT NULL, name TEXT NOT NULL,
+                protocol TEXT NOT NULL, port INTEGER NOT NULL, ip_type TEXT NOT NULL, count INTEGER NOT NULL,
+                PRIMARY KEY (hour, category, severity, name, protocol, port, ip_type)
+            );
+            CREATE TABLE IF NOT EXISTS ip_events (
+                hour TEXT NOT NULL, src_ip TEXT NOT NULL, ip_type TEXT NOT NULL, severity TEXT NOT NULL,
+                name TEXT NOT NULL, count INTEGER NOT NULL,
+                PRIMARY KEY (hour, src_ip, ip_type, severity, name)
+            );
+            CREATE TABLE IF NOT EXISTS ip_distinct (hour TEXT PRIMARY KEY, registers BLOB NOT NULL);
+            CREATE TABLE IF NOT EXISTS recent_keys (key INTEGER PRIMARY KEY, hour TEXT NOT NULL);
+            CREATE INDEX IF NOT EXISTS recent_keys_hour ON recent_keys (hour);
+            CREATE TABLE IF NOT EXISTS files (sha256 TEXT PRIMARY KEY, path TEXT, new_events INTEGER);
+            -- 旧版本保存全部事件键的表，已由 recent_keys 取代
+            DROP TABLE IF EXISTS event_keys;
+        ''')
+        self.conn.commit()
+
+    def ingest(self, file_path, client_networks=DEFAULT_CLIENT_NETWORKS):
+        """
+        将一份导出累加到立方体；内容相同的文件只导入一次，已导入过的事件被忽略。
+
+        参数:
+            file_path (str): envet_log XLSX 文件的路径。
+            client_networks: 视为客户端的 CIDR 网段。
+
+        返回:
+            int: 新增的事件数。
+        """
+        sha256 = file_sha256(file_path)
+        if self.conn.execute('SELECT 1 FROM files WHERE sha256 = ?', (sha256,)).fetchone():
+            return 0
+
+        df = load_export(file_path)
+        keys = event_keys(df).view(np.int64)
+        df = prepare_events(df, client_networks)
+        hours = _hour_buckets(df[TIME_COLUMN])
+        # 没有发现时间的事件不计入立方体；早于保留范围的事件已由之前的导出计入
+        keep = (hours != MISSING_TEXT) & ~pd.Series(keys).duplicated().to_numpy()
+        horizon = self._key_horizon()
+        if horizon is not None:
+            keep &= hours >= horizon
+        df, keys, hours = df[keep], keys[keep], hours[keep]
+
+        with self.conn:
+            self.conn.execute('CREATE TEMP TABLE IF NOT EXISTS new_keys (pos INTEGER PRIMARY KEY, key INTEGER, '
+                              'hour TEXT)')
+            self.conn.execute('DELETE FROM new_keys')
+            self.conn.executemany('INSERT INTO new_keys VALUES (?, ?, ?)',
+                                  zip(range(len(keys)), keys.tolist(), hours.tolist()))
+            positions = [pos for pos, in self.conn.execute(
+                'SELECT pos FROM new_keys WHERE key NOT IN (SELECT key FROM recent_keys) ORDER BY pos')]
+            self.conn.execute('INSERT OR IGNORE INTO recent_keys SELECT key, hour FROM new_keys')
+
+            df, hours = df.iloc[positions], hours[positions]
+            if len(df):
+                self._accumulate('events', df, hours, CUBE_DIMENSIONS)
+                self._accumulate('ip_events', df, hours, IP_DIMENSIONS)
+                self._prune_ip_events(hours)
+                self._add_distinct(df, hours)
+            horizon = self._key_horizon()
+            if horizon is not None:
+                self.conn.execute('DELETE FROM recent_keys WHERE hour < ?', (horizon,))
+            self.conn.execute('INSERT INTO files VALUES (?, ?, ?)', (sha256, file_path, len(df)))
+        return len(df)
+
+    def _key_horizon(self):
+        """保留事件键的最早小时（最新小时减去 KEY_HORIZON），立方体为空时为 None。"""
+        latest = self.conn.execute('SELECT MAX(hour) FROM events').fetchone()[0]
+        if latest is None:
+            return None
+        return (pd.Timestamp(latest) - KEY_HORIZON).strftime(HOUR_FORMAT)
+
+    def _accumulate(self, table, df, hours, dimensions):
+        """按小时和维度分组计数，累加到 table。"""
+        frame = _dimension_frame(df, dimensions)
+        frame.insert(0, 'hour', hours)
+        counts = frame.groupby(list(frame.columns), sort=False).size()
+        columns = ['hour'] + list(dimensions)
+        self.conn.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}, count) VALUES ({', '.join('?' * (len(columns) + 1))}) "
+            f"ON CONFLICT ({', '.join(columns)}) DO UPDATE SET count = count + excluded.count",
+            [key + (int(count),) for key, count in counts.items()])
+
+    def _prune_ip_events(self, hours):
+        """本次涉及的每个小时、每种 IP类型只保留事件数最多的 IP_TOP_K 个源IP。"""
+        self.conn.execute('CREATE TEMP TABLE IF NOT EXISTS touched_hours (hour TEXT PRIMARY KEY)')
+        self.conn.executemany('INSERT OR IGNORE INTO touched_hours VALUES (?)', ((hour,) for hour in set(hours)))
+        self.conn.execute('''
+            DELETE FROM ip_events WHERE hour IN (SELECT hour FROM touched_hours)
+            AND (hour, ip_type, src_ip) NOT IN (
+                SELECT hour, ip_type, src_ip FROM (
+                    SELECT hour, ip_type, src_ip,
+                           ROW_NUMBER() OVER (PARTITION BY hour, ip_type ORDER BY SUM(count) DESC, src_ip) AS rank
+                    FROM ip_events WHERE hour IN (SELECT hour FROM touched_hours)
+                    GROUP BY hour, ip_type, src_ip
+                ) WHERE rank <= ?
+            )
+        ''', (IP_TOP_K,))
+        self.conn.execute('DELETE FROM touched_hours')
+
+    def _add_distinct(self, df, hours):
+        """把新事件的源IP加入各小时的 HyperLogLog。"""
+        if '源IP' not in df.columns:
+            return
+        ips = pd.DataFrame({'hour': hours, 'ip': df['源IP'].to_numpy()}).dropna().drop_duplicates()
+        for hour, group in ips.groupby('hour', sort=False):
+            sketch = HyperLogLog.for_error(CUBE_SKETCH.distinct_error)
+            row = self.conn.execute('SELECT registers FROM ip_distinct WHERE hour = ?', (hour,)).fetchone()
+            if row:
+                sketch.registers = np.frombuffer(row[0], dtype=np.uint8).copy()
+            sketch.add(group['ip'])
+            self.conn.execute('INSERT OR REPLACE INTO ip_distinct VALUES (?, ?)', (hour, sketch.registers.tobytes()))
+
+    def ingest_exports(self, files, client_networks=DEFAULT_CLIENT_NETWORKS):
+        """依次导入多份导出，返回新增的事件总数。"""
+        return sum(self.ingest(file_path, client_networks) for file_path in files)
+
+    def _query(self, sql, start, end, group_by=None):
+        """汇总 [start, end] 范围内的计数；end 只给出日期时包含当天全天。"""
+        conditions, params = [], []
+        if start is not None:
+            conditions.append('hour >= ?')
+            params.append(pd.Timestamp(start).floor('h').strftime(HOUR_FORMAT))
+        if end is not None:
+            end = pd.Timestamp(end)
+            if end == end.normalize():
+                end += pd.Timedelta(days=1) - pd.Timedelta(hours=1)
+            conditions.append('hour <= ?')
+            params.append(end.floor('h').strftime(HOUR_FORMAT))
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+        group = f" GROUP BY {group_by}" if group_by else ''
+        return pd.read_sql_query(sql + where + group, self.conn, params=params)
+
+    def aggregate(self, start=None, end=None):
+        """
+        由立方体得到 [start, end] 范围（小时粒度）的 ThreatAggregate，可直接交给 summarize_threats。
+
+        源IP相关的统计为概要统计（CUBE_SKETCH）：TOP 源IP 由每小时保留的 TOP IP 汇总，不同源IP个数为估计值。
+        立方体中没有目的IP，destination_ips 为空。
+
+        返回:
+            ThreatAggregate: 汇总结果。
+        """
+        aggregate = ThreatAggregate(CUBE_SKETCH)
+        for key, dimension in CUBE_COUNTS.items():
+            sums = self._query(f'SELECT {dimension}, SUM(count) AS count FROM events', start, end, dimension)
+            missing = MISSING_PORT if dimension == 'port' else MISSING_TEXT
+            sums = sums[sums[dimension] != missing]
+            aggregate.counts[key].update(dict(zip(sums[dimension], sums['count'].astype(int))))
+
+        hours = self._query('SELECT hour, SUM(count) AS count FROM events', start, end, 'hour')
+        aggregate.total_events = int(hours['count'].sum())
+        times = pd.DatetimeIndex(pd.to_datetime(hours['hour'], format='%Y-%m-%d %H:%M:%S'))
+        counts = hours['count'].to_numpy(dtype=np.int64)
+        hour_of_day = times.hour.to_numpy()
+        np.add.at(aggregate.hour_counts, hour_of_day, counts)
+        np.add.at(aggregate.weekday_hour, (times.dayofweek.to_numpy(), hour_of_day), counts)
+        days = pd.Series(counts).groupby(times.strftime('%Y-%m-%d')).sum()
+        aggregate.daily_counts = Counter({day: int(count) for day, count in days.items()})
+
+        self._aggregate_ips(aggregate, start, end)
+        return aggregate
+
+    def _aggregate_ips(self, aggregate, start, end):
+        """用 SQL 汇总范围内的源IP计数、客户端/服务端 TOP IP 的威胁明细，并合并各小时的 HyperLogLog。"""
+        sources = self._query('SELECT src_ip, SUM(count) AS count FROM ip_events', start, end, 'src_ip')
+        sources = sources[sources['src_ip'] != MISSING_TEXT]
+        aggregate.counts['source_ips'].update(sources.set_index('src_ip')['count'])
+
+        ips = self._query('SELECT ip_type, src_ip, SUM(count) AS count FROM ip_events', start, end, 'ip_type, src_ip')
+        ips = ips[ips['src_ip'] != MISSING_TEXT]
+        for ip_type, counts in aggregate.ip_counts.items():
+            counts.update(ips[ips['ip_type'] == ip_type].set_index('src_ip')['count'])
+
+        # 只取客户端/服务端 TOP IP 的威胁明细
+        self.conn.execute('CREATE TEMP TABLE IF NOT EXISTS top_ips (ip_type TEXT, src_ip TEXT)')
+        self.conn.execute('DELETE FROM top_ips')
+        self.conn.executemany('INSERT INTO top_ips VALUES (?, ?)',
+                              [(ip_type, ip) for ip_type, counts in aggregate.ip_counts.items() for ip in counts.counts])
+        threats = self._query('SELECT ip_type, src_ip, severity, name, SUM(count) AS count '
+                              'FROM ip_events JOIN top_ips USING (ip_type, src_ip)', start, end,
+                              'ip_type, src_ip, severity, name')
+        for ip_type, ip, severity, name, count in threats.itertuples(index=False):
+            aggregate.ip_threats[ip_type][ip][f"[{severity or 'nan'}] {name or 'nan'}"] += int(count)
+
+        registers = self._query('SELECT registers FROM ip_distinct', start, end)['registers']
+        distinct = aggregate.distinct['source_ips']
+        for blob in registers:
+            np.maximum(distinct.registers, np.frombuffer(blob, dtype=np.uint8), out=distinct.registers)
+
+    def hour_range(self, start=None, end=None):
+        """范围内有数据的第一个和最后一个小时，没有数据时为 (None, None)。"""
+        hours = self._query('SELECT MIN(hour) AS first, MAX(hour) AS last FROM events', start, end)
+        return hours['first'].iloc[0], hours['last'].iloc[0]
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='把 ../downloads 下的导出累加到按小时预聚合的立方体')
+    parser.add_argument('--path', default=ROLLUP_PATH, help='立方体文件路径')
+    args = parser.parse_args()
+    # 设置了 ENVET_TRACE 等环境变量时记录各步骤的耗时与内存
+    enable_from_env()
+
+    files = find_exports()
+    if not files:
+        print("❌ ../downloads/ 目录下未找到匹配 'envet_log*.xlsx' 的文件。")
+        exit()
+
+    with RollupCube(args.path) as cube:
+        for file_path in files:
+            with span('ingest', file=file_path) as traced:
+                new_events = cube.ingest(file_path)
+                traced.set(rows=new_events)
+            print(f"📥 {file_path}: 新增 {new_events:,} 条事件")
+        first, last = cube.hour_range()
+        print(f"✅ 立方体已更新: {args.path}（{first} ~ {last}）")
@@ -0,0 +1,131 @@
+import math
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# 概要统计（sketch）模式的误差参数：
+#   topk_error      Space-Saving 的计数误差上限占总事件数的比例，容量为 ceil(1 / topk_error)
+#   distinct_error  HyperLogLog 去重计数的相对标准误差，寄存器个数为 (1.04 / distinct_error)^2 向上取 2 的幂
+SketchConfig = namedtuple('SketchConfig', ['topk_error', 'distinct_error'])
+DEFAULT_SKETCH = SketchConfig(topk_error=0.001, distinct_error=0.01)
+
+
+class SpaceSaving:
+    """
+    Space-Saving 高频项概要：最多保存 capacity 个取值的计数，可合并。
+
+    每个取值的估计计数不小于真实计数，且多估的部分不超过 error(value)；未保存的取值真实计数不超过 floor。
+    单个文件的误差不超过 总数 / capacity，合并后误差为各部分误差之和的上界。
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        self.floor = 0
+        self.total = 0
+
+    @classmethod
+    def for_error(cls, error):
+        """按误差比例创建：任一取值多估的次数不超过 error × 总数。"""
+        return cls(math.ceil(1 / error))
+
+    def update(self, counts):
+        """
+        合并一批计数，返回 self。
+
+        参数:
+            counts (dict | pandas.Series | SpaceSaving): 一个分块的精确计数（取值 -> 次数），或另一个概要。
+        """
+        if not isinstance(counts, SpaceSaving):
+            other = SpaceSaving(self.capacity)
+            counts = pd.Series(counts, dtype='int64') if isinstance(counts, dict) else counts
+            other.total = int(counts.sum())
+            if len(counts) > self.capacity:
+                top = counts.nlargest(self.capacity + 1)
+                # 被舍弃的取值不超过第 capacity + 1 大的计数
+                other.floor = int(top.iloc[-1])
+                counts = top.iloc[:-1]
+            other.counts = {key: int(count) for key, count in counts.items()}
+            counts = other
+
+        merged, errors = {}, {}
+        for key in self.counts.keys() | counts.counts.keys():
+            merged[key] = self.counts.get(key, self.floor) + counts.counts.get(key, counts.floor)
+            errors[key] = self.errors.get(key, self.floor) + counts.errors.get(key, counts.floor)
+        floor = self.floor + counts.floor
+        if len(merged) > self.capacity:
+            ranked = sorted(merged.items(), key=lambda item: item[1], reverse=True)
+            floor = max(floor, ranked[self.capacity][1])
+            merged = dict(ranked[:self.capacity])
+            errors = {key: errors[key] for key in merged}
+
+        self.counts, self.errors, self.floor = merged, errors, floor
+        self.total += counts.total
+        return self
+
+    def most_common(self, n=None):
+        """按估计计数降序返回 [(取值, 计数)]。"""
+        return sorted(self.counts.items(), key=lambda item: item[1], reverse=True)[:n]
+
+    def __contains__(self, key):
+        return key in self.counts
+
+
+class HyperLogLog:
+    """
+    HyperLogLog 去重计数：固定 2^precision 个 8 位寄存器，可合并（寄存器取最大值）。
+
+    取值先统一转为字符串再做 64 位哈希，同一取值在不同文件中类型不同（整数/字符串）也只计一次。
+    """
+
+    def __init__(self, precision=14):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    @classmethod
+    def for_error(cls, error):
+        """按相对标准误差创建，精度限制在 4–18（寄存器 16 个到 256K 个）。"""
+        precision = math.ceil(math.log2((1.04 / error) ** 2))
+        return cls(min(max(precision, 4), 18))
+
+    def add(self, values):
+        """
+        向量化加入一批取值（重复取值不影响结果，传入去重后的取值更快），返回 self。
+
+        参数:
+            values (array-like): 取值，空值被跳过。
+        """
+        values = pd.Series(values, dtype=object).dropna()
+        if values.empty:
+            return self
+        hashes = pd.util.hash_array(values.astype(str).to_numpy(dtype=object))
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.intp)
+        rest = hashes & np.uint64((1 << (64 - self.precision)) - 1)
+
+        # 剩余位的二进制长度；拆成高低 32 位再转浮点，frexp 的指数即精确的位长
+        high = (rest >> np.uint64(32)).astype(np.float64)
+        low = (rest & np.uint64(0xFFFFFFFF)).astype(np.float64)
+        bit_length = np.where(high > 0, 32 + np.frexp(high)[1], np.frexp(low)[1])
+        rank = (64 - self.precision) - bit_length + 1
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+        return self
+
+    def merge(self, other):
+        """合并另一个相同精度的 HyperLogLog，返回 self。"""
+        if other.precision != self.precision:
+            raise ValueError(f"HyperLogLog 精度不同: {self.precision} != {other.precision}")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self):
+        """估计的不同取值个数。"""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m) if m >= 128 else {16: 0.673, 32: 0.697, 64: 0.709}[m]
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # 小基数时改用线性计数
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
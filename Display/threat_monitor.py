@@ -0,0 +1,277 @@
+import argparse
+import glob
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+from ip_ranges import DEFAULT_CLIENT_NETWORKS, classify_ip, network_intervals
+from report import EnhancedThreatReportGenerator
+from threat_stats import ThreatAggregate
+
+# 默认跟踪 downloads 中最新的 JSON Lines 导出
+WATCH_PATTERN = '../downloads/*envet_log*.json'
+# 读到文件末尾后的轮询间隔（秒）
+POLL_INTERVAL = 0.5
+# 每次最多读取的字符数，从头处理大文件时分块产出
+READ_SIZE = 1 << 20
+# 滚动窗口: {名称: (窗口长度秒, 桶长度秒)}，窗口由 长度/桶长度 个环形桶组成，每过一个桶长度滚动一次
+WINDOWS = {
+    '1m': (60, 5),
+    '1h': (3600, 60),
+    '24h': (86400, 900),
+}
+# threat_stats 计数键 -> 原始 JSON 记录中的字段，按顺序取第一个存在的（也接受导出表格的中文列名）
+EVENT_FIELDS = {
+    'threat_categories': ('classtype', '威胁类别'),
+    'threat_names': ('sub_category', '威胁名称'),
+    'severity_levels': ('severity', '威胁等级'),
+    'source_ips': ('src_ip', '源IP'),
+    'destination_ips': ('dst_ip', '目的IP'),
+    'common_ports': ('dst_port', '目的端口'),
+    'protocols': ('proto', '应用层协议'),
+}
+# 缓存最近判断过的源IP类型的个数；监控长期运行，缓存不能随不同IP的个数无限增长
+IP_TYPE_CACHE_SIZE = 65536
+# 与 clean.py 一致，毫秒时间戳按 UTC 转换为不带时区的时间
+EPOCH = datetime(1970, 1, 1)
+
+
+def _field(record, names):
+    for name in names:
+        value = record.get(name)
+        if value is not None and value != '':
+            return value
+    return None
+
+
+def event_time(record):
+    """事件的发现时间：毫秒时间戳 timestamp 或 '发现时间' 字符串，都没有或无法解析时返回 None。"""
+    try:
+        if record.get('timestamp') is not None:
+            return EPOCH + timedelta(milliseconds=float(record['timestamp']))
+        if record.get('发现时间'):
+            return datetime.strptime(str(record['发现时间']), '%Y-%m-%d %H:%M:%S')
+    except (TypeError, ValueError, OverflowError):
+        pass
+    return None
+
+
+class SlidingWindow:
+    """
+    由环形桶组成的滑动窗口。
+
+    每个桶是一个 ThreatAggregate，另外维护整个窗口的累计结果 total：事件同时加入所在的桶和 total，
+    桶滑出窗口时从 total 中减去。每个事件只被加入、减去各一次，摊还代价为 O(1)，与窗口内的事件数无关。
+    """
+
+    def __init__(self, span, bucket_seconds):
+        self.bucket_seconds = bucket_seconds
+        self.size = max(1, span // bucket_seconds)
+        self.buckets = [None] * self.size
+        # 最新桶的编号（时间秒数 // 桶长度），尚未收到事件时为 None
+        self.head = None
+        self.total = ThreatAggregate()
+
+    def advance(self, seconds):
+        """
+        把窗口推进到 seconds 所在的桶，逐出滑出窗口的桶。
+
+        返回:
+            bool: 是否进入了新的桶（即窗口滚动了一次）。
+        """
+        number = int(seconds // self.bucket_seconds)
+        if self.head is None:
+            self.head = number
+            return True
+        if number <= self.head:
+            return False
+        # 最多清空一整圈，跳过很长时间时不必逐个桶遍历
+        for expired in range(self.head + 1, min(number, self.head + self.size) + 1):
+            slot = expired % self.size
+            if self.buckets[slot] is not None:
+                self.total.subtract(self.buckets[slot])
+                self.buckets[slot] = None
+        self.head = number
+        return True
+
+    def add(self, seconds, values, occurred=None, ip_type=None, threat=None):
+        """加入一个事件，返回窗口是否因此滚动；早于窗口范围的迟到事件被忽略。"""
+        ticked = self.advance(seconds)
+        number = int(seconds // self.bucket_seconds)
+        if number <= self.head - self.size:
+            return ticked
+        slot = number % self.size
+        if self.buckets[slot] is None:
+            self.buckets[slot] = ThreatAggregate()
+        self.buckets[slot].add_event(values, occurred, ip_type, threat)
+        self.total.add_event(values, occurred, ip_type, threat)
+        return ticked
+
+
+class ThreatMonitor:
+    """
+    实时威胁监控：逐条接收事件，维护多个滑动窗口的 threat_stats，窗口每滚动一次重新计算风险评分。
+
+    时钟以事件时间为准：收到事件后，时钟从最新的事件时间起随真实时间前进，数据源暂停时窗口照常滚动、过期。
+    """
+
+    def __init__(self, windows=None, top_n=5, client_networks=None, on_tick=None):
+        """
+        参数:
+            windows (dict): {名称: (窗口长度秒, 桶长度秒)}，默认 WINDOWS。
+            top_n (int): 客户端/服务端分析中列出的 TOP IP 个数。
+            client_networks: 视为客户端的 CIDR 网段。
+            on_tick (callable): on_tick(窗口名称, 时钟时间, threat_stats)，默认打印一行摘要。
+        """
+        self.windows = {name: SlidingWindow(span, bucket) for name, (span, bucket) in (windows or WINDOWS).items()}
+        self.generator = EnhancedThreatReportGenerator(top_n=top_n, client_networks=client_networks)
+        self.client_networks = client_networks if client_networks is not None else DEFAULT_CLIENT_NETWORKS
+        self.on_tick = on_tick or print_tick
+        self.latest = None
+        self.latest_at = None
+        starts, ends = network_intervals(self.client_networks)
+        intervals = (starts.tolist(), ends.tolist())
+        # 源IP的类型，按区间二分查找；最近用过的 IP 缓存在有界的 LRU 中
+        self._ip_type = lru_cache(maxsize=IP_TYPE_CACHE_SIZE)(lambda ip: classify_ip(ip, intervals))
+        self.events = 0
+        self.invalid_lines = 0
+
+    def clock(self):
+        """当前的事件时间（秒）。"""
+        if self.latest is None:
+            return None
+        return self.latest + (time.monotonic() - self.latest_at)
+
+    def add_record(self, record):
+        """
+        加入一条原始事件记录。
+
+        返回:
+            set: 因此滚动的窗口名称。
+        """
+        values = {key: _field(record, names) for key, names in EVENT_FIELDS.items()}
+        occurred = event_time(record)
+        seconds = (occurred - EPOCH).total_seconds() if occurred is not None else self.clock()
+        if seconds is None:
+            seconds = time.time()
+        if self.latest is None or seconds > self.latest:
+            self.latest = seconds
+            self.latest_at = time.monotonic()
+
+        ip = values['source_ips']
+        ip_type = self._ip_type(ip) if ip is not None else None
+        threat = f"[{values['severity_levels']}] {values['threat_names']}"
+
+        self.events += 1
+        return {name for name, window in self.windows.items()
+                if window.add(seconds, values, occurred, ip_type, threat)}
+
+    def add_lines(self, lines):
+        """加入一批 JSON Lines，返回滚动的窗口名称；无法解析的行被跳过。"""
+        ticked = set()
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                self.invalid_lines += 1
+                continue
+            if isinstance(record, dict):
+                ticked |= self.add_record(record)
+        return ticked
+
+    def tick(self, ticked=()):
+        """按当前时钟推进所有窗口，并对滚动了的窗口重新计算 threat_stats 和风险评分。"""
+        now = self.clock()
+        if now is None:
+            return {}
+        ticked = set(ticked) | {name for name, window in self.windows.items() if window.advance(now)}
+        results = {}
+        for name in self.windows:
+            if name in ticked:
+                results[name] = self.window_stats(name)
+                self.on_tick(name, EPOCH + timedelta(seconds=now), results[name])
+        return results
+
+    def window_stats(self, name):
+        """窗口当前的 threat_stats（含风险评分）。"""
+        return self.generator.summarize_threats(self.windows[name].total)
+
+    def follow(self, path, from_start=False, poll_interval=POLL_INTERVAL):
+        """持续跟踪 path 中新追加的事件，直到被中断。"""
+        for lines in tail_lines(path, from_start, poll_interval):
+            self.tick(self.add_lines(lines))
+
+
+def tail_lines(path, from_start=False, poll_interval=POLL_INTERVAL):
+    """
+    跟踪不断追加的文本文件，每次轮询产出新增的完整行列表（没有新行时为空列表）。
+
+    未以换行结尾的最后一行留到下次读取；文件被截断或替换（轮转）时从头重新读取。
+
+    参数:
+        path (str): 文件路径。
+        from_start (bool): 是否先读取已有内容，默认从文件末尾开始。
+        poll_interval (float): 读到末尾后的等待时间（秒）。
+    """
+    f = open(path, 'r', encoding='utf-8')
+    try:
+        if not from_start:
+            f.seek(0, os.SEEK_END)
+        inode = os.fstat(f.fileno()).st_ino
+        pending = ''
+        while True:
+            chunk = f.read(READ_SIZE)
+            if chunk:
+                lines = (pending + chunk).split('\n')
+                pending = lines.pop()
+                yield lines
+                continue
+
+            yield []
+            time.sleep(poll_interval)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if stat.st_ino != inode or stat.st_size < f.tell():
+                f.close()
+                f = open(path, 'r', encoding='utf-8')
+                inode = os.fstat(f.fileno()).st_ino
+                pending = ''
+    finally:
+        f.close()
+
+
+def print_tick(name, now, threat_stats):
+    """打印窗口滚动时的一行摘要。"""
+    top_ips = ', '.join(f"{ip}({count})" for ip, count in list(threat_stats['source_ips'].items())[:3])
+    top_ports = ', '.join(f"{port}({count})" for port, count in list(threat_stats['common_ports'].items())[:3])
+    severity = ', '.join(f"{level}:{count}" for level, count in threat_stats['severity_levels'].items())
+    print(f"🕒 {now:%Y-%m-%d %H:%M:%S} [{name:>3}] 事件 {threat_stats['total_events']:,} "
+          f"风险 {threat_stats['risk_score']:.1f} | 等级 {severity or '-'} | "
+          f"TOP源IP {top_ips or '-'} | TOP端口 {top_ports or '-'}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='实时威胁监控：跟踪 JSON Lines 事件文件并维护滑动窗口统计')
+    parser.add_argument('path', nargs='?', help='事件文件，默认 ../downloads 中最新的 envet_log*.json')
+    parser.add_argument('--from-start', action='store_true', help='先处理文件中已有的事件')
+    parser.add_argument('--interval', type=float, default=POLL_INTERVAL, help='轮询间隔（秒）')
+    args = parser.parse_args()
+
+    path = args.path or max(glob.glob(WATCH_PATTERN), default=None)
+    if path is None:
+        print("❌ ../downloads/ 目录下未找到匹配 'envet_log*.json' 的文件。")
+        exit()
+
+    print(f"👀 正在监控: {path}（窗口: {', '.join(WINDOWS)}，Ctrl+C 停止）")
+    monitor = ThreatMonitor()
+    try:
+        monitor.follow(path, from_start=args.from_start, poll_interval=args.interval)
+    except KeyboardInterrupt:
+        print(f"\n👋 监控已停止，共处理 {monitor.events:,} 条事件（无法解析 {monitor.invalid_lines} 行）")
@@ -0,0 +1,311 @@
+from collections import Counter, defaultdict
+
+import numpy as np
+import pandas as pd
+
+from sketches import HyperLogLog, SpaceSaving
+
+# threat_stats 中按取值计数的字段: {threat_stats 键: 列名}
+COUNT_COLUMNS = {
+    'threat_categories': '威胁类别',
+    'threat_names': '威胁名称',
+    'severity_levels': '威胁等级',
+    'source_ips': '源IP',
+    'destination_ips': '目的IP',
+    'common_ports': '目的端口',
+    'protocols': '应用层协议',
+}
+# 结果中只保留前若干项的计数字段
+COUNT_LIMITS = {'common_ports': 10}
+TIME_COLUMN = '发现时间'
+# 客户端/服务端分析: {threat_stats 键: IP类型}
+IP_TYPE_ANALYSIS = {'client_analysis': '客户端', 'server_analysis': '服务端'}
+# 概要统计模式下用 Space-Saving 保存 TOP 项的计数字段，以及用 HyperLogLog 估计不同取值个数的字段
+SKETCH_COLUMNS = ('source_ips', 'destination_ips', 'common_ports')
+DISTINCT_COLUMNS = ('source_ips', 'destination_ips')
+
+
+def time_histograms(times):
+    """
+    向量化统计事件的小时分布、日期分布和星期×小时矩阵。
+
+    与逐行遍历 time.hour / time.strftime('%Y-%m-%d') 的结果完全一致，
+    字典的键按首次出现的顺序排列，空值被跳过。
+
+    参数:
+        times (pandas.Series): 发现时间列（datetime64 类型）。
+
+    返回:
+        tuple: (time_distribution, daily_distribution, weekday_hour_matrix)
+            time_distribution: defaultdict(int)，小时(int) -> 事件数
+            daily_distribution: defaultdict(int)，日期字符串 'YYYY-MM-DD' -> 事件数
+            weekday_hour_matrix: 7×24 的嵌套列表，行是星期一到星期日，列是 0-23 时
+    """
+    time_distribution = defaultdict(int)
+    daily_distribution = defaultdict(int)
+    weekday_hour_matrix = [[0] * 24 for _ in range(7)]
+
+    if not pd.api.types.is_datetime64_any_dtype(times):
+        return time_distribution, daily_distribution, weekday_hour_matrix
+
+    times = times.dropna()
+    if times.empty:
+        return time_distribution, daily_distribution, weekday_hour_matrix
+
+    hours = times.dt.hour.to_numpy()
+    hour_codes, hour_values = pd.factorize(hours)
+    for hour, count in zip(hour_values, np.bincount(hour_codes)):
+        time_distribution[int(hour)] = int(count)
+
+    # 先按天分组，只对去重后的日期做格式化
+    day_codes, day_values = pd.factorize(times.dt.normalize())
+    for day, count in zip(day_values.strftime('%Y-%m-%d'), np.bincount(day_codes)):
+        daily_distribution[day] = int(count)
+
+    cells = times.dt.dayofweek.to_numpy() * 24 + hours
+    weekday_hour_matrix = np.bincount(cells, minlength=7 * 24).reshape(7, 24).tolist()
+
+    return time_distribution, daily_distribution, weekday_hour_matrix
+
+
+def top_ip_threats(df, top_n=5, ip_column='源IP', level_column='威胁等级', name_column='威胁名称'):
+    """
+    统计出现次数最多的 top_n 个源IP，以及每个IP的 "[威胁等级] 威胁名称" 分布。
+
+    只对 TOP IP 的行做一次 (IP, 威胁等级, 威胁名称) 分组计数，代替逐个 IP 扫描整表，
+    结果与逐个 IP 使用 Counter 统计相同（威胁按在该 IP 中首次出现的顺序排列）。
+
+    参数:
+        df (pandas.DataFrame): 事件数据。
+        top_n (int): 返回的 IP 个数。
+
+    返回:
+        dict: {ip: {'count': 事件数, 'threats': {"[等级] 名称": 次数}}}，按事件数降序排列。
+    """
+    top_ips = df[ip_column].value_counts().head(top_n)
+    ip_analysis = {ip: {'count': count, 'threats': {}} for ip, count in top_ips.items()}
+
+    if top_ips.empty or level_column not in df.columns or name_column not in df.columns:
+        return ip_analysis
+
+    rows = df.loc[df[ip_column].isin(top_ips.index), [ip_column, level_column, name_column]]
+    grouped = rows.groupby([ip_column, level_column, name_column], sort=False, dropna=False).size()
+    for (ip, level, name), count in grouped.items():
+        threats = ip_analysis[ip]['threats']
+        key = f"[{level}] {name}"
+        threats[key] = threats.get(key, 0) + int(count)
+
+    return ip_analysis
+
+
+def _value_counts(series):
+    """取值计数（不含空值和 category 中未出现的类别）。"""
+    counts = series.value_counts()
+    return counts[counts > 0]
+
+
+def _add_counts(counter, counts):
+    """把一个分块的取值计数（Series）累加到 Counter 或 SpaceSaving。"""
+    counter.update(counts if isinstance(counter, SpaceSaving) else counts.to_dict())
+
+
+def _subtract_counter(counter, other):
+    """counter 减去 other，只遍历 other 的键，计数归零的键被删除。"""
+    for key, count in other.items():
+        remaining = counter[key] - count
+        if remaining > 0:
+            counter[key] = remaining
+        else:
+            del counter[key]
+
+
+class ThreatAggregate:
+    """
+    可合并的威胁统计中间结果：各列取值计数、时间直方图，以及客户端/服务端每个源IP的威胁计数。
+
+    每个分块或文件单独统计（可在子进程中进行，只把这个小对象传回），再用 merge 合并，
+    合并结果与对整表统计相同；to_threat_stats 生成报告使用的 threat_stats 字典。
+
+    指定 sketch（sketches.SketchConfig）时为概要统计模式：源/目的IP、端口只用 Space-Saving 保存 TOP 项，
+    不同IP个数用 HyperLogLog 估计，内存占用与不同IP的个数无关；客户端/服务端分析也只保留 TOP 项的威胁明细。
+    该模式只支持按分块统计与合并，不支持 add_event/subtract。
+    """
+
+    def __init__(self, sketch=None):
+        self.sketch = sketch
+        self.total_events = 0
+        self.counts = {key: Counter() for key in COUNT_COLUMNS}
+        self.hour_counts = np.zeros(24, dtype=np.int64)
+        self.daily_counts = Counter()
+        self.weekday_hour = np.zeros((7, 24), dtype=np.int64)
+        # {IP类型: Counter(源IP -> 事件数)}、{IP类型: {源IP: Counter("[等级] 名称" -> 次数)}}
+        self.ip_counts = {ip_type: Counter() for ip_type in IP_TYPE_ANALYSIS.values()}
+        self.ip_threats = {ip_type: defaultdict(Counter) for ip_type in IP_TYPE_ANALYSIS.values()}
+        self.distinct = None
+        if sketch is not None:
+            for key in SKETCH_COLUMNS:
+                self.counts[key] = SpaceSaving.for_error(sketch.topk_error)
+            for ip_type in IP_TYPE_ANALYSIS.values():
+                self.ip_counts[ip_type] = SpaceSaving.for_error(sketch.topk_error)
+            self.distinct = {key: HyperLogLog.for_error(sketch.distinct_error) for key in DISTINCT_COLUMNS}
+
+    @classmethod
+    def from_frame(cls, df, sketch=None):
+        """统计一个 DataFrame（需已完成预处理：发现时间为 datetime，且带 IP类型 列）。"""
+        return cls(sketch).add_frame(df)
+
+    def add_frame(self, df):
+        """把一个分块的统计累加到当前结果，返回 self。"""
+        self.total_events += len(df)
+        for key, col in COUNT_COLUMNS.items():
+            if col in df.columns:
+                counts = _value_counts(df[col])
+                _add_counts(self.counts[key], counts)
+                if self.distinct is not None and key in self.distinct:
+                    self.distinct[key].add(counts.index)
+
+        if TIME_COLUMN in df.columns:
+            time_distribution, daily_distribution, weekday_hour_matrix = time_histograms(df[TIME_COLUMN])
+            for hour, count in time_distribution.items():
+                self.hour_counts[hour] += count
+            self.daily_counts.update(daily_distribution)
+            self.weekday_hour += np.asarray(weekday_hour_matrix, dtype=np.int64)
+
+        if 'IP类型' in df.columns and '源IP' in df.columns:
+            for ip_type in IP_TYPE_ANALYSIS.values():
+                self._add_ip_threats(ip_type, df[df['IP类型'] == ip_type])
+            self._prune_ip_threats()
+        return self
+
+    def _prune_ip_threats(self):
+        """概要统计模式下只保留 Space-Saving 中仍在统计的 IP 的威胁明细。"""
+        if self.sketch is None:
+            return
+        for ip_type, threats in self.ip_threats.items():
+            for ip in [ip for ip in threats if ip not in self.ip_counts[ip_type]]:
+                del threats[ip]
+
+    def _add_ip_threats(self, ip_type, sub_df, level_column='威胁等级', name_column='威胁名称'):
+        """累加某类源IP的事件数和 (源IP, 威胁等级, 威胁名称) 计数；TOP IP 要到合并后才能确定，因此统计全部 IP。"""
+        if sub_df.empty:
+            return
+        _add_counts(self.ip_counts[ip_type], _value_counts(sub_df['源IP']))
+        if level_column not in sub_df.columns or name_column not in sub_df.columns:
+            return
+        grouped = sub_df.groupby(['源IP', level_column, name_column], sort=False, dropna=False).size()
+        threats = self.ip_threats[ip_type]
+        for (ip, level, name), count in grouped.items():
+            if count:
+                threats[ip][f"[{level}] {name}"] += int(count)
+
+    def add_event(self, values, time=None, ip_type=None, threat=None):
+        """
+        累加单个事件（实时监控逐条更新用），代价与列数成正比，与已累计的事件数无关。
+
+        参数:
+            values (dict): {COUNT_COLUMNS 中的键: 取值}，取值为 None 的跳过。
+            time (datetime): 发现时间。
+            ip_type (str): 源IP的类型（客户端/服务端）。
+            threat (str): "[威胁等级] 威胁名称"，用于客户端/服务端分析。
+        """
+        if self.sketch is not None:
+            raise ValueError("概要统计模式不支持逐条更新")
+        self.total_events += 1
+        for key, value in values.items():
+            if value is not None:
+                self.counts[key][value] += 1
+
+        if time is not None:
+            self.hour_counts[time.hour] += 1
+            self.daily_counts[time.date().isoformat()] += 1
+            self.weekday_hour[time.weekday(), time.hour] += 1
+
+        ip = values.get('source_ips')
+        if ip is not None and ip_type in self.ip_counts:
+            self.ip_counts[ip_type][ip] += 1
+            if threat is not None:
+                self.ip_threats[ip_type][ip][threat] += 1
+        return self
+
+    def subtract(self, other):
+        """从当前结果中减去 other（other 必须已包含在当前结果中），计数归零的键被删除，返回 self。"""
+        if self.sketch is not None:
+            raise ValueError("概要统计模式不支持减去部分结果")
+        self.total_events -= other.total_events
+        for key, counter in other.counts.items():
+            _subtract_counter(self.counts[key], counter)
+        self.hour_counts -= other.hour_counts
+        _subtract_counter(self.daily_counts, other.daily_counts)
+        self.weekday_hour -= other.weekday_hour
+        for ip_type in IP_TYPE_ANALYSIS.values():
+            _subtract_counter(self.ip_counts[ip_type], other.ip_counts[ip_type])
+            threats = self.ip_threats[ip_type]
+            for ip, counter in other.ip_threats[ip_type].items():
+                _subtract_counter(threats[ip], counter)
+                if not threats[ip]:
+                    del threats[ip]
+        return self
+
+    def merge(self, other):
+        """把另一个 ThreatAggregate 合并到当前结果，返回 self。"""
+        self.total_events += other.total_events
+        for key, counter in other.counts.items():
+            self.counts[key].update(counter)
+        self.hour_counts += other.hour_counts
+        self.daily_counts.update(other.daily_counts)
+        self.weekday_hour += other.weekday_hour
+        for ip_type in IP_TYPE_ANALYSIS.values():
+            self.ip_counts[ip_type].update(other.ip_counts[ip_type])
+            threats = self.ip_threats[ip_type]
+            for ip, counter in other.ip_threats[ip_type].items():
+                threats[ip].update(counter)
+        if self.distinct is not None:
+            for key, sketch in self.distinct.items():
+                sketch.merge(other.distinct[key])
+        self._prune_ip_threats()
+        return self
+
+    def to_threat_stats(self, top_n=5):
+        """
+        生成 threat_stats 字典（risk_score 由报告生成器计算）。
+
+        参数:
+            top_n (int): 客户端/服务端分析中列出的 TOP IP 个数。
+
+        返回:
+            dict: 计数字典按次数降序排列，键与报告使用的 threat_stats 相同；另有 unique_source_ips、
+                unique_destination_ips（不同IP个数）和 approximate（是否为概要统计的估计值）。
+        """
+        counts = {key: dict(counter.most_common(COUNT_LIMITS.get(key))) for key, counter in self.counts.items()}
+        ip_analysis = {
+            key: {ip: {'count': count, 'threats': dict(self.ip_threats[ip_type][ip])}
+                  for ip, count in self.ip_counts[ip_type].most_common(top_n)}
+            for key, ip_type in IP_TYPE_ANALYSIS.items()
+        }
+        return {
+            'total_events': self.total_events,
+            'threat_categories': counts['threat_categories'],
+            'threat_names': counts['threat_names'],
+            'severity_levels': counts['severity_levels'],
+            'source_ips': counts['source_ips'],
+            'destination_ips': counts['destination_ips'],
+            'time_distribution': defaultdict(int, {hour: int(count) for hour, count in enumerate(self.hour_counts)
+                                                   if count}),
+            'daily_distribution': defaultdict(int, sorted(self.daily_counts.items())),
+            'weekday_hour_matrix': self.weekday_hour.tolist(),
+            'top_malicious_ips': {},
+            'common_ports': counts['common_ports'],
+            'protocols': counts['protocols'],
+            'client_analysis': ip_analysis['client_analysis'],
+            'server_analysis': ip_analysis['server_analysis'],
+            'unique_source_ips': self._distinct_count('source_ips'),
+            'unique_destination_ips': self._distinct_count('destination_ips'),
+            'approximate': self.sketch is not None,
+            'risk_score': 0
+        }
+
+    def _distinct_count(self, key):
+        """不同取值个数：概要统计模式下为 HyperLogLog 估计值。"""
+        if self.distinct is not None:
+            return self.distinct[key].count()
+        return len(self.counts[key])
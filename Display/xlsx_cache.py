@@ -0,0 +1,62 @@
+import hashlib
+import os
+
+import pandas as pd
+
+# 缓存格式版本，读取方式变化时递增以使旧缓存失效
+CACHE_VERSION = 1
+# 缓存目录放在 Excel 文件旁边
+CACHE_DIR_NAME = '.xlsx_cache'
+
+
+def file_sha256(file_path, chunk_size=1 << 20):
+    """分块计算文件内容的 SHA-256。"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_path_for(file_path, cache_dir=None):
+    """返回 Excel 文件对应的 Parquet 缓存路径，以文件内容哈希为键，与文件名和修改时间无关。"""
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(file_path)), CACHE_DIR_NAME)
+    return os.path.join(cache_dir, f"{file_sha256(file_path)}.v{CACHE_VERSION}.parquet")
+
+
+def load_export(file_path, cache_dir=None):
+    """
+    读取导出的 envet_log XLSX 文件，并在旁边保存 Parquet 缓存。
+
+    同一份导出只在第一次读取时用 openpyxl 解析，之后直接读取缓存；文件内容变化后哈希不同，
+    会重新解析。未安装 pyarrow 或缓存读写失败时退化为直接读取 Excel。
+
+    参数:
+        file_path (str): XLSX 文件路径。
+        cache_dir (str): 缓存目录，默认为文件所在目录下的 .xlsx_cache。
+
+    返回:
+        pandas.DataFrame: 与 pd.read_excel(file_path, header=0, engine='openpyxl') 相同的数据。
+    """
+    cache_file = cache_path_for(file_path, cache_dir)
+    if os.path.exists(cache_file):
+        try:
+            return pd.read_parquet(cache_file)
+        except Exception as e:
+            print(f"⚠️ 读取缓存失败，重新解析 Excel: {e}")
+
+    df = pd.read_excel(file_path, header=0, engine='openpyxl')
+
+    # 先写临时文件再替换，避免并发读取到写了一半的缓存
+    tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        df.to_parquet(tmp_file, index=False)
+        os.replace(tmp_file, cache_file)
+    except Exception as e:
+        print(f"⚠️ 无法写入缓存 {cache_file}: {e}")
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+    return df
@@ -0,0 +1,132 @@
+import os
+import sys
+import time
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+
+# 控制台使用自签名证书，与浏览器方式一样忽略证书校验
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+# ========== 接口配置 ==========
+# 控制台地址（与 get_file_JSON.py / get_file_XLSX.py 相同）
+BASE_URL = 'https://172.31.254.244:5443'
+# 账号优先从环境变量读取，未设置时使用与浏览器导出脚本相同的账号
+USERNAME = os.environ.get('ENVET_USERNAME', '123')
+PASSWORD = os.environ.get('ENVET_PASSWORD', 'a@123456789')
+
+# 实验性：以下登录与“全部导出”接口尚未在真实控制台上确认，是按浏览器行为推测的，
+# 需按开发者工具中看到的实际请求调整；确认前流水线仍使用 Selenium 脚本导出。
+# 接口的登录、Cookie/token、流式写盘与重命名流程可用 Benchmark/check_api_exporter.py 在本地桩服务器上检查。
+LOGIN_PATH = '/api/user/login'
+EXPORT_PATH = '/api/threat-source/event-trace/export'
+# 导出格式通过查询参数传递
+EXPORT_FORMAT_PARAM = 'format'
+
+# 连接超时 / 读取超时（秒）；导出文件较大时读取超时针对的是两次数据块之间的间隔
+TIMEOUT = (10, 300)
+# 流式写盘的块大小
+CHUNK_SIZE = 1 << 20
+
+
+def download_dir_path():
+    """返回上一级目录下的 downloads 目录，不存在则创建（与浏览器导出脚本一致）。"""
+    download_dir = os.path.join(os.path.dirname(os.getcwd()), "downloads")
+    os.makedirs(download_dir, exist_ok=True)
+    return download_dir
+
+
+def create_session(pool_size=4):
+    """创建带连接池、保持长连接的会话。"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.verify = False
+    return session
+
+
+def login(session, base_url=BASE_URL, username=USERNAME, password=PASSWORD):
+    """
+    调用登录接口。会话 Cookie 由 session 自动保存；若响应中带有 token，则设置到 Authorization 头。
+
+    参数:
+        session (requests.Session): 会话。
+        base_url (str): 控制台地址。
+
+    返回:
+        requests.Session: 已登录的会话。
+    """
+    response = session.post(base_url + LOGIN_PATH, json={'username': username, 'password': password},
+                            timeout=TIMEOUT)
+    response.raise_for_status()
+
+    try:
+        body = response.json()
+    except ValueError:
+        body = None
+    token = None
+    if isinstance(body, dict):
+        data = body.get('data')
+        token = body.get('token') or (data.get('token') if isinstance(data, dict) else None)
+    if token:
+        session.headers['Authorization'] = f'Bearer {token}'
+    print("登录成功。")
+    return session
+
+
+def export_events(session, fmt='json', base_url=BASE_URL, download_dir=None):
+    """
+    调用导出接口，把响应体流式写入 downloads 目录。
+
+    文件先写为 .part 临时文件，完整写完后再重命名，命名与浏览器导出相同: envet_log-YYYYmmddHHMMSS.<fmt>。
+
+    参数:
+        session (requests.Session): 已登录的会话。
+        fmt (str): 导出格式，'json' 或 'xlsx'。
+        base_url (str): 控制台地址。
+        download_dir (str): 保存目录，默认为上一级目录下的 downloads。
+
+    返回:
+        str: 下载完成的文件路径。
+    """
+    if download_dir is None:
+        download_dir = download_dir_path()
+
+    file_name = f"envet_log-{time.strftime('%Y%m%d%H%M%S')}.{fmt}"
+    file_path = os.path.join(download_dir, file_name)
+    part_path = file_path + '.part'
+
+    start_time = time.time()
+    with session.get(base_url + EXPORT_PATH, params={EXPORT_FORMAT_PARAM: fmt}, stream=True,
+                     timeout=TIMEOUT) as response:
+        response.raise_for_status()
+        size = 0
+        try:
+            with open(part_path, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    f.write(chunk)
+                    size += len(chunk)
+        except BaseException:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            raise
+
+    os.replace(part_path, file_path)
+    print(f"文件 '{file_name}' 已下载到 '{download_dir}'（{size:,} 字节，用时 {time.time() - start_time:.1f} 秒）。")
+    return file_path
+
+
+def export(fmt='json', base_url=BASE_URL, download_dir=None):
+    """登录并导出一次，返回下载的文件路径。"""
+    with create_session() as session:
+        login(session, base_url)
+        return export_events(session, fmt, base_url, download_dir)
+
+
+if __name__ == "__main__":
+    # 用法: python api_exporter.py [json|xlsx] [控制台地址]
+    export_format = sys.argv[1] if len(sys.argv) > 1 else 'json'
+    url = sys.argv[2] if len(sys.argv) > 2 else BASE_URL
+    export(export_format, url)
@@ -0,0 +1,169 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+
+# 浏览器下载过程中使用的临时文件后缀，这些文件不是最终结果
+TEMP_SUFFIXES = ('.crdownload', '.part', '.tmp')
+# 不支持 inotify 时轮询目录的间隔（秒）
+POLL_INTERVAL = 0.2
+
+# inotify 事件掩码（见 <sys/inotify.h>）
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+def _load_inotify():
+    """加载 libc 中的 inotify 接口，非 Linux 或加载失败时返回 None。"""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class DownloadWatcher:
+    """
+    监视下载目录，返回本次下载完成的文件。
+
+    必须在触发下载之前调用 start()：此时记录目录中已有的文件，之后只接受新出现的文件，
+    不会误取以前导出的旧文件。Linux 下使用 inotify，文件被重命名到位（IN_MOVED_TO）
+    或写完关闭（IN_CLOSE_WRITE）时立即返回；其他平台退化为短间隔轮询目录。
+    """
+
+    def __init__(self, directory, suffix):
+        """
+        参数:
+            directory (str): 下载目录。
+            suffix (str): 最终文件的后缀，例如 '.json'、'.xlsx'。
+        """
+        self.directory = directory
+        self.suffix = suffix.lower()
+        self._fd = None
+        self._existing = {}
+
+    def _matches(self, name):
+        name = name.lower()
+        return name.endswith(self.suffix) and not name.endswith(TEMP_SUFFIXES)
+
+    def _snapshot(self):
+        """返回目录中符合后缀的文件及其 (修改时间, 大小)。"""
+        snapshot = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.is_file() and self._matches(entry.name):
+                    stat = entry.stat()
+                    snapshot[entry.name] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def start(self):
+        """记录当前目录内容并开始监视，需在触发下载前调用。"""
+        libc = _load_inotify()
+        if libc is not None:
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd >= 0:
+                if libc.inotify_add_watch(fd, os.fsencode(self.directory), IN_CLOSE_WRITE | IN_MOVED_TO) >= 0:
+                    self._fd = fd
+                else:
+                    os.close(fd)
+        # 先建立监视再记录快照，两者之间完成的下载也不会丢失
+        self._existing = self._snapshot()
+        return self
+
+    def wait(self, timeout=60):
+        """
+        等待本次下载完成。
+
+        参数:
+            timeout (float): 超时时间（秒）。
+
+        返回:
+            str: 下载完成的文件路径，超时返回 None。
+        """
+        deadline = time.monotonic() + timeout
+        if self._fd is not None:
+            return self._wait_inotify(deadline)
+        return self._wait_polling(deadline)
+
+    def _wait_inotify(self, deadline):
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            readable, _, _ = select.select([self._fd], [], [], remaining)
+            if not readable:
+                return None
+            try:
+                buffer = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                continue
+
+            offset = 0
+            while offset < len(buffer):
+                _, mask, _, length = _EVENT_HEADER.unpack_from(buffer, offset)
+                offset += _EVENT_HEADER.size
+                name = buffer[offset:offset + length].rstrip(b'\0').decode('utf-8', 'surrogateescape')
+                offset += length
+                if mask & IN_Q_OVERFLOW:
+                    # 事件队列溢出时可能丢失事件，改为对比目录快照
+                    path = self._new_file()
+                    if path:
+                        return path
+                elif name and self._matches(name):
+                    return os.path.join(self.directory, name)
+
+    def _wait_polling(self, deadline):
+        while True:
+            path = self._new_file()
+            if path:
+                return path
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(POLL_INTERVAL)
+
+    def _new_file(self):
+        """对比 start() 时的快照，返回新出现或被覆盖的文件。"""
+        for name, state in self._snapshot().items():
+            if self._existing.get(name) != state:
+                return os.path.join(self.directory, name)
+        return None
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def wait_for_download(directory, suffix, trigger, timeout=60):
+    """
+    开始监视下载目录，执行 trigger() 触发下载，并等待本次下载的文件。
+
+    参数:
+        directory (str): 下载目录。
+        suffix (str): 最终文件的后缀。
+        trigger (callable): 触发下载的函数，例如点击导出菜单。
+        timeout (float): 超时时间（秒）。
+
+    返回:
+        str: 下载完成的文件路径，超时返回 None。
+    """
+    with DownloadWatcher(directory, suffix) as watcher:
+        trigger()
+        return watcher.wait(timeout)
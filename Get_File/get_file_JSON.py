@@ -1,12 +1,15 @@
 import os
-import time
-import glob
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
+from download_watcher import wait_for_download
+
+# 等待下载完成的超时时间（秒）
+DOWNLOAD_TIMEOUT = 60
+
 # 定义下载目录
 # Define the download directory
 parent_dir = os.path.dirname(os.getcwd())
@@ -105,82 +108,20 @@ json_button = wait.until(
     EC.element_to_be_clickable(
         (By.XPATH, '//li[contains(@class, "el-dropdown-menu__item") and contains(text(), "JSON")]'))
 )
-driver.execute_script("arguments[0].click();", json_button)
-print("已点击“JSON”菜单项，开始下载。")
+
+
+def click_export_menu():
+    driver.execute_script("arguments[0].click();", json_button)
+    print("已点击“JSON”菜单项，开始下载。")
+
 
 # ========== 10. 等待文件下载完成 ==========
 # Wait for the file download to complete
-# 等待文件出现在下载目录中，并确保其完成下载
-# Wait for the file to appear in the download directory and ensure it completes downloading
-timeout = 60  # 秒
-start_time = time.time()
-downloaded_file_name = None
-
+# 先开始监视下载目录再点击，只接受本次点击产生的文件
 print(f"等待文件下载到: {download_dir}")
-
-while time.time() - start_time < timeout:
-    # 查找所有 .crdownload 文件
-    # Find all .crdownload files
-    crdownload_files = glob.glob(os.path.join(download_dir, '*.crdownload'))
-
-    # 查找所有 .json 文件
-    # Find all .json files
-    json_files = glob.glob(os.path.join(download_dir, '*.json'))
-
-    if json_files:
-        # 如果有 .json 文件，假设是下载完成的文件
-        # If there are .json files, assume one is the completed download
-        downloaded_file_name = os.path.basename(json_files[0])  # 取第一个找到的json文件
-        print(f"检测到已完成的JSON文件: {downloaded_file_name}")
-        break
-    elif crdownload_files:
-        # 如果有 .crdownload 文件，等待其完成
-        # If there are .crdownload files, wait for them to complete
-        temp_file_path = crdownload_files[0]  # 取第一个找到的crdownload文件
-        print(f"检测到临时下载文件: {os.path.basename(temp_file_path)}，等待完成...")
-        prev_size = -1
-        # 等待文件大小不再变化，或者文件消失（被重命名）
-        # Wait for file size to stop changing, or for the file to disappear (be renamed)
-        while time.time() - start_time < timeout:
-            try:
-                if not os.path.exists(temp_file_path):
-                    # 如果临时文件消失了，说明可能已经重命名，再次查找json文件
-                    # If the temporary file disappears, it might have been renamed, search for json file again
-                    json_files_after_rename = glob.glob(os.path.join(download_dir, '*.json'))
-                    if json_files_after_rename:
-                        downloaded_file_name = os.path.basename(json_files_after_rename[0])
-                        print(f"临时文件消失，找到最终JSON文件: {downloaded_file_name}")
-                        break
-
-                current_size = os.path.getsize(temp_file_path)
-                if current_size == prev_size and current_size > 0:
-                    print(f"临时文件 {os.path.basename(temp_file_path)} 大小稳定，但仍是.crdownload，继续等待重命名...")
-                    # 文件大小稳定但仍是.crdownload，可能是下载完成但未重命名，或需要更多时间
-                    # File size is stable but still .crdownload, might be downloaded but not renamed, or needs more time
-                    time.sleep(2)  # 稍微多等一下
-                prev_size = current_size
-                time.sleep(1)
-            except FileNotFoundError:
-                # 文件未找到，可能已经完成并重命名，再次检查json文件
-                # File not found, might have completed and been renamed, check for json file again
-                json_files_after_rename = glob.glob(os.path.join(download_dir, '*.json'))
-                if json_files_after_rename:
-                    downloaded_file_name = os.path.basename(json_files_after_rename[0])
-                    print(f"临时文件消失，找到最终JSON文件: {downloaded_file_name}")
-                    break
-                else:
-                    print(f"文件 {os.path.basename(temp_file_path)} 暂时未找到，继续等待...")
-                time.sleep(1)
-            except Exception as e:
-                print(f"检查文件大小时发生错误: {e}")
-                time.sleep(1)
-        if downloaded_file_name:
-            break  # 如果找到了最终文件，跳出外层循环
-
-    time.sleep(1)  # 每秒检查一次
-
-if downloaded_file_name:
-    print(f"文件 '{downloaded_file_name}' 已下载到 '{download_dir}'。")
+downloaded_file = wait_for_download(download_dir, '.json', click_export_menu, timeout=DOWNLOAD_TIMEOUT)
+if downloaded_file:
+    print(f"文件 '{os.path.basename(downloaded_file)}' 已下载到 '{download_dir}'。")
 else:
     print("文件下载超时或未检测到最终JSON文件。")
 
@@ -0,0 +1,60 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# IPv4 地址的解析规则，Clean（紧凑类型转换）和 Display（网段判断）共用
+IPV4_PATTERN = r'^\s*([0-9]{1,3})\.([0-9]{1,3})\.([0-9]{1,3})\.([0-9]{1,3})\s*$'
+IPV4_REGEX = re.compile(IPV4_PATTERN)
+
+
+def parse_ipv4(ip):
+    """
+    解析单个 IPv4 地址（逐条处理事件时使用），规则与 ipv4_to_uint32 相同。
+
+    返回:
+        int: 地址对应的整数，空值和无效地址为 None。
+    """
+    match = IPV4_REGEX.match(str(ip))
+    if match is None:
+        return None
+    octets = [int(octet) for octet in match.groups()]
+    if max(octets) > 255:
+        return None
+    return (octets[0] << 24) | (octets[1] << 16) | (octets[2] << 8) | octets[3]
+
+
+def ipv4_to_uint32(ips):
+    """
+    将 IPv4 地址列向量化转换为 uint32，只解析去重后的地址。
+
+    参数:
+        ips (pandas.Series): IP 地址列。
+
+    返回:
+        pandas.Series: UInt32 列，空值和无效地址（IPv6、格式错误、某段大于 255）为 <NA>。
+    """
+    codes, uniques = pd.factorize(ips)
+    values = np.zeros(len(uniques), dtype=np.uint32)
+    valid = np.zeros(len(uniques), dtype=bool)
+    if len(uniques):
+        octets = pd.Series(uniques, dtype=object).astype(str).str.extract(IPV4_PATTERN)
+        octets = octets.apply(pd.to_numeric).to_numpy(dtype=np.float64)
+        valid = ~np.isnan(octets).any(axis=1) & (np.nan_to_num(octets, nan=256) <= 255).all(axis=1)
+        weights = np.array([1 << 24, 1 << 16, 1 << 8, 1], dtype=np.int64)
+        values[valid] = octets[valid].astype(np.int64) @ weights
+
+    # factorize 把空值编码为 -1
+    mask = codes < 0
+    mask[~mask] = ~valid[codes[~mask]]
+    data = pd.arrays.IntegerArray(values[np.maximum(codes, 0)], mask)
+    return pd.Series(data, index=ips.index, name=ips.name)
+
+
+def uint32_to_ipv4(values):
+    """将 uint32 IP 列转换回点分十进制字符串，<NA> 保持为空值。"""
+    codes, uniques = pd.factorize(values)
+    ints = np.asarray(uniques, dtype=np.int64)
+    text = np.array([f'{v >> 24}.{(v >> 16) & 255}.{(v >> 8) & 255}.{v & 255}' for v in ints] + [np.nan],
+                    dtype=object)
+    return pd.Series(text[codes], index=values.index, name=values.name)
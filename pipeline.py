@@ -0,0 +1,251 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# 仓库根目录，各阶段的路径都相对于它
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+# 记录各阶段输入/输出内容哈希的状态文件
+STATE_PATH = os.path.join('temp_files', 'pipeline_state.json')
+# 启用各阶段脚本跟踪的环境变量（见 tracing.py）
+TRACE_ENV = 'ENVET_TRACE'
+CHROME_TRACE_ENV = 'ENVET_CHROME_TRACE'
+
+# 流水线中的一个阶段：
+#   cwd      运行脚本的目录（各脚本按 ../downloads、../temp_files 的相对路径读写）
+#   command  在 cwd 下执行的脚本及参数
+#   inputs   输入文件、目录或通配符，包括阶段自身的代码
+#   outputs  阶段产生的文件或目录
+#   deps     上游阶段，全部完成后才能运行
+Stage = namedtuple('Stage', ['name', 'cwd', 'command', 'inputs', 'outputs', 'deps'])
+
+STAGES = [
+    # 导出仍通过浏览器完成；Get_File/api_exporter.py 的接口尚未在真实控制台上确认，属于实验性功能
+    Stage('export_json', 'Get_File', ['get_file_JSON.py'],
+          inputs=[], outputs=['downloads/*envet_log*.json'], deps=[]),
+    Stage('export_xlsx', 'Get_File', ['get_file_XLSX.py'],
+          inputs=[], outputs=['downloads/*envet_log*.xlsx'], deps=[]),
+    Stage('clean', 'Clean', ['clean.py'],
+          inputs=['downloads/*envet_log*.json', 'Clean/clean.py', 'Clean/desc_parser.py', 'Clean/event_schema.py',
+                  'Clean/event_store.py', 'Clean/frame_store.py', 'Clean/nested_fields.py', 'Clean/normalize.py',
+                  'Clean/normalization.json', 'ipv4.py', 'tracing.py'],
+          outputs=['temp_files/cleaned_parts'], deps=['export_json']),
+    Stage('select_rows', 'Clean', ['select_rows.py'],
+          inputs=['temp_files/cleaned_parts', 'Clean/select_rows.py', 'Clean/event_schema.py', 'Clean/frame_store.py',
+                  'ipv4.py', 'tracing.py'],
+          outputs=['temp_files/filtered_data.parquet'], deps=['clean']),
+    Stage('report', 'Display', ['report.py', '--all'],
+          inputs=['downloads/*envet_log*.xlsx', 'temp_files/filtered_data.parquet', 'Display/report.py',
+                  'Display/dns_analytics.py', 'Display/export_batch.py', 'Display/ip_ranges.py',
+                  'Display/report_charts.py', 'Display/rollup_cube.py', 'Display/sketches.py',
+                  'Display/threat_stats.py', 'Display/xlsx_cache.py', 'ipv4.py', 'tracing.py'],
+          outputs=['Display/网络安全威胁分析报告.pdf'], deps=['export_xlsx', 'select_rows']),
+    Stage('rollup', 'Display', ['rollup_cube.py'],
+          inputs=['downloads/*envet_log*.xlsx', 'Display/rollup_cube.py', 'Display/export_batch.py',
+                  'Display/ip_ranges.py', 'Display/sketches.py', 'Display/threat_stats.py', 'Display/xlsx_cache.py',
+                  'ipv4.py', 'tracing.py'],
+          outputs=['temp_files/rollup_cube.sqlite'], deps=['export_xlsx']),
+]
+# 导出阶段访问控制台，每次都会得到新数据，只有显式要求时才运行
+EXPORT_STAGES = {'export_json', 'export_xlsx'}
+
+
+def _expand(patterns):
+    """将文件、目录和通配符展开为排序后的文件列表（相对 ROOT_DIR）。"""
+    files = set()
+    for pattern in patterns:
+        for path in glob.glob(os.path.join(ROOT_DIR, pattern)):
+            if os.path.isdir(path):
+                for dirpath, _, names in os.walk(path):
+                    files.update(os.path.join(dirpath, name) for name in names)
+            else:
+                files.add(path)
+    return sorted(os.path.relpath(path, ROOT_DIR) for path in files)
+
+
+def file_sha256(path, file_cache):
+    """
+    计算文件内容的 SHA-256。
+
+    file_cache 按 (大小, 修改时间) 缓存上次的结果，文件未被改动时不必重新读取。
+    """
+    stat = os.stat(os.path.join(ROOT_DIR, path))
+    cached = file_cache.get(path)
+    if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+        return cached[2]
+
+    sha = hashlib.sha256()
+    with open(os.path.join(ROOT_DIR, path), 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    file_cache[path] = [stat.st_size, stat.st_mtime_ns, sha.hexdigest()]
+    return sha.hexdigest()
+
+
+def content_hashes(patterns, file_cache):
+    """返回 {文件: 内容哈希}，用于判断阶段的输入或输出是否变化。"""
+    return {path: file_sha256(path, file_cache) for path in _expand(patterns)}
+
+
+def load_state(path=STATE_PATH):
+    full_path = os.path.join(ROOT_DIR, path)
+    if not os.path.exists(full_path):
+        return {'stages': {}, 'files': {}}
+    with open(full_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_state(state, path=STATE_PATH):
+    full_path = os.path.join(ROOT_DIR, path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    tmp_path = full_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, full_path)
+
+
+def is_up_to_date(stage, state):
+    """输入与上次成功运行时相同、且输出仍是当时的内容时，阶段可以跳过。"""
+    record = state['stages'].get(stage.name)
+    if record is None:
+        return False
+    outputs = content_hashes(stage.outputs, state['files'])
+    return (bool(outputs) and record['outputs'] == outputs
+            and record['inputs'] == content_hashes(stage.inputs, state['files']))
+
+
+def select_stages(names=None, export=False):
+    """
+    返回要运行的阶段（按 STAGES 中的顺序），names 中的阶段会连同其上游阶段一起运行。
+
+    参数:
+        names (list): 目标阶段名，默认全部。
+        export (bool): 是否包含导出阶段。
+    """
+    by_name = {stage.name: stage for stage in STAGES}
+    unknown = [name for name in names or [] if name not in by_name]
+    if unknown:
+        raise ValueError(f"未知的阶段: {', '.join(unknown)}（可选 {', '.join(by_name)}）")
+
+    selected = set()
+    pending = list(names or by_name)
+    while pending:
+        name = pending.pop()
+        if name in selected or (name in EXPORT_STAGES and not export):
+            continue
+        selected.add(name)
+        pending.extend(by_name[name].deps)
+    return [stage for stage in STAGES if stage.name in selected]
+
+
+def run_stage(stage, trace_dir=None):
+    """
+    在阶段目录下以子进程运行脚本，返回 (是否成功, 输出, 用时)。
+
+    指定 trace_dir 时，脚本记录各步骤的耗时与内存，写出 <阶段名>.trace.json 和 <阶段名>.chrome.json。
+    导出阶段是浏览器脚本，不支持跟踪。
+    """
+    env = None
+    if trace_dir and stage.name not in EXPORT_STAGES:
+        env = dict(os.environ)
+        env[TRACE_ENV] = os.path.join(os.path.abspath(trace_dir), f"{stage.name}.trace.json")
+        env[CHROME_TRACE_ENV] = os.path.join(os.path.abspath(trace_dir), f"{stage.name}.chrome.json")
+    start_time = time.time()
+    result = subprocess.run([sys.executable] + stage.command, cwd=os.path.join(ROOT_DIR, stage.cwd),
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                            encoding='utf-8', errors='replace', env=env)
+    return result.returncode == 0, result.stdout, time.time() - start_time
+
+
+def run_pipeline(names=None, export=False, force=False, max_workers=None, dry_run=False, trace_dir=None):
+    """
+    按依赖顺序运行流水线，互不依赖的阶段并行执行。
+
+    参数:
+        names (list): 目标阶段名，默认全部（导出阶段除外）。
+        export (bool): 是否先从控制台导出新数据。
+        force (bool): 忽略记录的哈希，强制运行。
+        max_workers (int): 同时运行的阶段数上限。
+        dry_run (bool): 只列出需要运行的阶段，不实际执行。
+        trace_dir (str): 各阶段跟踪文件的输出目录，为 None 时不跟踪。
+
+    返回:
+        dict: {阶段名: 'ran' / 'skipped' / 'failed' / 'blocked'}。
+    """
+    stages = select_stages(names, export)
+    selected = {stage.name for stage in stages}
+    state = load_state()
+    status = {}
+    running = {}
+
+    def ready(stage):
+        return all(status.get(dep) in ('ran', 'skipped') for dep in stage.deps if dep in selected)
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(stages) or 1) as pool:
+        while len(status) < len(stages):
+            for stage in stages:
+                if stage.name in status or stage.name in running:
+                    continue
+                if any(status.get(dep) in ('failed', 'blocked') for dep in stage.deps):
+                    status[stage.name] = 'blocked'
+                    print(f"⏭️ {stage.name}: 上游阶段失败，未运行")
+                    continue
+                if not ready(stage):
+                    continue
+                # 上游重新运行过则输入哈希随之变化，这里的判断自然会让下游重跑
+                if not force and stage.name not in EXPORT_STAGES and is_up_to_date(stage, state):
+                    status[stage.name] = 'skipped'
+                    print(f"✅ {stage.name}: 输入未变化，跳过")
+                elif dry_run:
+                    status[stage.name] = 'ran'
+                    print(f"🔄 {stage.name}: 需要运行")
+                else:
+                    print(f"🚀 {stage.name}: 开始运行")
+                    running[stage.name] = (stage, pool.submit(run_stage, stage, trace_dir))
+
+            if not running:
+                continue
+            done, _ = wait([future for _, future in running.values()], return_when=FIRST_COMPLETED)
+            for name, (stage, future) in list(running.items()):
+                if future not in done:
+                    continue
+                del running[name]
+                ok, output, elapsed = future.result()
+                print(f"\n===== {name} 输出 =====\n{output.rstrip()}\n")
+                if ok:
+                    status[name] = 'ran'
+                    state['stages'][name] = {
+                        'inputs': content_hashes(stage.inputs, state['files']),
+                        'outputs': content_hashes(stage.outputs, state['files']),
+                    }
+                    save_state(state)
+                    print(f"✅ {name}: 完成，用时 {elapsed:.1f} 秒")
+                else:
+                    status[name] = 'failed'
+                    print(f"❌ {name}: 运行失败，用时 {elapsed:.1f} 秒")
+    return status
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='运行 导出 → 清洗 → 筛选 / 报告 流水线，输入未变化的阶段自动跳过。')
+    parser.add_argument('stages', nargs='*', help='只运行这些阶段及其上游，可选: ' + ', '.join(s.name for s in STAGES))
+    parser.add_argument('--export', action='store_true', help='先从控制台导出新的 JSON / XLSX')
+    parser.add_argument('--force', action='store_true', help='忽略记录的哈希，强制重新运行')
+    parser.add_argument('--jobs', type=int, default=None, help='同时运行的阶段数上限')
+    parser.add_argument('--dry-run', action='store_true', help='只列出需要运行的阶段')
+    parser.add_argument('--trace', metavar='DIR',
+                        help='记录清洗、筛选、报告、立方体各阶段内部步骤的耗时与内存，跟踪文件写入该目录（导出阶段不跟踪）')
+    args = parser.parse_args()
+
+    try:
+        results = run_pipeline(args.stages, export=args.export, force=args.force,
+                               max_workers=args.jobs, dry_run=args.dry_run, trace_dir=args.trace)
+    except ValueError as e:
+        parser.error(str(e))
+    sys.exit(1 if any(result in ('failed', 'blocked') for result in results.values()) else 0)
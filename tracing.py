@@ -0,0 +1,219 @@
+"""
+按阶段记录耗时与内存的跟踪工具，默认关闭。
+
+用法:
+    from tracing import span
+
+    with span('load_data', file=path) as s:
+        df = load(path)
+        s.set(rows=len(df))
+
+未启用时 span() 返回一个什么都不做的共享对象，开销只有一次函数调用。启用后每个 span 记录墙钟时间、CPU 时间、
+结束时进程的峰值 RSS，以及（可选）tracemalloc 记录的 Python 内存峰值；span 可以嵌套，进程退出时写出
+JSON 跟踪文件和（可选）Chrome trace-event 文件（在 chrome://tracing 或 https://ui.perfetto.dev 中打开）。
+
+启用方式: 调用 enable()；或由脚本入口调用 enable_from_env()，运行前设置环境变量 ENVET_TRACE（JSON 路径）、
+ENVET_CHROME_TRACE（Chrome 跟踪路径）、ENVET_TRACE_MEMORY=1（记录 tracemalloc 峰值，会明显拖慢运行）。
+导入本模块不会读取环境变量或启用跟踪。
+
+本模块位于仓库根目录，Clean、Display 中的脚本通过 sys.path 导入。
+"""
+import atexit
+import json
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:
+    # Windows 没有 resource 模块，峰值内存改由 psutil 获取
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+TRACE_ENV = 'ENVET_TRACE'
+CHROME_TRACE_ENV = 'ENVET_CHROME_TRACE'
+TRACE_MEMORY_ENV = 'ENVET_TRACE_MEMORY'
+MB = 1024 ** 2
+
+_tracer = None
+
+
+def peak_rss_mb():
+    """进程启动以来的峰值常驻内存（MB），无法获取时为 None。"""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux 以 KB 为单位，macOS 以字节为单位
+        return round(peak / (MB if sys.platform == 'darwin' else 1024), 1)
+    if psutil is not None:
+        info = psutil.Process().memory_info()
+        return round(getattr(info, 'peak_wset', info.rss) / MB, 1)
+    return None
+
+
+class _NullSpan:
+    """未启用跟踪时 span() 返回的共享对象。"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """一个计时区间；set() 可在区间内补充附加信息（行数等），写入跟踪记录的 args。"""
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.traced_peak = 0
+
+    def __enter__(self):
+        self.tracer._enter(self)
+        self.start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.wall = time.perf_counter() - self.start
+        self.cpu = time.process_time() - self.cpu_start
+        self.tracer._exit(self, exc_type)
+        return False
+
+    def set(self, **args):
+        self.args.update(args)
+
+
+class Tracer:
+    """收集已结束的 span。只应在主线程中使用（嵌套关系按调用栈记录）。"""
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.origin = time.perf_counter()
+        self.started = datetime.now().isoformat(timespec='seconds')
+        self.records = []
+        self._stack = []
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def span(self, name, **args):
+        return Span(self, name, args)
+
+    def _enter(self, span):
+        span.parent = self._stack[-1].name if self._stack else None
+        span.depth = len(self._stack)
+        if self.trace_memory:
+            # tracemalloc 只有一个全局峰值：重置前先计入所有外层 span
+            peak = tracemalloc.get_traced_memory()[1]
+            for outer in self._stack:
+                outer.traced_peak = max(outer.traced_peak, peak)
+            tracemalloc.reset_peak()
+        self._stack.append(span)
+
+    def _exit(self, span, exc_type):
+        self._stack.remove(span)
+        record = {
+            'name': span.name,
+            'parent': span.parent,
+            'depth': span.depth,
+            'start_seconds': round(span.start - self.origin, 6),
+            'wall_seconds': round(span.wall, 6),
+            'cpu_seconds': round(span.cpu, 6),
+            'peak_rss_mb': peak_rss_mb(),
+        }
+        if self.trace_memory:
+            span.traced_peak = max(span.traced_peak, tracemalloc.get_traced_memory()[1])
+            if self._stack:
+                self._stack[-1].traced_peak = max(self._stack[-1].traced_peak, span.traced_peak)
+            record['traced_peak_mb'] = round(span.traced_peak / MB, 1)
+        if span.args:
+            record['args'] = span.args
+        if exc_type is not None:
+            record['error'] = exc_type.__name__
+        self.records.append(record)
+
+    def to_json(self):
+        """结构化跟踪：进程信息和按开始时间排序的 span 列表。"""
+        return {
+            'pid': os.getpid(),
+            'argv': sys.argv,
+            'started': self.started,
+            'trace_memory': self.trace_memory,
+            'spans': sorted(self.records, key=lambda record: record['start_seconds']),
+        }
+
+    def to_chrome(self):
+        """Chrome trace-event 格式：每个 span 为一个完整事件（ph='X'），时间单位为微秒。"""
+        events = []
+        for record in self.records:
+            args = {key: value for key, value in record.items()
+                    if key not in ('name', 'parent', 'depth', 'start_seconds', 'wall_seconds', 'args')}
+            args.update(record.get('args', {}))
+            events.append({'name': record['name'], 'cat': 'envet', 'ph': 'X', 'pid': os.getpid(), 'tid': 0,
+                           'ts': round(record['start_seconds'] * 1e6, 1),
+                           'dur': round(record['wall_seconds'] * 1e6, 1), 'args': args})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write(self, path=None, chrome_path=None):
+        """写出 JSON 跟踪文件和 Chrome 跟踪文件（路径为 None 的跳过）。"""
+        for output, data in ((path, self.to_json), (chrome_path, self.to_chrome)):
+            if output:
+                os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+                with open(output, 'w', encoding='utf-8') as f:
+                    json.dump(data(), f, ensure_ascii=False, indent=1, default=str)
+
+
+def enable(path=None, chrome_path=None, trace_memory=False):
+    """
+    启用跟踪。
+
+    参数:
+        path (str): 进程退出时写出 JSON 跟踪文件的路径，为 None 时不自动写出。
+        chrome_path (str): 同时写出的 Chrome trace-event 文件路径。
+        trace_memory (bool): 是否用 tracemalloc 记录每个 span 的 Python 内存峰值。
+
+    返回:
+        Tracer: 当前的跟踪器。
+    """
+    global _tracer
+    _tracer = Tracer(trace_memory)
+    if path or chrome_path:
+        atexit.register(_tracer.write, path, chrome_path)
+    return _tracer
+
+
+def span(name, **args):
+    """返回名为 name 的计时区间（上下文管理器）；未启用跟踪时几乎没有开销。"""
+    if _tracer is None:
+        return _NULL_SPAN
+    return _tracer.span(name, **args)
+
+
+def enable_from_env():
+    """
+    按环境变量 ENVET_TRACE / ENVET_CHROME_TRACE / ENVET_TRACE_MEMORY 启用跟踪，未设置时不做任何事。
+
+    只应在脚本入口（main() 或 __main__）中调用：进程池的子进程不执行入口代码，不会再次启用并覆盖同一个跟踪文件。
+
+    返回:
+        Tracer: 启用时为当前的跟踪器，否则为 None。
+    """
+    path = os.environ.get(TRACE_ENV)
+    chrome_path = os.environ.get(CHROME_TRACE_ENV)
+    if not (path or chrome_path):
+        return None
+    return enable(path, chrome_path, os.environ.get(TRACE_MEMORY_ENV) == '1')